@@ -1,128 +1,364 @@
 """
 ============================================================
-スクレイピング一括実行管理スクリプト
+スクレイピング〜マスター更新 一括実行管理スクリプト
 ============================================================
 
 【概要】
-本スクリプトは、複数の不動産スクレイピング処理を
-「順番に」「安全に」実行するための実行管理用スクリプトである。
+本スクリプトは、不動産データの日次処理全体を
+ステージの依存関係（DAG）として定義し、実行するための実行管理用スクリプトである。
 
-以下のスクレイピングスクリプトを対象とし、
-1本ずつ直列で実行する。
+  01 スクレイピング（SUUMO / ニフティ不動産 / スマイティ）
+    → 02 データフレーム作成（サイト別）
+    → 02 結合（3data_YYMMDD.csv）
+    → 21 マスター比較（90_3data_master.csv / price_history/YYYY-MM.csv）
+    → 07 物件詳細チェック
+    → 25 重複クラスタ表（92_duplicate_clusters.csv、次回の 21 で使う）
 
-  - 01suumo_scrayping.py   （SUUMO）
-  - 01_nifty_scraping.py  （ニフティ不動産）
-  - 01_sumaity_scraping.py（スマイティ）
-
-各スクリプトは独立したプロセスとして実行され、
-途中でエラーが発生した場合でも、
-後続のスクレイピング処理は継続して実行される。
+各ステージは入力・出力ファイルを宣言しており、
+前回成功時から入力が変わっていないステージは実行を省略する。
+途中で失敗した場合も、再実行時は失敗したステージとその後続だけが実行される。
 
 ------------------------------------------------------------
 【設計方針】
 - subprocess を用いた別プロセス実行
-- 処理は必ず「指定順」で直列実行
-- 例外・異常終了が発生しても全体は停止しない
-- 実行結果（標準出力・エラー出力）をログに保存
-- 日次運用・定期実行（タスクスケジューラ等）を想定
+  （各スクリプトは sys.argv・カレントディレクトリ・モジュール変数を前提に書かれており、
+    1つのステージの異常終了やメモリ使用で実行管理ごと落ちないよう、同じプロセスには載せない）
+- 依存関係の無いステージ（サイト別のスクレイピング等）は並列実行
+- 入力ファイルの mtime/サイズ → SHA-256 で変更を判定し、未変更なら省略
+  （入力にはステージのスクリプトが読み込む共有モジュールも含める）
+- スクレイピングは Web が入力なので、1日1回は必ず実行する
+- スクレイピングの失敗は許容し、後続は前回までのデータで続行する
+- 子プロセスの出力は1行ずつそのままログへ流す
 
 ------------------------------------------------------------
 【ログ仕様】
 - logs/ ディレクトリ配下に日付単位でログを出力
-- ファイル名形式：
-    scraping_YYYYMMDD.log
-
-- ログ内容：
-    - 各スクリプトの開始・終了時刻
-    - 標準出力（STDOUT）
-    - エラー出力（STDERR）
-    - 異常終了時のリターンコード
-    - 例外発生時のメッセージ
-
-------------------------------------------------------------
-【前提条件】
-- 本スクリプトと各スクレイピングスクリプトは
-  同一ディレクトリに配置されていること
-- Python 実行環境は sys.executable により自動取得される
-- 各スクレイピングスクリプトは
-  単体実行が可能であること
+    scraping_YYYYMMDD.log         … 実行ログ（各ステージの出力を含む）
+    pipeline_report_YYYYMMDD.json … ステージごとの状態・所要時間・出力件数
+    pipeline_state.json           … 前回成功時の入力ファイルの指紋（省略判定用）
 
 ------------------------------------------------------------
-【目的・位置づけ】
-- 「生データ取得」フェーズの実行管理を担う
-- 各スクレイピング処理の内部仕様には立ち入らない
-- 失敗を許容しつつ、継続的なデータ蓄積を最優先とする
+【使い方】
+  python 01_0run_all_scraping.py            # 必要なステージだけ実行
+  python 01_0run_all_scraping.py --force    # 全ステージを実行
+  python 01_0run_all_scraping.py --jobs 2   # 同時実行数を指定
 
 ============================================================
 """
 
-import subprocess
+import argparse
+import csv
 import datetime
+import hashlib
+import json
 import os
+import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
 # =====================
 # 設定
 # =====================
-SCRIPTS = [
-    "01suumo_scrayping.py",
-    "01_nifty_scraping.py",
-    "01_sumaity_scraping.py",
-]
-
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
-LOG_FILE = os.path.join(
-    LOG_DIR,
-    f"scraping_{datetime.date.today().strftime('%Y%m%d')}.log"
-)
+TODAY = datetime.date.today()
+
+LOG_FILE = os.path.join(LOG_DIR, f"scraping_{TODAY.strftime('%Y%m%d')}.log")
+REPORT_FILE = os.path.join(LOG_DIR, f"pipeline_report_{TODAY.strftime('%Y%m%d')}.json")
+STATE_FILE = os.path.join(LOG_DIR, "pipeline_state.json")
 
 PYTHON_EXE = sys.executable  # 今使っているPythonをそのまま使う
 
+SNAPSHOT_CSV = f"3data_{TODAY.strftime('%y%m%d')}.csv"
+MASTER_CSV = "90_3data_master.csv"
+CLUSTER_CSV = "92_duplicate_clusters.csv"
+
+# ステージのスクリプトが _load_module で読み込む共有モジュール（変更されたら再実行する）
+LOADER_MODULE = "module_loader.py"
+NORMALIZER_MODULES = ["11_listing_normalizer.py", "12_station_index.py", LOADER_MODULE]
+MERGE_MODULES = ["02_merge_all_dataframe.py", "13_text_normalizer.py", LOADER_MODULE]
+COMPARE_MODULES = [
+    "21_master_compare.py",
+    LOADER_MODULE,
+    "13_text_normalizer.py",
+    "22_master_store.py",
+    "23_master_db.py",
+    "24_price_history.py",
+    "25_duplicate_matcher.py",
+]
+CHECK_MODULES = [
+    "07_master_check_updater.py",
+    LOADER_MODULE,
+    "06_3site_scraper.py",
+    "03_suumo_scraper.py",
+    "04_sumaity_scraper.py",
+    "05_nifty_scraper.py",
+    "08_http_client.py",
+    "09_page_cache.py",
+    "10_table_parser.py",
+    "23_master_db.py",
+    "24_price_history.py",
+]
+
+
+@dataclass
+class Stage:
+    name: str
+    command: List[str]
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    deps: List[str] = field(default_factory=list)
+    # 入力がWebなど外部にあるステージは、1日1回は必ず実行する
+    daily: bool = False
+    # False の場合、失敗しても後続ステージは前回までの出力で続行する
+    required: bool = True
+
+
+STAGES = [
+    Stage("01_suumo", ["01suumo_scrayping.py"],
+          inputs=["01suumo_scrayping.py"], outputs=["suumo01.csv"], daily=True, required=False),
+    Stage("01_nifty", ["01_nifty_scraping.py"],
+          inputs=["01_nifty_scraping.py"], outputs=["nifty01.csv"], daily=True, required=False),
+    Stage("01_sumaity", ["01_sumaity_scraping.py"],
+          inputs=["01_sumaity_scraping.py"], outputs=["sumaity01.csv"], daily=True, required=False),
+    Stage("02_suumo", ["11_listing_normalizer.py", "suumo"],
+          inputs=[*NORMALIZER_MODULES, "suumo01.csv"], outputs=["suumo02.csv"], deps=["01_suumo"]),
+    Stage("02_nifty", ["11_listing_normalizer.py", "nifty"],
+          inputs=[*NORMALIZER_MODULES, "nifty01.csv"], outputs=["nifty02.csv"], deps=["01_nifty"]),
+    Stage("02_sumaity", ["11_listing_normalizer.py", "sumaity"],
+          inputs=[*NORMALIZER_MODULES, "sumaity01.csv"], outputs=["sumaity02.csv"], deps=["01_sumaity"]),
+    # 出力ファイル名は 02 に決めさせず、21 と同じ SNAPSHOT_CSV を渡す（実行中に日付が変わっても揃う）
+    Stage("02_merge", ["02_merge_all_dataframe.py", "--merge-only", f"--output={SNAPSHOT_CSV}"],
+          inputs=[*MERGE_MODULES, "suumo02.csv", "sumaity02.csv", "nifty02.csv"],
+          outputs=[SNAPSHOT_CSV], deps=["02_suumo", "02_nifty", "02_sumaity"]),
+    # マスターは 07 も書き換えるため、21 の実行契機はスナップショット・重複クラスタ表・スクリプトの変化だけにする
+    # （価格変動履歴は変動があった月だけ作られるので、出力としては宣言しない）
+    Stage("21_master_compare", ["21_master_compare.py", SNAPSHOT_CSV],
+          inputs=[*COMPARE_MODULES, SNAPSHOT_CSV, CLUSTER_CSV],
+          outputs=[MASTER_CSV], deps=["02_merge"]),
+    Stage("07_master_check", ["07_master_check_updater.py"],
+          inputs=[*CHECK_MODULES, MASTER_CSV], outputs=[MASTER_CSV], deps=["21_master_compare"]),
+    # 重複クラスタ表は既存の表を引き継いで更新後のマスターの新しい重複を足し、次回の 21 で使う
+    Stage("25_duplicate_clusters", ["25_duplicate_matcher.py", "build"],
+          inputs=["25_duplicate_matcher.py", "13_text_normalizer.py", LOADER_MODULE, MASTER_CSV, CLUSTER_CSV],
+          outputs=[CLUSTER_CSV],
+          deps=["07_master_check"], required=False),
+]
+
 # =====================
-# ログ出力関数
+# ログ出力
 # =====================
+_log_lock = threading.Lock()
+_log_handle = open(LOG_FILE, "a", encoding="utf-8")
+
+
 def log(msg):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     line = f"[{timestamp}] {msg}"
-    print(line)
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    with _log_lock:
+        print(line, flush=True)
+        _log_handle.write(line + "\n")
+        _log_handle.flush()
+
+
+# =====================
+# 入力の変更判定
+# =====================
+def file_fingerprint(path, previous=None):
+    """mtime とサイズが前回と同じなら前回のハッシュを流用し、違えば SHA-256 を計算する。"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    if previous and previous.get("mtime") == stat.st_mtime and previous.get("size") == stat.st_size:
+        return previous
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest.hexdigest()}
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def skip_reason(stage, state, rerun_deps):
+    """ステージを省略できる場合はその理由を、実行が必要なら None を返す。"""
+    previous = state.get(stage.name)
+    if not previous:
+        return None
+    if rerun_deps:
+        return None
+    if stage.daily and previous.get("date") != TODAY.isoformat():
+        return None
+    if any(not os.path.exists(path) for path in stage.outputs):
+        return None
+
+    recorded = previous.get("inputs", {})
+    for path in stage.inputs:
+        current = file_fingerprint(path, recorded.get(path))
+        if current is None or recorded.get(path) is None:
+            return None
+        if current["sha256"] != recorded[path]["sha256"]:
+            return None
+    return "入力に変更なし"
+
+
+def count_rows(path):
+    """CSVのデータ行数（ヘッダー除く）。CSV以外・存在しない場合は None。"""
+    if not path.endswith(".csv") or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+# =====================
+# ステージ実行
+# =====================
+def run_stage(stage):
+    """子プロセスの出力を1行ずつログへ流しながら実行し、(リターンコード, 経過秒) を返す。"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [PYTHON_EXE, *stage.command],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        env={**os.environ, "PYTHONUNBUFFERED": "1", "PYTHONIOENCODING": "utf-8"},
+    )
+    for line in process.stdout:
+        log(f"[{stage.name}] {line.rstrip()}")
+    return process.wait(), time.perf_counter() - start
+
+
+def run_pipeline(stages, force=False, jobs=3):
+    state = load_state()
+    by_name = {stage.name: stage for stage in stages}
+    report: Dict[str, Dict] = {}
+    status: Dict[str, str] = {}  # done / skipped / failed / blocked
+    executed = set()  # 今回実行して成功したステージ（後続は省略しない）
+    running = {}
+
+    def ready(stage):
+        return stage.name not in status and stage.name not in running.values() and all(
+            dep in status for dep in stage.deps
+        )
+
+    def blocked_by(stage) -> Optional[str]:
+        for dep in stage.deps:
+            if status[dep] in {"failed", "blocked"} and by_name[dep].required:
+                return dep
+        return None
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while len(status) < len(stages):
+            for stage in stages:
+                if not ready(stage):
+                    continue
+
+                dep = blocked_by(stage)
+                if dep is not None:
+                    status[stage.name] = "blocked"
+                    report[stage.name] = {"status": "blocked", "blocked_by": dep}
+                    log(f"⏭ 実行せず（{dep} が失敗）: {stage.name}")
+                    continue
+
+                reason = None if force else skip_reason(
+                    stage, state, any(dep in executed for dep in stage.deps)
+                )
+                if reason:
+                    status[stage.name] = "skipped"
+                    report[stage.name] = {"status": "skipped", "reason": reason}
+                    log(f"⏭ 省略（{reason}）: {stage.name}")
+                    continue
+
+                log(f"--- 実行開始: {stage.name} ---")
+                running[executor.submit(run_stage, stage)] = stage.name
+
+            if not running:
+                continue
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+
+                try:
+                    returncode, elapsed = future.result()
+                    error = None
+                except Exception as e:
+                    returncode, elapsed = None, 0.0
+                    error = str(e)
+
+                rows = {path: count_rows(path) for path in stage.outputs}
+                report[name] = {"seconds": round(elapsed, 1), "rows": rows}
+
+                if returncode == 0:
+                    executed.add(name)
+                    status[name] = "done"
+                    report[name]["status"] = "done"
+                    recorded = state.get(name, {}).get("inputs", {})
+                    state[name] = {
+                        "date": TODAY.isoformat(),
+                        "inputs": {path: file_fingerprint(path, recorded.get(path)) for path in stage.inputs},
+                    }
+                    save_state(state)
+                    log(f"✔ 正常終了: {name} ({elapsed:.1f} 秒)")
+                else:
+                    status[name] = "failed"
+                    report[name]["status"] = "failed"
+                    report[name]["returncode"] = returncode
+                    if error:
+                        log(f"❌ 実行失敗（例外）: {name}")
+                        log(error)
+                    else:
+                        log(f"⚠ エラー終了: {name} (code={returncode})")
+
+    return report
+
+
+def write_report(report):
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    log("==== ステージ別 実行結果 ====")
+    for name, item in report.items():
+        rows = ", ".join(
+            f"{os.path.basename(path)}={count}" for path, count in item.get("rows", {}).items() if count is not None
+        )
+        seconds = f"{item['seconds']:.1f} 秒" if "seconds" in item else "-"
+        log(f"{name:<20} {item['status']:<8} {seconds:>10}  {rows}")
+    log(f"レポート: {REPORT_FILE}")
+
 
 # =====================
 # メイン処理
 # =====================
 if __name__ == "__main__":
-    log("==== スクレイピング一括実行 開始 ====")
-
-    for script in SCRIPTS:
-        log(f"--- 実行開始: {script} ---")
-
-        try:
-            result = subprocess.run(
-                [PYTHON_EXE, script],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=False  # エラーでも例外にしない
-            )
-
-            # 標準出力
-            if result.stdout:
-                log(f"[STDOUT] {script}\n{result.stdout.strip()}")
-
-            # エラー出力
-            if result.stderr:
-                log(f"[STDERR] {script}\n{result.stderr.strip()}")
-
-            if result.returncode != 0:
-                log(f"⚠ エラー終了（スキップ）: {script} (code={result.returncode})")
-            else:
-                log(f"✔ 正常終了: {script}")
-
-        except Exception as e:
-            log(f"❌ 実行失敗（例外・スキップ）: {script}")
-            log(str(e))
-
-    log("==== スクレイピング一括実行 終了 ====")
+    parser = argparse.ArgumentParser(description="日次処理の一括実行")
+    parser.add_argument("--force", action="store_true", help="入力が変わっていなくても全ステージを実行する")
+    parser.add_argument("--jobs", type=int, default=3, help="同時に実行するステージ数")
+    args = parser.parse_args()
+
+    log("==== 一括実行 開始 ====")
+    result = run_pipeline(STAGES, force=args.force, jobs=max(1, args.jobs))
+    write_report(result)
+    log("==== 一括実行 終了 ====")
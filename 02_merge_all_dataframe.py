@@ -1,24 +1,35 @@
 """
-02_suumo_dataframe.py
-02_sumaity_dataframe.py
-02_nifty_dataframe.py
-を順番に実行し、それぞれの 02.csv を結合して
+11_listing_normalizer.py（suumo / sumaity / nifty の 01.csv → 02.csv）を
+サイトごとに並列に実行し、全て終わったらそれぞれの 02.csv を結合して
 
   3data_YYMMDD.csv
 
 を出力する統合スクリプト。
 
+--merge-only を付けるとサブスクリプトを実行せず、既存の 02.csv の結合だけを行う。
+--stream を付けると 02.csv をチャンク単位で読み、全件をメモリに載せずに結合する
+（--chunksize=N で1チャンクの行数を指定。既定は 5000 行）。
+--output=PATH で出力ファイルを指定する（既定は実行日の 3data_YYMMDD.csv）。
+01_0run_all_scraping.py は日付をまたいでも後続の 21 と同じファイルになるよう、必ず指定して呼ぶ。
+
 ・沿線・駅 / 沿線 の全角英字は最終的に半角へ正規化（NFKC）
 ・同一URLが複数ある場合、販売価格の最小／最大を判定し
   「最小最大」列にフラグを付与する
 """
 
 import subprocess
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import sys
 import os
-import unicodedata
+import time
+
+from module_loader import load_module as _load_module
+
+
+_text = _load_module("13_text_normalizer.py")
 
 # =====================
 # 1. 実行日（ファイル名用）
@@ -27,12 +38,12 @@ today = datetime.now()
 date_str = today.strftime("%y%m%d")  # 例: 260108
 
 # =====================
-# 2. 実行するスクリプト（順番厳守）
+# 2. 実行するスクリプト（互いに依存しないため並列実行する）
 # =====================
 SCRIPTS = [
-    "02_suumo_dataframe.py",
-    "02_sumaity_dataframe.py",
-    "02_nifty_dataframe.py",
+    ["11_listing_normalizer.py", "suumo"],
+    ["11_listing_normalizer.py", "sumaity"],
+    ["11_listing_normalizer.py", "nifty"],
 ]
 
 # =====================
@@ -44,103 +55,276 @@ CSV_FILES = [
     "nifty02.csv",
 ]
 
+MERGE_ONLY = "--merge-only" in sys.argv[1:]
+STREAM = "--stream" in sys.argv[1:]
+
+DEFAULT_CHUNKSIZE = 5000
+
+
+def _chunksize_arg(argv):
+    for arg in argv:
+        if arg.startswith("--chunksize="):
+            return int(arg.split("=", 1)[1])
+    return DEFAULT_CHUNKSIZE
+
+
+CHUNKSIZE = _chunksize_arg(sys.argv[1:])
+
+
+def _output_arg(argv):
+    for arg in argv:
+        if arg.startswith("--output="):
+            return arg.split("=", 1)[1]
+    return f"3data_{date_str}.csv"
+
+
+OUTPUT_FILE = _output_arg(sys.argv[1:])
+
 # =====================
-# 4. サブスクリプトを順番に実行
+# 4. サブスクリプトを並列に実行
 # =====================
-for script in SCRIPTS:
-    print(f"▶ 実行中: {script}")
-
+def run_script(script):
+    """サブスクリプトを別プロセスで実行し、(結果, 経過秒) を返す。"""
+    start = time.perf_counter()
     result = subprocess.run(
-        [sys.executable, script],
+        [sys.executable, *script],
         capture_output=True,
         text=True
     )
+    return result, time.perf_counter() - start
 
-    if result.returncode != 0:
-        print("❌ エラー発生")
-        print(result.stderr)
-        raise RuntimeError(f"{script} の実行に失敗しました")
 
-    if result.stdout:
-        print(result.stdout)
+# =====================
+# 6. 全角英字 → 半角 正規化
+# =====================
+def normalize_ascii_column(series):
+    """
+    列のユニーク値だけ NFKC 正規化し、全行に展開する（13_text_normalizer.py の共有キャッシュを使う）。
+
+    沿線・駅 / 沿線 は行数に比べて表記の種類が少ないため、1行ずつ apply するより速い。
+    """
+    return _text.map_column(series, "ascii")
 
 # =====================
-# 5. CSV読み込み & 結合
+# 7. 販売価格を数値化（比較用）
 # =====================
-dfs = []
+PRICE_COL = "販売価格"
 
-for csv_file in CSV_FILES:
-    if not os.path.exists(csv_file):
-        raise FileNotFoundError(f"{csv_file} が見つかりません")
 
-    df = pd.read_csv(csv_file, encoding="utf-8-sig")
-    dfs.append(df)
+def parse_price(series):
+    """
+    販売価格を数値にする（読めないものは NaN）。
 
-df_all = pd.concat(dfs, ignore_index=True)
+    02.csv の販売価格は 11_listing_normalizer.py で万円単位の数値になっているので、
+    数値列ならそのまま使う。「1,980万円」などの文字列が混ざる場合だけ解析する。
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+    text = (
+        series
+        .astype(str)
+        .str.replace(",", "", regex=False)
+        .str.replace("万円", "", regex=False)
+    )
+    return pd.to_numeric(text, errors="coerce")
 
 # =====================
-# 6. 全角英字 → 半角 正規化
+# 8. 最小 / 最大 判定（URL単位）
 # =====================
-def normalize_ascii(text):
-    if pd.isna(text):
-        return text
-    return unicodedata.normalize("NFKC", str(text))
+def flag_min_max(df, price_col="_price_num"):
+    """
+    URLごとの件数・最小値・最大値を groupby transform で一度に求め、
+    「最小最大」列を付与する（同額の場合は「最小」を優先）。
+    """
+    grouped = df.groupby("URL")[price_col]
+    group_size = grouped.transform("size")
+    min_price = grouped.transform("min")
+    max_price = grouped.transform("max")
+
+    has_multi = group_size > 1
+    is_min = has_multi & (df[price_col] == min_price)
+    is_max = has_multi & (df[price_col] == max_price) & (max_price != min_price)
+
+    df["最小最大"] = ""
+    df.loc[is_max, "最小最大"] = "最大"
+    df.loc[is_min, "最小最大"] = "最小"
+    return df
 
-for col in ["沿線・駅", "沿線"]:
-    if col in df_all.columns:
-        df_all[col] = df_all[col].apply(normalize_ascii)
 
 # =====================
-# 7. 販売価格を数値化（比較用）
+# 9. 結合後の整形（正規化・最小最大・補助列削除 & 念のため重複削除）
 # =====================
-PRICE_COL = "販売価格"
+def merge_frames(dfs):
+    df_all = pd.concat(dfs, ignore_index=True)
+
+    for col in ["沿線・駅", "沿線"]:
+        if col in df_all.columns:
+            df_all[col] = normalize_ascii_column(df_all[col])
+
+    df_all["_price_num"] = parse_price(df_all[PRICE_COL])
+    df_all = flag_min_max(df_all)
 
-df_all["_price_num"] = (
-    df_all[PRICE_COL]
-    .astype(str)
-    .str.replace(",", "", regex=False)
-    .str.replace("万円", "", regex=False)
-)
+    df_all = df_all.drop(columns=["_price_num"])
+    df_all = df_all.drop_duplicates()
+    return df_all
 
-df_all["_price_num"] = pd.to_numeric(df_all["_price_num"], errors="coerce")
 
 # =====================
-# 8. 最小 / 最大 判定（URL単位）
+# 9'. ストリーミング結合（--stream）
 # =====================
-df_all["最小最大"] = ""
+def read_columns(csv_files):
+    """各 02.csv のヘッダーだけを読み、pd.concat と同じ順序で列の和集合を返す。"""
+    columns = []
+    for csv_file in csv_files:
+        for col in pd.read_csv(csv_file, encoding="utf-8-sig", nrows=0).columns:
+            if col not in columns:
+                columns.append(col)
+    return columns
 
-for url, g in df_all.groupby("URL"):
-    if len(g) <= 1:
-        continue
 
-    min_price = g["_price_num"].min()
-    max_price = g["_price_num"].max()
+def price_stats(csv_files, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    1パス目: URL と販売価格の2列だけをチャンクで読み、URLごとの件数・最小値・最大値を集計する。
 
-    # 同額の場合は「最小」を優先
-    df_all.loc[
-        (df_all["URL"] == url) & (df_all["_price_num"] == min_price),
-        "最小最大"
-    ] = "最小"
+    チャンクごとの集計をためておき、最後に1回だけまとめる（チャンクごとに全体を集計し直さない）。
+    メモリに残るのは URL の種類数に比例する集計表だけ。
+    """
+    partials = []
+    for csv_file in csv_files:
+        reader = pd.read_csv(
+            csv_file, encoding="utf-8-sig", usecols=["URL", PRICE_COL], dtype=str, chunksize=chunksize
+        )
+        for chunk in reader:
+            partials.append(
+                chunk.assign(_price_num=parse_price(chunk[PRICE_COL]))
+                .groupby("URL")["_price_num"]
+                .agg(["size", "min", "max"])
+            )
 
-    if max_price != min_price:
-        df_all.loc[
-            (df_all["URL"] == url) & (df_all["_price_num"] == max_price),
-            "最小最大"
-        ] = "最大"
+    if not partials:
+        return pd.DataFrame(columns=["size", "min", "max"])
+    if len(partials) == 1:
+        return partials[0]
+    return pd.concat(partials).groupby(level=0).agg({"size": "sum", "min": "min", "max": "max"})
+
+
+def flag_min_max_from_stats(df, stats, price_col="_price_num"):
+    """price_stats の集計表を URL で引いて「最小最大」列を付与する（flag_min_max と同じ判定）。"""
+    group_size = df["URL"].map(stats["size"])
+    min_price = df["URL"].map(stats["min"])
+    max_price = df["URL"].map(stats["max"])
+
+    has_multi = group_size > 1
+    is_min = has_multi & (df[price_col] == min_price)
+    is_max = has_multi & (df[price_col] == max_price) & (max_price != min_price)
+
+    df["最小最大"] = ""
+    df.loc[is_max, "最小最大"] = "最大"
+    df.loc[is_min, "最小最大"] = "最小"
+    return df
+
+
+def stream_merge(csv_files, output_file, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    02.csv をチャンク単位で結合して output_file に書き出し、出力件数を返す。
+
+    2パス目では各チャンクを正規化・最小最大判定したうえで、行の 64bit ハッシュで
+    重複を除いて追記する。ピークメモリはチャンクサイズと URL 集計表・ハッシュ集合で決まる。
+    値は文字列のまま読み書きするので、CSV 上の表記は入力のまま残る。
+    """
+    stats = price_stats(csv_files, chunksize)
+    columns = read_columns(csv_files)
+    if "最小最大" not in columns:
+        columns.append("最小最大")
+    seen = set()
+    written = 0
+
+    with open(output_file, "w", encoding="utf-8-sig", newline="") as out:
+        pd.DataFrame(columns=columns).to_csv(out, index=False)
+
+        for csv_file in csv_files:
+            for chunk in pd.read_csv(csv_file, encoding="utf-8-sig", dtype=str, chunksize=chunksize):
+                chunk = chunk.reindex(columns=columns)
+                for col in ["沿線・駅", "沿線"]:
+                    if col in chunk.columns:
+                        chunk[col] = normalize_ascii_column(chunk[col])
+
+                chunk["_price_num"] = parse_price(chunk[PRICE_COL])
+                chunk = flag_min_max_from_stats(chunk, stats).drop(columns=["_price_num"])
+
+                # isin(seen) は毎回 seen 全体を配列に変換するので、チャンクの行ごとに set を引く
+                hashes = pd.util.hash_pandas_object(chunk, index=False)
+                known = np.fromiter((h in seen for h in hashes.tolist()), dtype=bool, count=len(hashes))
+                keep = ~hashes.duplicated().to_numpy() & ~known
+                seen.update(hashes[keep].tolist())
+                chunk = chunk[keep]
+
+                chunk.to_csv(out, header=False, index=False)
+                written += len(chunk)
+
+    return written
 
-# =====================
-# 9. 補助列削除 & 念のため重複削除
-# =====================
-df_all = df_all.drop(columns=["_price_num"])
-df_all = df_all.drop_duplicates()
 
 # =====================
-# 10. 最終CSV出力
+# 5〜10. 実行（サブスクリプト → CSV読み込み & 結合 → 最終CSV出力）
 # =====================
-output_file = f"3data_{date_str}.csv"
-df_all.to_csv(output_file, index=False, encoding="utf-8-sig")
+def main():
+    stage_start = time.perf_counter()
+    if MERGE_ONLY:
+        print("▶ --merge-only: サブスクリプトの実行を省略")
+        results = []
+    else:
+        print(f"▶ 並列実行中: {', '.join(' '.join(script) for script in SCRIPTS)}")
+
+        # 各スクリプトは別プロセスで動くので、待ち合わせ用のスレッドで同時に起動する
+        with ThreadPoolExecutor(max_workers=len(SCRIPTS)) as executor:
+            results = list(executor.map(run_script, SCRIPTS))
+
+    failed = []
+    for script, (result, elapsed) in zip(SCRIPTS, results):
+        status = "✔" if result.returncode == 0 else "❌"
+        print(f"{status} {' '.join(script)}: {elapsed:.1f} 秒")
+
+        if result.stdout:
+            print(result.stdout)
+
+        if result.returncode != 0:
+            print("❌ エラー発生")
+            print(result.stderr)
+            failed.append(" ".join(script))
+
+    if results:
+        print(f"⏱ 02 データフレーム作成（並列）: {time.perf_counter() - stage_start:.1f} 秒")
+
+    if failed:
+        raise RuntimeError(f"{', '.join(failed)} の実行に失敗しました")
+
+    merge_start = time.perf_counter()
+
+    for csv_file in CSV_FILES:
+        if not os.path.exists(csv_file):
+            raise FileNotFoundError(f"{csv_file} が見つかりません")
+
+    output_file = OUTPUT_FILE
+
+    if STREAM:
+        print(f"▶ --stream: {CHUNKSIZE} 行ずつ結合")
+        count = stream_merge(CSV_FILES, output_file, CHUNKSIZE)
+    else:
+        # 5. CSV読み込み & 結合
+        dfs = [pd.read_csv(csv_file, encoding="utf-8-sig") for csv_file in CSV_FILES]
+        df_all = merge_frames(dfs)
+
+        # 10. 最終CSV出力
+        df_all.to_csv(output_file, index=False, encoding="utf-8-sig")
+        count = len(df_all)
+
+    print("===================================")
+    print(f"✅ 完了: {output_file}")
+    print(f"件数: {count}")
+    print(f"結合処理: {time.perf_counter() - merge_start:.1f} 秒")
+    print("===================================")
+
 
-print("===================================")
-print(f"✅ 完了: {output_file}")
-print(f"件数: {len(df_all)}")
-print("===================================")
+if __name__ == "__main__":
+    main()
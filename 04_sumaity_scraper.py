@@ -2,75 +2,23 @@
 
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
-import requests
-from bs4 import BeautifulSoup
+from module_loader import load_module as _load_module
 
-DEFAULT_HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-}
-REQUEST_TIMEOUT = 10
 
+_http = _load_module("08_http_client.py")
+_tables = _load_module("10_table_parser.py")
 
-def _load_html(url: str) -> str:
-    if url.startswith("file://"):
-        return Path(url.replace("file://", "")).read_text(encoding="utf-8")
-
-    path = Path(url)
-    if path.exists():
-        return path.read_text(encoding="utf-8")
-
-    response = requests.get(url, headers=DEFAULT_HEADERS, timeout=REQUEST_TIMEOUT)
-    response.raise_for_status()
-    response.encoding = response.apparent_encoding
-    return response.text
-
-
-def _extract_table_data(soup: BeautifulSoup) -> Dict[str, str]:
-    table_data: Dict[str, str] = {}
-
-    for row in soup.select("tr"):
-        headers = row.find_all("th")
-        values = row.find_all("td")
-
-        if not headers or not values:
-            continue
-
-        if len(headers) == len(values):
-            pairs = zip(headers, values)
-        else:
-            pairs = zip(headers, values[: len(headers)])
-
-        for header, value in pairs:
-            key = header.get_text(" ", strip=True)
-            val = value.get_text(" ", strip=True)
-            if key:
-                table_data[key] = val
-
-    return table_data
-
-
-def _find_table_value(table_data: Dict[str, str], label: str) -> str:
-    if label in table_data:
-        return table_data[label]
-
-    for key, value in table_data.items():
-        if label in key:
-            return value
-    return ""
+# 抽出処理を変えたら上げる（以前の解析結果キャッシュは使われなくなる）
+PARSER_VERSION = 1
 
 
 def _is_used_property(url: str) -> bool:
     return "/house/used" in url
 
 
-def _is_new_property(url: str) -> bool:
-    return "/house_new" in url
-
-
-def scrape_sumaity_property(url: str) -> Dict[str, str]:
+def scrape_sumaity_property(url: str, listing: Optional[str] = None) -> Dict[str, str]:
     """
     SUMAITY物件ページから以下の情報を抽出してJSON風の辞書で返す。
 
@@ -78,28 +26,34 @@ def scrape_sumaity_property(url: str) -> Dict[str, str]:
     - 建ぺい率・容積率
     - 構造・工法
     - 用途地域
+
+    listing（"used" / "new" など）は 06 の振り分けで判定済みの物件種別。
+    省略した場合は URL から判定する。
     """
+    is_used = listing == "used" if listing is not None else _is_used_property(url)
 
-    html = _load_html(url)
-    soup = BeautifulSoup(html, "html.parser")
-    table_data = _extract_table_data(soup)
+    # 中古/新築で読む項目が違うため、解析結果キャッシュも分ける
+    namespace = "sumaity_used" if is_used else "sumaity"
+    return _http.fetch_and_parse(url, namespace, lambda html: _parse_sumaity_html(html, is_used), PARSER_VERSION)
 
-    is_used = _is_used_property(url)
-    is_new = _is_new_property(url)
 
+def _parse_sumaity_html(html: str, is_used: bool) -> Dict[str, str]:
     road_label = "接道状況" if is_used else "接道"
     structure_label = "構造/階建" if is_used else "建物階"
+    ratio_labels = ["建ぺい率", "容積率"] if is_used else ["建ぺい率 / 容積率"]
+
+    table = _tables.table_lookup(html, [road_label, structure_label, "用途地域", *ratio_labels])
 
     if is_used:
-        building_ratio = _find_table_value(table_data, "建ぺい率")
-        volume_ratio = _find_table_value(table_data, "容積率")
+        building_ratio = table.get("建ぺい率")
+        volume_ratio = table.get("容積率")
         ratio_value = "、".join(filter(None, [building_ratio, volume_ratio]))
     else:
-        ratio_value = _find_table_value(table_data, "建ぺい率 / 容積率")
+        ratio_value = table.get("建ぺい率 / 容積率")
 
     return {
-        "私道負担・道路": _find_table_value(table_data, road_label),
+        "私道負担・道路": table.get(road_label),
         "建ぺい率・容積率": ratio_value,
-        "構造・工法": _find_table_value(table_data, structure_label),
-        "用途地域": _find_table_value(table_data, "用途地域"),
+        "構造・工法": table.get(structure_label),
+        "用途地域": table.get("用途地域"),
     }
@@ -2,31 +2,71 @@
 
 from __future__ import annotations
 
-import importlib.util
-from pathlib import Path
-from typing import Callable, Dict
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
 
-BASE_DIR = Path(__file__).resolve().parent
+from module_loader import load_module as _load_module
 
 
-def _load_function(file_name: str, function_name: str) -> Callable[[str], Dict[str, str]]:
-    module_path = BASE_DIR / file_name
-    spec = importlib.util.spec_from_file_location(module_path.stem, module_path)
-    if spec is None or spec.loader is None:
-        raise ImportError(f"Failed to load module: {module_path}")
+# =====================
+# スクレイパーの遅延読み込み
+# =====================
+# サイト名 -> (ファイル名, 関数名)。各スクレイパーは最初に使われたときに読み込む
+SCRAPER_MODULES: Dict[str, Tuple[str, str]] = {
+    "suumo": ("03_suumo_scraper.py", "scrape_suumo_property"),
+    "sumaity": ("04_sumaity_scraper.py", "scrape_sumaity_property"),
+    "nifty": ("05_nifty_scraper.py", "scrape_nifty_property"),
+}
+
+_scrapers: Dict[str, Callable[[str], Dict[str, str]]] = {}
+_import_seconds: Dict[str, float] = {}
+_scrapers_lock = threading.Lock()
+
 
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
+def get_scraper(site: str) -> Callable[[str], Dict[str, str]]:
+    """サイトのスクレイパー関数を返す（初回だけ読み込み、以降はプロセス内で使い回す）。"""
+    func = _scrapers.get(site)
+    if func is not None:
+        return func
 
-    func = getattr(module, function_name, None)
-    if not callable(func):
-        raise AttributeError(f"Function '{function_name}' was not found in {file_name}")
+    with _scrapers_lock:
+        func = _scrapers.get(site)
+        if func is None:
+            file_name, function_name = SCRAPER_MODULES[site]
+            start = time.perf_counter()
+            module = _load_module(file_name)
+            _import_seconds[site] = time.perf_counter() - start
+
+            func = getattr(module, function_name, None)
+            if not callable(func):
+                raise AttributeError(f"Function '{function_name}' was not found in {file_name}")
+            _scrapers[site] = func
     return func
 
 
-scrape_suumo_property = _load_function("03_suumo_scraper.py", "scrape_suumo_property")
-scrape_sumaity_property = _load_function("04_sumaity_scraper.py", "scrape_sumaity_property")
-scrape_nifty_property = _load_function("05_nifty_scraper.py", "scrape_nifty_property")
+def import_times() -> Dict[str, float]:
+    """
+    読み込み済みスクレイパーごとの読み込み時間（秒）。
+    共有モジュールの読み込みは、先に読まれていなければ最初のサイトに含まれる（並列取得では 08 は先に読む）。
+    """
+    return dict(_import_seconds)
+
+
+def scrape_suumo_property(url: str) -> Dict[str, str]:
+    return get_scraper("suumo")(url)
+
+
+def scrape_sumaity_property(url: str) -> Dict[str, str]:
+    return get_scraper("sumaity")(url)
+
+
+def scrape_nifty_property(url: str) -> Dict[str, str]:
+    return get_scraper("nifty")(url)
 
 
 EMPTY_DATA = {
@@ -37,18 +77,186 @@ EMPTY_DATA = {
 }
 
 
+# =====================
+# URL の振り分け
+# =====================
+LISTING_NEW = "new"
+LISTING_USED = "used"
+LISTING_LAND = "land"
+
+# ホスト -> サイト名
+HOST_SITES: Dict[str, str] = {
+    "suumo.jp": "suumo",
+    "sumaity.com": "sumaity",
+    "myhome.nifty.com": "nifty",
+}
+
+# サイトごとのパスの先頭 -> 物件種別（一致しない場合は種別なしでサイトのスクレイパーに渡す）
+LISTING_PATHS: Dict[str, Dict[str, str]] = {
+    "suumo": {"ikkodate": LISTING_NEW, "chukoikkodate": LISTING_USED, "tochi": LISTING_LAND},
+    "sumaity": {"house_new": LISTING_NEW, "house/used": LISTING_USED, "land": LISTING_LAND},
+    "nifty": {"shinchiku-ikkodate": LISTING_NEW, "chuko-ikkodate": LISTING_USED, "tochi": LISTING_LAND},
+}
+
+_LISTING_PATTERNS: Dict[str, "re.Pattern[str]"] = {
+    site: re.compile(
+        "^/(?:" + "|".join(f"(?P<{listing}>{re.escape(path)})" for path, listing in paths.items()) + ")/"
+    )
+    for site, paths in LISTING_PATHS.items()
+}
+
+
+class Route(NamedTuple):
+    url: str
+    host: Optional[str]  # HOST_SITES のキー（未対応ホストは None）
+    site: Optional[str]
+    listing: Optional[str]
+
+
+def parse_route(url: str) -> Route:
+    """URLを1回だけ解析し、サイトと物件種別を決める。"""
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    site = HOST_SITES.get(host)
+    while site is None and "." in host:
+        host = host.split(".", 1)[1]
+        site = HOST_SITES.get(host)
+    if site is None:
+        return Route(url, None, None, None)
+
+    m = _LISTING_PATTERNS[site].match(parsed.path)
+    return Route(url, host, site, m.lastgroup if m else None)
+
+
+_route_counts: Counter = Counter()
+_route_counts_lock = threading.Lock()
+
+
+def _count_route(route: Route) -> None:
+    key = f"{route.site}/{route.listing or '-'}" if route.site else "unknown_host"
+    with _route_counts_lock:
+        _route_counts[key] += 1
+
+
+def route_counts() -> Dict[str, int]:
+    """振り分け結果の件数（"サイト/種別"、未対応ホストは "unknown_host"）。"""
+    with _route_counts_lock:
+        return dict(_route_counts)
+
+
+def route_many(urls: Iterable[str]) -> Dict[Optional[str], List[Route]]:
+    """URLをまとめて振り分け、サイトごと（未対応ホストは None）に入力順のまま分ける。"""
+    grouped: Dict[Optional[str], List[Route]] = {}
+    for url in urls:
+        route = parse_route(url)
+        grouped.setdefault(route.site, []).append(route)
+    return grouped
+
+
+def scrape_route(route: Route) -> Dict[str, str]:
+    _count_route(route)
+    if route.site is None:
+        return EMPTY_DATA.copy()
+    scraper = get_scraper(route.site)
+    # sumaity は中古と新築で読む項目が違うため、判定済みの種別を渡す（URL を読み直さない）
+    if route.site == "sumaity":
+        return scraper(route.url, listing=route.listing)
+    return scraper(route.url)
+
+
 def scrape_3site_property(url: str) -> Dict[str, str]:
-    """URLに含まれるドメインに応じて各サイトのスクレイパーを呼び分ける。"""
-    if "https://suumo.jp/" in url:
-        print("[scrape_3site_property] suumoの条件に一致したため、scrape_suumo_propertyを実行します。")
-        return scrape_suumo_property(url)
+    """URLのホストと物件種別に応じて各サイトのスクレイパーを呼び分ける。"""
+    return scrape_route(parse_route(url))
+
+
+# =====================
+# 並列取得（ドメイン別の同時接続数・最小リクエスト間隔）
+# =====================
+DOMAIN_LIMITS: Dict[str, Dict[str, float]] = {
+    "suumo.jp": {"max_concurrency": 2, "min_interval": 1.0},
+    "sumaity.com": {"max_concurrency": 2, "min_interval": 1.0},
+    "myhome.nifty.com": {"max_concurrency": 2, "min_interval": 1.0},
+}
+
+ScrapeResult = Tuple[str, Optional[Dict[str, str]], Optional[Exception]]
+
+
+class _DomainThrottle:
+    """
+    同一ドメインへのリクエスト開始間隔を min_interval 秒以上に保つ。
+
+    wait() は 08 の request_gate から実際にリクエストを送る直前に呼ばれる。
+    09 のキャッシュから返すページ（TTL内・オフライン）では待たない。
+    """
+
+    def __init__(self, min_interval: float) -> None:
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.min_interval
+        delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _scrape_safely(route: Route, throttle: Optional[_DomainThrottle]) -> ScrapeResult:
+    try:
+        if throttle is None:
+            return route.url, scrape_route(route), None
+        with _load_module("08_http_client.py").request_gate(throttle.wait):
+            return route.url, scrape_route(route), None
+    except Exception as exc:
+        return route.url, None, exc
+
+
+def scrape_3site_many(urls: Iterable[str], concurrent: bool = True) -> Iterator[ScrapeResult]:
+    """
+    複数URLをスクレイピングし、入力順に (url, 結果dict, 例外) を返す。
+
+    concurrent=True の場合はドメインごとのスレッドプールで並列取得する。
+    各ドメインの同時接続数と最小リクエスト間隔は DOMAIN_LIMITS に従う。
+    間隔を空けるのは実際に通信する取得だけで、キャッシュから返すページは待たずに処理する。
+    """
+    if not concurrent:
+        for url in urls:
+            yield _scrape_safely(parse_route(url), None)
+        return
 
-    if "https://sumaity.com/" in url:
-        print("[scrape_3site_property] sumaityの条件に一致したため、scrape_sumaity_propertyを実行します。")
-        return scrape_sumaity_property(url)
+    executors = {
+        domain: ThreadPoolExecutor(
+            max_workers=int(limits["max_concurrency"]),
+            thread_name_prefix=f"scrape-{domain}",
+        )
+        for domain, limits in DOMAIN_LIMITS.items()
+    }
+    throttles = {
+        domain: _DomainThrottle(float(limits["min_interval"]))
+        for domain, limits in DOMAIN_LIMITS.items()
+    }
+    # 結果は入力順に返すため、先読みする件数を制限してメモリと中断時の無駄を抑える
+    window = 4 * sum(int(limits["max_concurrency"]) for limits in DOMAIN_LIMITS.values())
+    pending: Deque[Future] = deque()
 
-    if "https://myhome.nifty.com/" in url:
-        print("[scrape_3site_property] niftyの条件に一致したため、scrape_nifty_propertyを実行します。")
-        return scrape_nifty_property(url)
+    def submit(url: str) -> Future:
+        route = parse_route(url)
+        if route.host not in executors:
+            future: Future = Future()
+            future.set_result(_scrape_safely(route, None))
+            return future
+        return executors[route.host].submit(_scrape_safely, route, throttles[route.host])
 
-    return EMPTY_DATA.copy()
+    try:
+        for url in urls:
+            pending.append(submit(url))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -1,14 +1,55 @@
-"""3data_master.csv を上から順に更新する。"""
+"""90_3data_master.csv を上から順に更新する。
+
+1行ごとにマスター全体を書き直す代わりに、処理結果をチェックポイント
+ジャーナル（追記専用のJSON Lines）へ1行ずつ書き出し、一定件数ごと
+および終了時にマスターへまとめて反映（コンパクション）する。
+途中で停止した場合は、次回起動時にジャーナルを再生してから続きを処理する。
+
+環境変数 MASTER_BACKEND=sqlite の場合は 23_master_db.py の SQLite マスターから
+対象行だけを索引で取り出し、1行ずつ UPDATE する（CSV は終了時に書き出す）。
+
+取得する行は上から順ではなく、優先度付きキューで1晩の取得件数（DAILY_FETCH_BUDGET）まで選ぶ。
+  1. 未チェックの新規行（追加年月日が新しい順）
+  2. 最後のチェック以降に価格が変わった行（price_history/）
+  3. check=not の行（失敗回数に応じて再試行の間隔を空ける）
+  4. 最後のチェックから REVERIFY_AFTER_DAYS 日以上経った check=ok の行（古い順）
+行ごとの失敗回数・最終チェック日は CHECK_STATE_PATH に保存する。
+"""
 
 from __future__ import annotations
 
 import csv
-import importlib.util
+import heapq
+import json
+import os
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, NamedTuple, Optional, TextIO
+
+from module_loader import load_module as _load_module
 
 BASE_DIR = Path(__file__).resolve().parent
-CSV_PATH = BASE_DIR / "3data_master.csv"
+CSV_PATH = BASE_DIR / "90_3data_master.csv"
+JOURNAL_PATH = CSV_PATH.with_name(CSV_PATH.name + ".journal")
+DB_PATH = CSV_PATH.with_suffix(".sqlite3")
+CHECK_STATE_PATH = CSV_PATH.with_name(CSV_PATH.stem + ".check_state.json")
+PRICE_HISTORY_DIR = BASE_DIR / "price_history"
+
+# この件数だけジャーナルに溜まったらマスターへ反映する
+COMPACT_EVERY = 200
+
+# True の場合、ドメイン別の同時接続数・間隔制限付きで並列取得する（06 の DOMAIN_LIMITS）
+CONCURRENT_FETCH = True
+
+# 1回の実行で取得する最大件数（優先度の高い行から使う）
+DAILY_FETCH_BUDGET = 300
+
+# check=not の再試行間隔（日）: 失敗1回目は1日後、以降は倍々で最大 MAX_RETRY_BACKOFF_DAYS
+RETRY_BACKOFF_DAYS = 1
+MAX_RETRY_BACKOFF_DAYS = 30
+
+# check=ok の行を再確認するまでの日数
+REVERIFY_AFTER_DAYS = 30
 
 TARGET_FIELDS = [
     "私道負担・道路",
@@ -18,19 +59,13 @@ TARGET_FIELDS = [
 ]
 
 
-def _load_scrape_function():
-    module_path = BASE_DIR / "06_3site_scraper.py"
-    spec = importlib.util.spec_from_file_location(module_path.stem, module_path)
-    if spec is None or spec.loader is None:
-        raise ImportError(f"{module_path} の読み込みに失敗しました")
+def _load_scraper_module():
+    module = _load_module("06_3site_scraper.py")
 
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-
-    scrape_func = getattr(module, "scrape_3site_property", None)
-    if not callable(scrape_func):
-        raise AttributeError("scrape_3site_property が見つかりません")
-    return scrape_func
+    for name in ("scrape_3site_property", "scrape_3site_many", "import_times", "route_counts"):
+        if not callable(getattr(module, name, None)):
+            raise AttributeError(f"{name} が見つかりません")
+    return module
 
 
 def _read_csv(path: Path) -> tuple[List[str], List[Dict[str, str]]]:
@@ -43,10 +78,13 @@ def _read_csv(path: Path) -> tuple[List[str], List[Dict[str, str]]]:
 
 
 def _write_csv(path: Path, fieldnames: List[str], rows: List[Dict[str, str]]) -> None:
-    with path.open("w", encoding="utf-8-sig", newline="") as f:
+    """一時ファイルに書き出してから置き換え、書き込み途中の停止でマスターを壊さない。"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8-sig", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(rows)
+    os.replace(tmp_path, path)
 
 
 def _is_blank(value: str | None) -> bool:
@@ -59,45 +97,352 @@ def _all_target_fields_blank(scraped: Dict[str, str] | None) -> bool:
     return all(_is_blank(scraped.get(field)) for field in TARGET_FIELDS)
 
 
-def main() -> None:
-    scrape_3site_property = _load_scrape_function()
-    fieldnames, rows = _read_csv(CSV_PATH)
+# =====================
+# チェックポイントジャーナル
+# =====================
+def _row_key(row: Dict[str, str]) -> str:
+    """ジャーナルとマスター行を対応付けるキー（物件ID優先、なければURL）。"""
+    property_id = (row.get("物件ID", "") or "").strip()
+    if property_id:
+        return f"id:{property_id}"
+    return f"url:{(row.get('URL', '') or '').strip()}"
 
-    for index, row in enumerate(rows):
-        deleted_at = row.get("削除年月日", "")
-        check_value = (row.get("check", "") or "").strip().lower()
 
-        if not _is_blank(deleted_at):
-            row["check"] = "cannot"
-            _write_csv(CSV_PATH, fieldnames, rows)
-            continue
+def _journal_record(row: Dict[str, str]) -> Dict[str, str]:
+    record = {
+        "物件ID": row.get("物件ID", "") or "",
+        "URL": row.get("URL", "") or "",
+        "check": row.get("check", "") or "",
+    }
+    for field in TARGET_FIELDS:
+        record[field] = row.get(field, "") or ""
+    return record
+
+
+def _replay_journal(path: Path, rows: List[Dict[str, str]]) -> int:
+    """前回中断時のジャーナルをマスター行へ再適用し、適用件数を返す。"""
+    if not path.exists():
+        return 0
+
+    index = {_row_key(row): row for row in rows}
+    applied = 0
 
-        if check_value in {"cannot", "ok"}:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 書き込み途中で止まった末尾行は捨てる
+                continue
+
+            row = index.get(_row_key(record))
+            if row is None:
+                continue
+
+            row["check"] = record.get("check", "")
+            for field in TARGET_FIELDS:
+                if field in record:
+                    row[field] = record[field]
+            applied += 1
+
+    return applied
+
+
+class CheckpointJournal:
+    """処理済み行を1件ずつ追記し、一定件数ごとにマスターへ反映する。"""
+
+    def __init__(
+        self,
+        journal_path: Path,
+        csv_path: Path,
+        fieldnames: List[str],
+        rows: List[Dict[str, str]],
+        compact_every: int = COMPACT_EVERY,
+    ) -> None:
+        self.journal_path = journal_path
+        self.csv_path = csv_path
+        self.fieldnames = fieldnames
+        self.rows = rows
+        self.compact_every = max(1, compact_every)
+        self.pending = 0
+        self._file: TextIO = journal_path.open("a", encoding="utf-8")
+
+    def record(self, row: Dict[str, str]) -> None:
+        self._file.write(json.dumps(_journal_record(row), ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def compact(self) -> None:
+        """マスターを書き直してからジャーナルを空にする。"""
+        _write_csv(self.csv_path, self.fieldnames, self.rows)
+        self._file.close()
+        self._file = self.journal_path.open("w", encoding="utf-8")
+        self.pending = 0
+
+    def close(self) -> None:
+        if self.pending:
+            self.compact()
+        self._file.close()
+        if self.journal_path.exists() and self.journal_path.stat().st_size == 0:
+            self.journal_path.unlink()
+
+
+class SqliteMasterWriter:
+    """SQLite マスターへ1行ずつ反映し、終了時に CSV を書き出す。"""
+
+    def __init__(self, db_module, conn, csv_path: Path) -> None:
+        self.db = db_module
+        self.conn = conn
+        self.csv_path = csv_path
+        self.updated = 0
+
+    def record(self, row: Dict[str, str]) -> None:
+        self.db.update_check(self.conn, row, TARGET_FIELDS)
+        self.updated += 1
+
+    def close(self) -> None:
+        if self.updated:
+            self.db.export_csv(self.conn, self.csv_path)
+        self.conn.close()
+
+
+# =====================
+# 再チェックの優先度（スケジューラ）
+# =====================
+PRIORITY_NEW = 0
+PRIORITY_PRICE_CHANGED = 1
+PRIORITY_RETRY = 2
+PRIORITY_REVERIFY = 3
+
+PRIORITY_LABELS = {
+    PRIORITY_NEW: "新規",
+    PRIORITY_PRICE_CHANGED: "価格変動",
+    PRIORITY_RETRY: "再試行",
+    PRIORITY_REVERIFY: "再確認",
+}
+
+
+def _parse_date(value: str | None) -> Optional[date]:
+    text = (value or "").strip()
+    for fmt in ("%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
             continue
+    return None
+
+
+def _ordinal(value: Optional[date]) -> int:
+    return value.toordinal() if value else 0
+
+
+def retry_backoff_days(failures: int) -> int:
+    if failures <= 0:
+        return 0
+    return min(RETRY_BACKOFF_DAYS * 2 ** (failures - 1), MAX_RETRY_BACKOFF_DAYS)
+
+
+class CheckState:
+    """行ごとの失敗回数・最終試行日・最終成功日（JSON、キーは _row_key）。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, row: Dict[str, str]) -> Dict:
+        return self.entries.get(_row_key(row), {})
+
+    def record(self, row: Dict[str, str], success: bool, today: date) -> None:
+        entry = self.entries.setdefault(_row_key(row), {})
+        entry["last_attempt"] = today.isoformat()
+        if success:
+            entry["failures"] = 0
+            entry["last_checked"] = today.isoformat()
+        else:
+            entry["failures"] = entry.get("failures", 0) + 1
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=0)
+        os.replace(tmp_path, self.path)
+
+
+class ScheduledRow(NamedTuple):
+    sort_key: tuple
+    priority: int
+    index: int
+    row: Dict[str, str]
+
+
+def _last_price_changes() -> Dict[str, date]:
+    """物件IDごとの最新の価格変動日（price_history/ がなければ空）。"""
+    history = _load_module("24_price_history.py")
+    df = history.read_history(PRICE_HISTORY_DIR)
+    latest: Dict[str, date] = {}
+    for property_id, changed_at in zip(df["物件ID"], df["変化年月日"]):
+        changed = _parse_date(str(changed_at))
+        if changed and (property_id not in latest or changed > latest[property_id]):
+            latest[property_id] = changed
+    return latest
+
+
+def _schedule_entry(
+    index: int,
+    row: Dict[str, str],
+    state: CheckState,
+    price_changes: Dict[str, date],
+    today: date,
+) -> Optional[ScheduledRow]:
+    """行の優先度を決める（今回取得しない行は None）。"""
+    check_value = (row.get("check", "") or "").strip().lower()
+    entry = state.get(row)
+    last_checked = _parse_date(entry.get("last_checked"))
+    last_attempt = _parse_date(entry.get("last_attempt"))
+    failures = int(entry.get("failures", 0))
+
+    def scheduled(priority: int, *order) -> ScheduledRow:
+        return ScheduledRow((priority, *order, index), priority, index, row)
+
+    changed_at = price_changes.get((row.get("物件ID", "") or "").strip())
+    if check_value == "" and failures == 0:
+        return scheduled(PRIORITY_NEW, -_ordinal(_parse_date(row.get("追加年月日"))))
+    # 価格変動後にまだ取得を試みていない行（失敗した場合は以降 check=not の再試行に回る）
+    if changed_at and (last_attempt is None or changed_at > last_attempt):
+        return scheduled(PRIORITY_PRICE_CHANGED, -_ordinal(changed_at))
+    if check_value in {"not", ""}:
+        if last_attempt and today < last_attempt + timedelta(days=retry_backoff_days(failures)):
+            return None
+        return scheduled(PRIORITY_RETRY, failures, _ordinal(last_attempt))
+    if check_value == "ok":
+        if last_checked and today < last_checked + timedelta(days=REVERIFY_AFTER_DAYS):
+            return None
+        return scheduled(PRIORITY_REVERIFY, _ordinal(last_checked))
+    return None
+
+
+def build_schedule(
+    candidates: List[tuple[int, Dict[str, str]]],
+    state: CheckState,
+    price_changes: Dict[str, date],
+    today: date,
+    budget: int = DAILY_FETCH_BUDGET,
+) -> List[ScheduledRow]:
+    """優先度の高い順に、最大 budget 件の取得対象を返す。"""
+    entries = (_schedule_entry(index, row, state, price_changes, today) for index, row in candidates)
+    return heapq.nsmallest(
+        max(0, budget), (entry for entry in entries if entry is not None), key=lambda entry: entry.sort_key
+    )
+
+
+def _open_master():
+    """マスターの処理候補行と、処理結果の書き込み先を返す。"""
+    master_db = _load_module("23_master_db.py")
+    if master_db.ENABLED:
+        conn = master_db.connect(DB_PATH)
+        if not master_db.has_master(conn):
+            master_db.import_csv(conn, CSV_PATH)
+        return master_db.check_targets(conn, include_ok=True), SqliteMasterWriter(master_db, conn, CSV_PATH)
+
+    fieldnames, rows = _read_csv(CSV_PATH)
+
+    replayed = _replay_journal(JOURNAL_PATH, rows)
+    if replayed:
+        print(f"ジャーナルから {replayed} 件を復元しました: {JOURNAL_PATH.name}")
+        _write_csv(CSV_PATH, fieldnames, rows)
+        JOURNAL_PATH.unlink()
+
+    return rows, CheckpointJournal(JOURNAL_PATH, CSV_PATH, fieldnames, rows)
+
+
+def main() -> None:
+    scraper = _load_scraper_module()
+    rows, journal = _open_master()
+    state = CheckState(CHECK_STATE_PATH)
+    today = date.today()
+    try:
+        # 取得不要な行はその場で確定し、取得候補の行だけを集める
+        candidates: List[tuple[int, Dict[str, str]]] = []
+        for index, row in enumerate(rows):
+            deleted_at = row.get("削除年月日", "")
+            check_value = (row.get("check", "") or "").strip().lower()
+
+            if not _is_blank(deleted_at):
+                if check_value != "cannot":
+                    row["check"] = "cannot"
+                    journal.record(row)
+                continue
+
+            if check_value not in {"not", "", "ok"}:
+                continue
 
-        if check_value in {"not", ""}:
             url = (row.get("URL", "") or "").strip()
             if _is_blank(url):
-                row["check"] = "not"
-                _write_csv(CSV_PATH, fieldnames, rows)
+                if check_value == "":
+                    row["check"] = "not"
+                    journal.record(row)
                 continue
+            candidates.append((index, row))
 
-            try:
-                scraped = scrape_3site_property(url)
-            except Exception as exc:
-                print(f"[{index}] スクレイピング失敗: {url} ({exc})")
-                row["check"] = "not"
-                _write_csv(CSV_PATH, fieldnames, rows)
+        schedule = build_schedule(candidates, state, _last_price_changes(), today, DAILY_FETCH_BUDGET)
+        counts = {label: 0 for label in PRIORITY_LABELS.values()}
+        for item in schedule:
+            counts[PRIORITY_LABELS[item.priority]] += 1
+        print(
+            f"取得対象: {len(schedule)} 件 / 候補 {len(candidates)} 件 (上限 {DAILY_FETCH_BUDGET}) "
+            + " ".join(f"{label}={count}" for label, count in counts.items())
+        )
+
+        urls = [(item.row.get("URL", "") or "").strip() for item in schedule]
+        results = scraper.scrape_3site_many(urls, concurrent=CONCURRENT_FETCH)
+
+        # 結果は優先度順（入力順）に返る
+        for item, (url, scraped, exc) in zip(schedule, results):
+            row = item.row
+            if exc is not None:
+                print(f"[{item.index}] スクレイピング失敗: {url} ({exc})")
+                state.record(row, success=False, today=today)
+                # 再確認で失敗した ok 行は前回の取得内容を残す
+                if item.priority != PRIORITY_REVERIFY:
+                    row["check"] = "not"
+                    journal.record(row)
+                continue
+
+            if _all_target_fields_blank(scraped):
+                state.record(row, success=False, today=today)
+                # 再確認で全項目が空（掲載終了・レイアウト変更など）の ok 行も、前回の取得内容と ok を残す
+                if item.priority != PRIORITY_REVERIFY:
+                    for field in TARGET_FIELDS:
+                        row[field] = (scraped or {}).get(field, "")
+                    row["check"] = "not"
+                    journal.record(row)
                 continue
 
             for field in TARGET_FIELDS:
                 row[field] = (scraped or {}).get(field, "")
 
-            if _all_target_fields_blank(scraped):
-                row["check"] = "not"
-            else:
-                row["check"] = "ok"
-            _write_csv(CSV_PATH, fieldnames, rows)
+            row["check"] = "ok"
+            state.record(row, success=True, today=today)
+            journal.record(row)
+
+        routed = scraper.route_counts()
+        if routed:
+            print("振り分け件数: " + " ".join(f"{key}={count}" for key, count in sorted(routed.items())))
+
+        loaded = scraper.import_times()
+        if loaded:
+            print("スクレイパー読み込み時間: " + " ".join(f"{site}={sec:.3f}s" for site, sec in loaded.items()))
+    finally:
+        journal.close()
+        state.save()
 
 
 if __name__ == "__main__":
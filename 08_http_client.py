@@ -0,0 +1,392 @@
+"""3サイト共通のHTML取得レイヤー。
+
+- requests.Session を共有し、ホストごとのコネクションプールでkeep-aliveする
+- 429/5xx は指数バックオフでリトライする
+- 取得したページは 09_page_cache.py のキャッシュに保存し、TTL内なら再取得しない
+- キャッシュの ETag / Last-Modified で If-None-Match / If-Modified-Since を付けて取得する
+- 304 が返った場合は本文のダウンロードを省略する
+- 本文からスクリプト・広告・日時などを除いた指紋（ハッシュ）を取り、
+  同じ指紋・同じパーサーバージョンの抽出結果があれば解析せずにそれを返す
+- 抽出結果と指紋は、開くときに期限切れの行を消し、件数の上限を超えた分を
+  最後に参照された時刻が古い順に消す（09 のページキャッシュと同じ LRU）。
+  古いパーサーバージョンの結果は、新しいバージョンの結果を保存したときに消す
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Optional
+
+from module_loader import load_module as _load_module
+
+if TYPE_CHECKING:
+    import requests
+
+BASE_DIR = Path(__file__).resolve().parent
+RESULT_DB_PATH = BASE_DIR / "page_cache" / "results.sqlite3"
+
+# 抽出結果キャッシュ（ResultStore）の上限。期限はページキャッシュの TTL より長く取る
+RESULT_TTL_SECONDS = 30 * 24 * 60 * 60
+MAX_RESULT_ROWS = 200_000
+MAX_FINGERPRINT_ROWS = 200_000
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+}
+REQUEST_TIMEOUT = 10
+
+# リトライ設定（待ち時間は backoff_factor * 2 ** (試行回数 - 1) 秒）
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 1.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# コネクションプール（ホスト数 / 1ホストあたりの接続数）
+POOL_CONNECTIONS = 3
+POOL_MAXSIZE = 8
+
+
+_cache = _load_module("09_page_cache.py")
+
+
+@dataclass
+class FetchResult:
+    url: str
+    text: Optional[str]
+    not_modified: bool = False
+    etag: str = ""
+    last_modified: str = ""
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """プロセス内で共有するSessionを返す（初回呼び出し時に生成）。"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests はキャッシュだけで済む実行では不要なため、最初の通信時に読み込む
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=RETRY_TOTAL,
+                backoff_factor=RETRY_BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=frozenset({"GET"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+# =====================
+# 内容の指紋と解析結果キャッシュ
+# =====================
+# 抽出結果（tr 内の th/td）に影響しない部分を除いてからハッシュする
+# - 最初の <tr から最後の </tr> までの外側（ヘッダー・広告枠・フッター等）
+# - スクリプト・スタイル・iframe・コメント
+# - 日付・時刻（「情報提供日」など毎日変わる行がある）
+_VOLATILE_BLOCK_RE = re.compile(
+    r"<(?:script|style|noscript|iframe|template)[\s>].*?</(?:script|style|noscript|iframe|template)>", re.S
+)
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+# 年月日・時刻の完全な形だけを消す（「60/200」のような比率や「持分1/2」は内容として残す）
+_TIMESTAMP_RE = re.compile(
+    r"(?<!\d)(?:\d{2,4}年\d{1,2}月\d{1,2}日|\d{2,4}/\d{1,2}/\d{1,2}|\d{1,2}:\d{2}(?::\d{2})?)(?!\d)"
+)
+
+
+def _row_span(html: str) -> str:
+    starts = [pos for pos in (html.find("<tr"), html.find("<TR")) if pos >= 0]
+    end = max(html.rfind("</tr>"), html.rfind("</TR>"))
+    if not starts or end < 0:
+        return html
+    return html[min(starts) : end + len("</tr>")]
+
+
+def content_fingerprint(html: str) -> str:
+    """ページ本文を正規化して SHA-256 を返す（日々変わる部分だけが違うページは同じ値になる）。"""
+    text = _row_span(html)
+    text = _VOLATILE_BLOCK_RE.sub("", text)
+    text = _COMMENT_RE.sub("", text)
+    text = _TIMESTAMP_RE.sub("", text)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """スクレイパー名・パーサーバージョン・内容の指紋をキーに抽出結果を保存する。"""
+
+    def __init__(
+        self,
+        path: Path,
+        ttl_seconds: float = RESULT_TTL_SECONDS,
+        max_results: int = MAX_RESULT_ROWS,
+        max_fingerprints: int = MAX_FINGERPRINT_ROWS,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # 古いバージョンの結果を消し終えた (namespace, parser_version)
+        self._pruned_versions: set = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parsed_results (
+                    namespace TEXT NOT NULL,
+                    parser_version INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    last_access REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (namespace, parser_version, fingerprint)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    content_hash TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    last_access REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            for table in ("parsed_results", "fingerprints"):
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if "last_access" not in columns:
+                    # 以前のバージョンで作ったDB。既存の行は今参照されたものとして扱う
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+                    conn.execute(f"UPDATE {table} SET last_access = ?", (time.time(),))
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table} (last_access)")
+            conn.commit()
+            self._conn = conn
+            self._purge_locked(conn)
+        return self._conn
+
+    def _purge_locked(self, conn: sqlite3.Connection) -> int:
+        """期限切れの行を消し、上限を超えた分を last_access の古い順に消す。消した行数を返す。"""
+        expired = time.time() - self.ttl_seconds
+        removed = 0
+        for table, limit in (("parsed_results", self.max_results), ("fingerprints", self.max_fingerprints)):
+            removed += conn.execute(f"DELETE FROM {table} WHERE last_access < ?", (expired,)).rowcount
+            removed += conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (limit,),
+            ).rowcount
+        conn.commit()
+        return removed
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._purge_locked(self._connect())
+
+    def fingerprint_of(self, content_hash: str, html: str) -> str:
+        """本文ハッシュごとに指紋を保存し、同じ本文なら正規化を省略する。"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT fingerprint FROM fingerprints WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE fingerprints SET last_access = ? WHERE content_hash = ?", (time.time(), content_hash)
+                )
+                conn.commit()
+        if row is not None:
+            return row[0]
+
+        fingerprint = content_fingerprint(html)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (content_hash, fingerprint, last_access) VALUES (?, ?, ?)",
+                (content_hash, fingerprint, time.time()),
+            )
+            conn.commit()
+        return fingerprint
+
+    def get(self, namespace: str, parser_version: int, fingerprint: str) -> Optional[Dict[str, str]]:
+        key = (namespace, parser_version, fingerprint)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT result FROM parsed_results WHERE namespace = ? AND parser_version = ? AND fingerprint = ?",
+                key,
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE parsed_results SET last_access = ? "
+                    "WHERE namespace = ? AND parser_version = ? AND fingerprint = ?",
+                    (time.time(), *key),
+                )
+                conn.commit()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, namespace: str, parser_version: int, fingerprint: str, result: Dict[str, str]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed_results (namespace, parser_version, fingerprint, result, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, parser_version, fingerprint, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            if (namespace, parser_version) not in self._pruned_versions:
+                # パーサーを更新したら、以前のバージョンの結果はもう使われない
+                conn.execute(
+                    "DELETE FROM parsed_results WHERE namespace = ? AND parser_version < ?",
+                    (namespace, parser_version),
+                )
+                self._pruned_versions.add((namespace, parser_version))
+            conn.commit()
+
+
+result_store = ResultStore(RESULT_DB_PATH)
+
+
+def _is_remote(url: str) -> bool:
+    return url.startswith("http://") or url.startswith("https://")
+
+
+def _read_local(url: str) -> str:
+    if url.startswith("file://"):
+        return Path(url.replace("file://", "")).read_text(encoding="utf-8")
+    return Path(url).read_text(encoding="utf-8")
+
+
+# スレッドごとの通信前の待ち（06 のドメイン別の間隔調整）。キャッシュから返す取得では呼ばない
+_request_gate = threading.local()
+
+
+@contextmanager
+def request_gate(wait: Callable[[], None]) -> Iterator[None]:
+    """with の中では、このスレッドが実際にリクエストを送る直前に wait() を呼ぶ。"""
+    previous = getattr(_request_gate, "wait", None)
+    _request_gate.wait = wait
+    try:
+        yield
+    finally:
+        _request_gate.wait = previous
+
+
+def fetch(url: str, etag: str = "", last_modified: str = "") -> FetchResult:
+    """URLまたはローカルパスからHTMLを取得する。検証子を渡すと条件付きGETになる。"""
+    if not _is_remote(url):
+        return FetchResult(url=url, text=_read_local(url))
+
+    headers: Dict[str, str] = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    wait = getattr(_request_gate, "wait", None)
+    if wait is not None:
+        wait()
+    response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return FetchResult(url=url, text=None, not_modified=True, etag=etag, last_modified=last_modified)
+
+    response.raise_for_status()
+    response.encoding = response.apparent_encoding
+    return FetchResult(
+        url=url,
+        text=response.text,
+        etag=response.headers.get("ETag", ""),
+        last_modified=response.headers.get("Last-Modified", ""),
+    )
+
+
+def _fetch_cached(url: str) -> tuple[str, str, bool]:
+    """
+    キャッシュを経由してページを取得し、(HTML, 内容ハッシュ, 304だったか) を返す。
+
+    TTL内のキャッシュはそのまま使い、期限切れなら条件付きGETで再検証する。
+    オフラインモードではキャッシュだけを読み、無ければ CacheMiss を送出する。
+    """
+    entry = _cache.page_cache.lookup(url)
+
+    if entry is not None and (_cache.OFFLINE or entry.is_fresh()):
+        body = _cache.page_cache.read_body(entry)
+        if body is not None:
+            return body, entry.content_hash, False
+        entry = None  # 本文が消えていたので、キャッシュに無いものとして扱う
+    if _cache.OFFLINE:
+        raise _cache.CacheMiss(f"オフラインモードでキャッシュにありません: {url}")
+
+    if entry is None:
+        page = fetch(url)
+    else:
+        page = fetch(url, etag=entry.etag, last_modified=entry.last_modified)
+
+    if page.not_modified and entry is not None:
+        body = _cache.page_cache.read_body(entry)
+        if body is not None:
+            _cache.page_cache.touch(entry)
+            return body, entry.content_hash, True
+        # 304 でも手元の本文が無いので、条件なしで取り直す
+        page = fetch(url)
+
+    text = page.text or ""
+    entry = _cache.page_cache.put(url, text, etag=page.etag, last_modified=page.last_modified)
+    return text, entry.content_hash, False
+
+
+def load_html(url: str) -> str:
+    """URLまたはローカルパスからHTML文字列を読み込む。"""
+    if not _is_remote(url):
+        return _read_local(url)
+    return _fetch_cached(url)[0]
+
+
+def fetch_and_parse(
+    url: str,
+    namespace: str,
+    parse: Callable[[str], Dict[str, str]],
+    parser_version: int = 1,
+) -> Dict[str, str]:
+    """
+    キャッシュ・条件付きGETでページを取得し、parse(html) の結果を返す。
+
+    本文の指紋と parser_version が前回と同じなら、保存済みの抽出結果を返して解析を行わない。
+    namespace には呼び出し元スクレイパー名を渡し、結果の保存先を分ける。
+    """
+    if not _is_remote(url):
+        return parse(_read_local(url))
+
+    html, content_hash, _ = _fetch_cached(url)
+    fingerprint = result_store.fingerprint_of(content_hash, html)
+    previous = result_store.get(namespace, parser_version, fingerprint)
+    if previous is not None:
+        return previous
+
+    result = parse(html)
+    result_store.put(namespace, parser_version, fingerprint, result)
+    return result
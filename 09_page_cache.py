@@ -0,0 +1,279 @@
+"""物件詳細ページのHTMLをローカルに保存するコンテンツアドレス方式のキャッシュ。
+
+- キーは正規化したURL、本文は内容のSHA-256で gzip 圧縮して保存する
+- ETag / Last-Modified / 取得時刻を保持し、サイトごとのTTLで鮮度を判定する
+- 合計サイズが上限を超えたら、どのページからも参照されない本文を消してから、
+  最後に参照された時刻が古い順に削除する（LRU）
+- ページの本文が変わったら、前の本文は他のページが使っていなければその場で消す
+- オフラインモード（環境変数 PAGE_CACHE_OFFLINE=1）ではネットワークを使わずキャッシュだけを読む
+
+使い方:
+  python 09_page_cache.py stats
+  python 09_page_cache.py evict
+  python 09_page_cache.py import <URL> <HTMLファイル>
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR / "page_cache"
+
+OFFLINE = os.environ.get("PAGE_CACHE_OFFLINE", "") == "1"
+
+# サイトごとの有効期限（秒）。期限内のページは再取得しない
+SITE_TTL_SECONDS: Dict[str, int] = {
+    "suumo.jp": 24 * 60 * 60,
+    "sumaity.com": 24 * 60 * 60,
+    "myhome.nifty.com": 24 * 60 * 60,
+}
+DEFAULT_TTL_SECONDS = 12 * 60 * 60
+
+# 本文（圧縮後）の合計サイズ上限
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+
+class CacheMiss(LookupError):
+    """オフラインモードでキャッシュにページが無い場合に送出する。"""
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    site: str
+    content_hash: str
+    etag: str
+    last_modified: str
+    fetched_at: float
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        ttl = SITE_TTL_SECONDS.get(self.site, DEFAULT_TTL_SECONDS)
+        return (now if now is not None else time.time()) - self.fetched_at < ttl
+
+
+def normalize_url(url: str) -> str:
+    """スキーム/ホストの小文字化、既定ポート・フラグメント除去、クエリのソートを行う。"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def site_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    for site in SITE_TTL_SECONDS:
+        if host == site or host.endswith("." + site):
+            return site
+    return host
+
+
+class PageCache:
+    def __init__(self, cache_dir: Path, max_bytes: int = MAX_CACHE_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # ---------------------
+    # 内部処理
+    # ---------------------
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            (self.cache_dir / "objects").mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.cache_dir / "index.sqlite3"), check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    url_key TEXT PRIMARY KEY,
+                    site TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    etag TEXT NOT NULL DEFAULT '',
+                    last_modified TEXT NOT NULL DEFAULT '',
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages (last_access);
+                CREATE INDEX IF NOT EXISTS idx_pages_content_hash ON pages (content_hash);
+                CREATE TABLE IF NOT EXISTS objects (
+                    content_hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL
+                );
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _object_path(self, content_hash: str) -> Path:
+        return self.cache_dir / "objects" / content_hash[:2] / f"{content_hash}.html.gz"
+
+    def _release_locked(self, conn: sqlite3.Connection, content_hash: str) -> int:
+        """どのページからも参照されていなければ本文を消し、減ったサイズを返す（commit は呼び出し側）。"""
+        still_used = conn.execute(
+            "SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone()
+        if still_used:
+            return 0
+        size_row = conn.execute("SELECT size FROM objects WHERE content_hash = ?", (content_hash,)).fetchone()
+        conn.execute("DELETE FROM objects WHERE content_hash = ?", (content_hash,))
+        self._object_path(content_hash).unlink(missing_ok=True)
+        return size_row[0] if size_row else 0
+
+    def _evict_locked(self, conn: sqlite3.Connection) -> int:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        # 参照されていない本文（以前のバージョンで残ったもの）を先に消す
+        orphans = conn.execute(
+            "SELECT content_hash FROM objects WHERE content_hash NOT IN (SELECT content_hash FROM pages)"
+        ).fetchall()
+        for (content_hash,) in orphans:
+            total -= self._release_locked(conn, content_hash)
+
+        evicted = 0
+        victims = conn.execute("SELECT url_key, content_hash FROM pages ORDER BY last_access").fetchall()
+        for url_key, content_hash in victims:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE url_key = ?", (url_key,))
+            evicted += 1
+            total -= self._release_locked(conn, content_hash)
+        conn.commit()
+        return evicted
+
+    # ---------------------
+    # 公開API
+    # ---------------------
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        url_key = normalize_url(url)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT site, content_hash, etag, last_modified, fetched_at FROM pages WHERE url_key = ?",
+                (url_key,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE pages SET last_access = ? WHERE url_key = ?", (time.time(), url_key))
+            conn.commit()
+        site, content_hash, etag, last_modified, fetched_at = row
+        return CacheEntry(url_key, site, content_hash, etag, last_modified, fetched_at)
+
+    def _drop_locked(self, conn: sqlite3.Connection, entry: CacheEntry) -> None:
+        """本文が読めないページを索引から外す（同じ本文を使うページが他になければ objects からも外す）。"""
+        conn.execute("DELETE FROM pages WHERE url_key = ? AND content_hash = ?", (entry.url, entry.content_hash))
+        self._release_locked(conn, entry.content_hash)
+        conn.commit()
+
+    def read_body(self, entry: CacheEntry) -> Optional[str]:
+        """
+        本文を読み込む。読めない場合（別プロセスの LRU 削除・手動削除・壊れた gzip）は
+        索引から外して None を返すので、呼び出し側で取得し直す。
+        """
+        with self._lock:
+            try:
+                with gzip.open(self._object_path(entry.content_hash), "rb") as f:
+                    return f.read().decode("utf-8")
+            except (OSError, EOFError, UnicodeDecodeError):
+                # FileNotFoundError・gzip.BadGzipFile は OSError の派生
+                self._drop_locked(self._connect(), entry)
+                return None
+
+    def put(self, url: str, body: str, etag: str = "", last_modified: str = "") -> CacheEntry:
+        url_key = normalize_url(url)
+        data = body.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(content_hash)
+        now = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            previous = conn.execute("SELECT content_hash FROM pages WHERE url_key = ?", (url_key,)).fetchone()
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = object_path.with_name(object_path.name + ".tmp")
+                with gzip.open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, object_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO objects (content_hash, size) VALUES (?, ?)",
+                (content_hash, object_path.stat().st_size),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url_key, site, content_hash, etag, last_modified, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url_key, site_of(url_key), content_hash, etag, last_modified, now, now),
+            )
+            if previous is not None and previous[0] != content_hash:
+                self._release_locked(conn, previous[0])
+            conn.commit()
+            self._evict_locked(conn)
+
+        return CacheEntry(url_key, site_of(url_key), content_hash, etag, last_modified, now)
+
+    def touch(self, entry: CacheEntry) -> None:
+        """304 などで内容が変わっていないと確認できたとき、取得時刻を更新する。"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE pages SET fetched_at = ?, last_access = ? WHERE url_key = ?",
+                (now, now, entry.url),
+            )
+            conn.commit()
+        entry.fetched_at = now
+
+    def evict(self) -> int:
+        with self._lock:
+            return self._evict_locked(self._connect())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._connect()
+            pages = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            objects, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        return {"pages": pages, "objects": objects, "bytes": size}
+
+
+page_cache = PageCache(CACHE_DIR)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="物件ページキャッシュの管理")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="件数と使用量を表示する")
+    sub.add_parser("evict", help="サイズ上限を超えた分をLRUで削除する")
+    import_parser = sub.add_parser("import", help="ローカルのHTMLを指定URLのページとして登録する")
+    import_parser.add_argument("url")
+    import_parser.add_argument("html_file", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        for key, value in page_cache.stats().items():
+            print(f"{key}: {value}")
+    elif args.command == "evict":
+        print(f"削除: {page_cache.evict()} 件")
+    elif args.command == "import":
+        entry = page_cache.put(args.url, args.html_file.read_text(encoding="utf-8"))
+        print(f"登録: {entry.url} -> {entry.content_hash}")
+
+
+if __name__ == "__main__":
+    main()
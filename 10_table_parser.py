@@ -0,0 +1,270 @@
+"""物件ページのテーブル（tr内のth/td）から項目名と値を抽出する共通処理。
+
+パーサーは差し替え可能で、既定ではインストール済みのものから
+selectolax → lxml → BeautifulSoup(html.parser) の順に選ぶ。
+どのバックエンドでも BeautifulSoup の get_text(" ", strip=True) と同じ文字列を返す。
+
+STREAMING = True（または環境変数 TABLE_PARSER_STREAMING=1）の場合は、
+lxml でHTMLを少しずつ読み込み、指定ラベルが全て完全一致で見つかった時点で解析を打ち切る。
+打ち切った後ろの行で同じ項目名が再び現れても、その値は使わない（80_bench_table_parser.py で確認）。
+"""
+
+from __future__ import annotations
+
+import os
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except ImportError:  # pragma: no cover - 未インストール環境
+    _SelectolaxParser = None
+
+try:
+    from lxml import etree as _lxml_etree
+    from lxml import html as _lxml_html
+except ImportError:  # pragma: no cover - 未インストール環境
+    _lxml_etree = None
+    _lxml_html = None
+
+# 環境変数 TABLE_PARSER_BACKEND で固定できる（bs4 / lxml / selectolax）
+BACKEND = os.environ.get("TABLE_PARSER_BACKEND", "")
+STREAMING = os.environ.get("TABLE_PARSER_STREAMING", "") == "1"
+
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# get_text で拾わない要素（BeautifulSoup では別種の文字列として扱われる）
+_SKIP_TEXT_TAGS = {"script", "style", "template"}
+
+
+def _add_pairs(table_data: Dict[str, str], keys: List[str], values: List[str]) -> None:
+    """1行分のth/tdを対応付ける。tdが多い場合は先頭からthの数だけ使う。"""
+    if not keys or not values:
+        return
+    for key, val in zip(keys, values):
+        if key:
+            table_data[key] = val
+
+
+# =====================
+# BeautifulSoup (html.parser)
+# =====================
+def _extract_bs4(html: str) -> Dict[str, str]:
+    # 既定のバックエンドでは使わないため、必要になった時点で読み込む
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    table_data: Dict[str, str] = {}
+
+    for row in soup.select("tr"):
+        keys = [th.get_text(" ", strip=True) for th in row.find_all("th")]
+        values = [td.get_text(" ", strip=True) for td in row.find_all("td")]
+        _add_pairs(table_data, keys, values)
+
+    return table_data
+
+
+# =====================
+# lxml
+# =====================
+def _lxml_strings(element, out: List[str]) -> None:
+    if element.text:
+        out.append(element.text)
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in _SKIP_TEXT_TAGS:
+            _lxml_strings(child, out)
+        # コメント・処理命令・script等の中身は捨て、後ろのテキストだけ拾う
+        if child.tail:
+            out.append(child.tail)
+
+
+def _lxml_text(element) -> str:
+    parts: List[str] = []
+    _lxml_strings(element, parts)
+    return " ".join(text for text in (part.strip() for part in parts) if text)
+
+
+def _lxml_row_pairs(table_data: Dict[str, str], row) -> None:
+    keys = [_lxml_text(th) for th in row.iterdescendants("th")]
+    values = [_lxml_text(td) for td in row.iterdescendants("td")]
+    _add_pairs(table_data, keys, values)
+
+
+def _extract_lxml(html: str) -> Dict[str, str]:
+    root = _lxml_html.document_fromstring(html)
+    table_data: Dict[str, str] = {}
+    for row in root.iter("tr"):
+        _lxml_row_pairs(table_data, row)
+    return table_data
+
+
+def _extract_lxml_streaming(html: str, labels: Iterable[str]) -> Dict[str, str]:
+    """
+    trの終了タグごとにth/tdを取り出し、全ラベルが揃ったら残りを読まない。
+
+    各項目の値は「全ラベルが揃った行までで最後に現れたもの」になる。
+    ラベルがそれより後ろの行で再び現れる場合、全体を解析した結果（後の値で上書き）とは値が変わりうる。
+    """
+    wanted = set(labels)
+    parser = _lxml_etree.HTMLPullParser(events=("start", "end"), tag="tr")
+    table_data: Dict[str, str] = {}
+    # ネストしたtrも開始タグ順（= BeautifulSoup の select("tr") 順）で登録する
+    started: List[object] = []
+    open_rows = 0
+
+    for offset in range(0, len(html), STREAM_CHUNK_SIZE):
+        parser.feed(html[offset : offset + STREAM_CHUNK_SIZE])
+        for event, row in parser.read_events():
+            if event == "start":
+                started.append(row)
+                open_rows += 1
+                continue
+            open_rows -= 1
+            if open_rows:
+                continue
+            for pending in started:
+                _lxml_row_pairs(table_data, pending)
+            started.clear()
+            # 行ごとに判定するので、結果は STREAM_CHUNK_SIZE によらない
+            if wanted and wanted.issubset(table_data):
+                return table_data
+
+    parser.close()
+    for event, row in parser.read_events():
+        if event == "start":
+            started.append(row)
+    for pending in started:
+        _lxml_row_pairs(table_data, pending)
+    return table_data
+
+
+# =====================
+# selectolax
+# =====================
+def _selectolax_strings(node, out: List[str]) -> None:
+    child = node.first_child
+    while child is not None:
+        if child.is_text_node:
+            out.append(child.text_content or "")
+        elif child.is_element_node and child.tag not in _SKIP_TEXT_TAGS:
+            _selectolax_strings(child, out)
+        child = child.next
+
+
+def _selectolax_text(node) -> str:
+    parts: List[str] = []
+    _selectolax_strings(node, parts)
+    return " ".join(text for text in (part.strip() for part in parts) if text)
+
+
+def _extract_selectolax(html: str) -> Dict[str, str]:
+    tree = _SelectolaxParser(html)
+    table_data: Dict[str, str] = {}
+    for row in tree.css("tr"):
+        keys = [_selectolax_text(th) for th in row.css("th")]
+        values = [_selectolax_text(td) for td in row.css("td")]
+        _add_pairs(table_data, keys, values)
+    return table_data
+
+
+_BACKENDS: Dict[str, Callable[[str], Dict[str, str]]] = {"bs4": _extract_bs4}
+if _lxml_html is not None:
+    _BACKENDS["lxml"] = _extract_lxml
+if _SelectolaxParser is not None:
+    _BACKENDS["selectolax"] = _extract_selectolax
+
+
+def available_backends() -> List[str]:
+    return list(_BACKENDS)
+
+
+def default_backend() -> str:
+    if BACKEND:
+        if BACKEND not in _BACKENDS:
+            raise ValueError(f"利用できないパーサーです: {BACKEND}（利用可能: {available_backends()}）")
+        return BACKEND
+    for name in ("selectolax", "lxml", "bs4"):
+        if name in _BACKENDS:
+            return name
+    return "bs4"
+
+
+def extract_table_data(
+    html: str,
+    labels: Optional[Iterable[str]] = None,
+    backend: Optional[str] = None,
+    streaming: Optional[bool] = None,
+) -> Dict[str, str]:
+    """
+    HTML中の全trについて、th と td を先頭から対応付けた辞書を返す。
+
+    同じ項目名が複数ある場合は後の値で上書きする。
+    streaming が有効で labels が渡された場合、lxml があれば途中で解析を打ち切る
+    （この場合、打ち切った後ろの行の値では上書きしない）。
+    """
+    use_streaming = STREAMING if streaming is None else streaming
+    if use_streaming and labels is not None and _lxml_etree is not None and backend in (None, "lxml"):
+        return _extract_lxml_streaming(html, labels)
+
+    name = backend or default_backend()
+    if name not in _BACKENDS:
+        raise ValueError(f"利用できないパーサーです: {name}（利用可能: {available_backends()}）")
+    return _BACKENDS[name](html)
+
+
+# =====================
+# 項目名の索引
+# =====================
+@lru_cache(maxsize=1024)
+def normalize_label(text: str) -> str:
+    """項目名の比較用表記（NFKC 正規化 + 前後の空白除去）。"""
+    return unicodedata.normalize("NFKC", text).strip()
+
+
+@lru_cache(maxsize=256)
+def _resolve_labels(keys: Tuple[str, ...], labels: Tuple[str, ...]) -> Dict[str, str]:
+    """
+    ラベルごとに参照する項目名を決める（正規化済みの表記どうしで比較）。
+
+    完全一致があればそれを、なければラベルを含む項目名のうちページ上で最初に現れたものを使う。
+    同じサイト・物件種別のページは項目名の並びが同じなので、結果はキャッシュで使い回す。
+    """
+    key_set = set(keys)
+    resolved: Dict[str, str] = {}
+    for label in labels:
+        if label in key_set:
+            resolved[label] = label
+            continue
+        for key in keys:
+            if label in key:
+                resolved[label] = key
+                break
+    return resolved
+
+
+class TableLookup:
+    """1ページ分の th/td を、正規化した項目名で引けるようにしたもの。"""
+
+    def __init__(self, table_data: Dict[str, str], labels: Iterable[str]) -> None:
+        self._values: Dict[str, str] = {}
+        for key, value in table_data.items():
+            self._values[normalize_label(key)] = value
+        self._keys = tuple(self._values)
+        self._labels = tuple(dict.fromkeys(normalize_label(label) for label in labels))
+        self._resolved = _resolve_labels(self._keys, self._labels)
+
+    def get(self, label: str) -> str:
+        """完全一致→部分一致の順で項目値を返す。見つからなければ空文字。"""
+        label = normalize_label(label)
+        if label in self._labels:
+            key = self._resolved.get(label)
+        else:
+            key = _resolve_labels(self._keys, (label,)).get(label)
+        return self._values[key] if key is not None else ""
+
+
+def table_lookup(html: str, labels: Iterable[str], backend: Optional[str] = None) -> TableLookup:
+    """extract_table_data の結果を labels で引ける TableLookup にして返す。"""
+    labels = list(labels)
+    return TableLookup(extract_table_data(html, labels=labels, backend=backend), labels)
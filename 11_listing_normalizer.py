@@ -0,0 +1,322 @@
+"""01 のサイト別CSV（表示用の文字列）を 02 の数値スキーマに変換する。
+
+  suumo01.csv / sumaity01.csv / nifty01.csv
+    → suumo02.csv / sumaity02.csv / nifty02.csv
+
+「2,380万円～2,580万円」「150.82m2～185.56m2」「築0年」のような表示文字列を
+列ごとの正規表現抽出（pandas の str.extract）で一度に数値化する。
+サイトごとの違い（列名・範囲の区切り・築年月の書式・沿線の書き方など）は
+SITE_RULES の表にまとめ、変換処理そのものは全サイト共通。
+沿線・駅 の解析は 12_station_index.py の parse_access を使う（02 のスキーマにある 沿線 / 駅 / 徒歩 だけ残し、バス は捨てる）。
+
+- 範囲・複数表記（～ / 〜 / ・）は下限と上限に分け、
+  rule["expand"] の列のどれかがちょうど2つの値を持つ行だけ「下限の行」「上限の行」の2行に展開する
+  （それ以外の行は下限の値を使う。ただし rule["price"] が "unit" のサイトの販売価格は、
+    単位の付いた最初の値を使う。「2,690〜2,890万円」は上限、「3199万円〜3499万円」は下限）
+- 価格は万円単位で、従来の 02 と同じく億があれば億の位だけ、なければ万の位だけを読む
+  （「1億950万円」は 10000、「932万9000円」は 932。マスターの値と揃えるため）。面積は m2 の数値
+- 築年月は情報取得日時点の経過年数（小数2桁）
+- 坪単価は表示があればその値、なければ 販売価格 ÷ 坪数（土地面積 ÷ 3.3058）
+
+使い方:
+  python 11_listing_normalizer.py            # 3サイト全て
+  python 11_listing_normalizer.py suumo      # 指定サイトだけ
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+ENCODING = "utf-8-sig"
+
+
+# 02 の列構成（この順で出力する）
+SCHEMA = [
+    "種別",
+    "物件名",
+    "販売価格",
+    "所在地",
+    "沿線・駅",
+    "間取り",
+    "土地面積（m2）",
+    "建物面積（m2）",
+    "坪単価（万円／坪）",
+    "URL",
+    "情報取得日",
+    "築年月（年数換算）",
+    "沿線",
+    "駅",
+    "徒歩",
+]
+
+M2_PER_TSUBO = 3.3058
+RANGE_SEPARATORS = "～〜・"
+
+# =====================
+# サイト別の変換ルール
+# =====================
+# columns  : 変換で使う列名（02 の列名。築年月は数値化前の元の列） -> 01 の列名
+# expand   : いずれかが「ちょうど2つの値」を持つ行を2行に展開する列（02 の列名）
+# age      : 築年月の書式（"year_month" = 1997年12月 / "elapsed" = 12年7ヶ月）
+# new      : 築年月が読めなくても築0年とみなす行（01 の列名, 正規表現）
+# tsubo    : 坪単価（"listed" = 土地は表示値を優先 / "land" = 土地だけ計算 / "all" = 全行計算）
+# access   : 沿線・駅 の書式（12_station_index.py の ACCESS_FORMATS）
+# access_alt: (01 の列名, 正規表現, 書式)。当てはまる行だけ別の書式で読む（sumaity の中古）
+# price    : 展開しない行で範囲の販売価格のどちらを使うか
+#            （"low" = 下限 / "unit" = 単位の付いた最初の値。nifty は従来の 02 と同じ "unit"）
+SITE_RULES: Dict[str, Dict] = {
+    "suumo": {
+        "source": "suumo01.csv",
+        "output": "suumo02.csv",
+        "columns": {
+            "物件名": "物件名",
+            "販売価格": "販売価格",
+            "所在地": "所在地",
+            "沿線・駅": "沿線・駅",
+            "間取り": "間取り",
+            "土地面積（m2）": "土地面積",
+            "建物面積（m2）": "建物面積",
+            "坪単価（万円／坪）": "坪単価",
+            "築年月": "築年月",
+            "URL": "URL",
+            "情報取得日": "情報取得日",
+        },
+        "expand": ["販売価格", "間取り", "土地面積（m2）", "建物面積（m2）"],
+        "age": "year_month",
+        "new": ("種別", r"^新築$"),
+        "tsubo": "listed",
+        "access": "suumo",
+        "price": "low",
+    },
+    "sumaity": {
+        "source": "sumaity01.csv",
+        "output": "sumaity02.csv",
+        "columns": {
+            "物件名": "物件名",
+            "販売価格": "販売価格",
+            "所在地": "所在地",
+            "沿線・駅": "沿線・駅",
+            "間取り": "間取り",
+            "土地面積（m2）": "土地面積",
+            "建物面積（m2）": "建物面積",
+            "築年月": "築年月",
+            "URL": "URL",
+            "情報取得日": "情報取得日",
+        },
+        "expand": ["販売価格", "間取り", "土地面積（m2）", "建物面積（m2）"],
+        "age": "year_month",
+        "new": ("築年月", r"^築0年"),
+        "tsubo": "land",
+        "access": "sumaity",
+        "access_alt": ("URL", r"/used/", "sumaity_used"),
+        "price": "low",
+    },
+    "nifty": {
+        "source": "nifty01.csv",
+        "output": "nifty02.csv",
+        "columns": {
+            "物件名": "物件名",
+            "販売価格": "価格",
+            "所在地": "所在地",
+            "沿線・駅": "沿線・駅",
+            "間取り": "間取り",
+            "土地面積（m2）": "土地面積",
+            "建物面積（m2）": "建物面積",
+            "築年月": "築年月",
+            "URL": "URL",
+            "情報取得日": "情報取得日",
+        },
+        "expand": [],
+        "age": "elapsed",
+        "new": ("建物面積", r"."),
+        "tsubo": "all",
+        "access": "nifty",
+        "price": "unit",
+    },
+}
+
+# 元の文字列のまま 02 に引き継ぐ列
+PASSTHROUGH_COLUMNS = ["物件名", "所在地", "沿線・駅", "URL", "情報取得日"]
+
+# =====================
+# 表示文字列 → 数値（列単位）
+# =====================
+_SPLIT_RE = f"[{RANGE_SEPARATORS}]"
+_LOW_RE = re.compile(rf"^\s*([^{RANGE_SEPARATORS}]*)")
+_HIGH_RE = re.compile(rf"[{RANGE_SEPARATORS}]\s*([^{RANGE_SEPARATORS}]*)$")
+# 先頭の数字から読む（「A棟：3,175万円 B区画：2,975万円」は最初の価格）
+_PRICE_RE = re.compile(r"(?:(?P<oku>\d+(?:\.\d+)?)億|(?P<man>\d+(?:\.\d+)?))")
+_AREA_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*(?:m2|㎡)")
+_MADORI_RE = re.compile(r"^([0-9SLDK+＋]+)")
+_YEAR_MONTH_RE = re.compile(r"(?P<year>\d{4})年(?P<month>\d{1,2})月")
+_ELAPSED_RE = re.compile(r"(?P<years>\d+)年(?P<months>\d+)ヶ月")
+_LISTED_TSUBO_RE = re.compile(r"^(\d+(?:\.\d+)?)万円")
+_PRICE_UNIT_RE = re.compile(r"[万億円]")
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.astype("string")
+
+
+def split_range(series: pd.Series) -> pd.DataFrame:
+    """
+    「A～B」「A・B」を low / high の2列に分ける。
+
+    ちょうど2つの値に分かれる場合だけ範囲とみなす（multi=True）。
+    「178.47m2～188.09m2（53.98坪～56.89坪）」のように3つ以上に分かれる場合と
+    単一の値の場合は、high にも low と同じ値を入れる。
+    """
+    text = _text(series)
+    low = text.str.extract(_LOW_RE, expand=False).str.strip()
+    multi = text.str.count(_SPLIT_RE).eq(1).fillna(False).astype(bool)
+    high = text.str.extract(_HIGH_RE, expand=False).str.strip().where(multi, low)
+    return pd.DataFrame({"low": low, "high": high, "multi": multi})
+
+
+def parse_price(series: pd.Series) -> pd.Series:
+    """
+    「2,380万円」を万円単位の数値にする（読めない値は NaN）。
+
+    億を含む値は億の位だけ（「1億950万円」→ 10000）、円の端数は読まない（「932万9000円」→ 932）。
+    """
+    parts = _text(series).str.replace(",", "", regex=False).str.extract(_PRICE_RE)
+    parts = parts.apply(pd.to_numeric, errors="coerce").astype("float64")
+    return (parts["oku"] * 10000).fillna(parts["man"])
+
+
+def parse_area(series: pd.Series) -> pd.Series:
+    """「150.82m2（45.62坪）（登記）」を m2 の数値にする（「-」などは NaN）。"""
+    return pd.to_numeric(_text(series).str.extract(_AREA_RE, expand=False), errors="coerce").astype("float64")
+
+
+def parse_madori(series: pd.Series) -> pd.Series:
+    """「4LDK+S（納戸）」「5LDK以上」の先頭の間取り部分（4LDK+S / 5LDK）を取り出す。"""
+    return _text(series).str.extract(_MADORI_RE, expand=False)
+
+
+def age_in_years(built: pd.Series, acquired: pd.Series, style: str) -> pd.Series:
+    """築年月を情報取得日時点の経過年数（小数2桁）にする。読めない値は NaN。"""
+    text = _text(built)
+    if style == "elapsed":
+        parts = text.str.extract(_ELAPSED_RE).apply(pd.to_numeric, errors="coerce")
+        return (parts["years"] + parts["months"] / 12).round(2)
+
+    parts = text.str.extract(_YEAR_MONTH_RE)
+    built_at = pd.to_datetime(parts["year"] + "-" + parts["month"] + "-1", format="%Y-%m-%d", errors="coerce")
+    days = (pd.to_datetime(acquired, errors="coerce") - built_at).dt.days
+    return (days / 365).round(2)
+
+
+# =====================
+# 1ファイル分の変換
+# =====================
+def normalize_frame(raw: pd.DataFrame, site: str) -> pd.DataFrame:
+    """01 の DataFrame を 02 のスキーマに変換する（範囲を持つ行の2行展開を含む）。"""
+    rule = SITE_RULES[site]
+    empty = pd.Series(pd.NA, index=raw.index, dtype="string")
+    src = {dest: raw[col] if col in raw.columns else empty for dest, col in rule["columns"].items()}
+
+    ranges = {col: split_range(src[col]) for col in ["販売価格", "間取り", "土地面積（m2）", "建物面積（m2）"]}
+    expand = np.zeros(len(raw), dtype=bool)
+    for col in rule["expand"]:
+        expand |= ranges[col]["multi"].to_numpy()
+
+    # 展開する行は下限・上限の2回、それ以外は1回だけ並べる
+    positions = np.repeat(np.arange(len(raw)), np.where(expand, 2, 1))
+    is_high = np.zeros(len(positions), dtype=bool)
+    is_high[1:] = positions[1:] == positions[:-1]
+
+    def pick(col: str, prefer_high: Optional[np.ndarray] = None) -> pd.Series:
+        # 展開した行は下限・上限の順。展開しない行は prefer_high（元の行ごと）が True なら上限
+        frame = ranges[col]
+        use_high = is_high
+        if prefer_high is not None:
+            use_high = use_high | (prefer_high & ~expand)[positions]
+        return pd.Series(np.where(use_high, frame["high"].to_numpy()[positions], frame["low"].to_numpy()[positions]))
+
+    def repeat(series: pd.Series) -> pd.Series:
+        return pd.Series(series.to_numpy()[positions])
+
+    out = pd.DataFrame({col: repeat(src[col]) for col in PASSTHROUGH_COLUMNS})
+    prefer_high = None
+    if rule["price"] == "unit":
+        low_price = ranges["販売価格"]["low"]
+        prefer_high = (~low_price.str.contains(_PRICE_UNIT_RE)).fillna(False).astype(bool).to_numpy()
+    out["販売価格"] = parse_price(pick("販売価格", prefer_high))
+    out["間取り"] = parse_madori(pick("間取り"))
+    out["土地面積（m2）"] = parse_area(pick("土地面積（m2）"))
+    out["建物面積（m2）"] = parse_area(pick("建物面積（m2）"))
+
+    is_land = out["建物面積（m2）"].isna()
+    out["種別"] = np.where(is_land, "土地", "建物")
+
+    # 築年月が読めない行は、新築とみなせる行だけ 0 年にする
+    new_col, new_pattern = rule["new"]
+    is_new = _text(raw[new_col]).str.contains(new_pattern, regex=True).fillna(False).astype(bool)
+    age = age_in_years(src["築年月"], src["情報取得日"], rule["age"])
+    age = age.fillna(pd.Series(0.0, index=raw.index).where(is_new))
+    out["築年月（年数換算）"] = repeat(age).astype("float64")
+
+    tsubo = (out["販売価格"] / (out["土地面積（m2）"] / M2_PER_TSUBO)).round(2)
+    if rule["tsubo"] == "listed":
+        listed = _text(src["坪単価（万円／坪）"]).str.extract(_LISTED_TSUBO_RE, expand=False)
+        tsubo = pd.to_numeric(repeat(listed), errors="coerce").astype("float64").fillna(tsubo)
+    if rule["tsubo"] != "all":
+        tsubo = tsubo.where(is_land)
+    out["坪単価（万円／坪）"] = tsubo
+
+    stations = _load_module("12_station_index.py")
+    access = stations.parse_access(out["沿線・駅"], rule["access"])
+    if "access_alt" in rule:
+        alt_col, alt_pattern, alt_format = rule["access_alt"]
+        alt = repeat(_text(raw[alt_col]).str.contains(alt_pattern, regex=True).fillna(False).astype(bool))
+        alt = alt.to_numpy(dtype=bool)
+        if alt.any():
+            access.loc[alt] = stations.parse_access(out.loc[alt, "沿線・駅"], alt_format)
+    out[["沿線", "駅", "徒歩"]] = access[["沿線", "駅", "徒歩"]]
+
+    return out[SCHEMA]
+
+
+def normalize_file(site: str, base_dir: Path = BASE_DIR) -> pd.DataFrame:
+    """サイトの 01 CSV を読み込み、変換結果を 02 CSV に書き出す。"""
+    rule = SITE_RULES[site]
+    raw = pd.read_csv(base_dir / rule["source"], encoding=ENCODING)
+    df = normalize_frame(raw, site)
+
+    output_path = base_dir / rule["output"]
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    df.to_csv(tmp_path, index=False, encoding=ENCODING)
+    tmp_path.replace(output_path)
+    return df
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="01 のサイト別CSVを 02 のスキーマに変換する")
+    parser.add_argument("sites", nargs="*", help=f"対象サイト（{' / '.join(SITE_RULES)}。省略時は全て）")
+    args = parser.parse_args(argv)
+
+    unknown = [site for site in args.sites if site not in SITE_RULES]
+    if unknown:
+        parser.error(f"不明なサイト: {', '.join(unknown)}")
+
+    sites: List[str] = args.sites or list(SITE_RULES)
+    for site in sites:
+        start = time.perf_counter()
+        df = normalize_file(site)
+        rule = SITE_RULES[site]
+        print(f"✔ {rule['source']} → {rule['output']}: {len(df)} 行 ({time.perf_counter() - start:.2f} 秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""沿線・駅 の解析と、マスターから作る路線・駅の辞書。
+
+沿線・駅 はサイトごとに3通りの書き方がある。
+
+  nifty   : 名鉄名古屋本線/新木曽川駅 徒歩8分
+  suumo   : 名鉄竹鼻線「柳津」徒歩31分
+  sumaity : JR東海道本線「岐阜」駅 バス17分「大縄場大橋西」バス停 徒歩5分
+            ＪＲ東海道本線 岐阜駅まで 徒歩22分 / 名鉄名古屋本線 …
+
+parse_access() は書式ごとの正規表現で 沿線 / 駅 / 徒歩 / バス を取り出す。
+同じ文字列は1回だけ解析する（pd.factorize のユニーク値に対して str.extract）。
+02 以降のCSVに残るのは 沿線 / 駅 / 徒歩 だけで（11_listing_normalizer.py が選ぶ）、バス は保存しない。
+
+StationIndex は 90_3data_master.csv の 沿線 / 駅 から作る辞書で、
+「ＪＲ東海道本線」「JR東海道本線」「東海道本線」「東海道線」のような表記ゆれを
+NFKC とキー化（会社名・本線/線・駅/停 を除く）で1つにまとめ、駅ごとに整数の 駅ID を振る。
+表記からIDへの変換はユニーク値ごとの辞書引きなので、駅単位の集計は整数の groupby / bincount になる。
+辞書は 90_3data_master.stations.json に保存し、マスターが更新されていれば作り直す。
+駅ID はマスターの列にはせず、stats のように駅単位で集計するときにその場で引く。
+
+使い方:
+  python 12_station_index.py build    # マスターから辞書を作成
+  python 12_station_index.py stats    # 駅ごとの件数・平均価格
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+MASTER_CSV = BASE_DIR / "90_3data_master.csv"
+STATION_INDEX_PATH = BASE_DIR / "90_3data_master.stations.json"
+ENCODING = "utf-8-sig"
+
+UNKNOWN_ID = -1
+
+# =====================
+# 沿線・駅 の書式
+# =====================
+# station : 沿線 / 駅 を取り出す正規表現（名前付きグループ）
+# walk    : 徒歩（分）。バスを使う経路では取らない（02 の 徒歩 列と同じ意味）
+# bus     : バス（分）
+ACCESS_FORMATS: Dict[str, Dict[str, str]] = {
+    "suumo": {
+        "station": r"^(?P<沿線>[^「]+)「(?P<駅>[^」]+)」",
+        "walk": r"徒歩(\d+)分",
+        "bus": r"バス(\d+)分",
+    },
+    "sumaity": {
+        # 「名鉄名古屋本線「柳津」駅」と「ＪＲ東海道本線 岐阜駅まで」の2通り。後者は路線名が「～線」のものだけ拾う
+        "station": r"^(?P<沿線>[^「 ]+(?=「)|[^「 ]*線(?= ))[「 ](?P<駅>[^」 ]+?)(?:」|駅)",
+        # 最初の経路（「 / 」より前）で、バスを使わずに歩く場合だけ
+        "walk": r"^(?:(?!バス)[^/])*?徒歩 ?(\d+)分",
+        "bus": r"^[^/]*?バス(?:乗車)? ?約?(\d+)分",
+    },
+    # sumaity の中古は「ＪＲ東海道本線 岐阜駅まで」の形だけが駅。
+    # 「岐阜バス「材木町」下車」のようなバス停だけの行は 沿線 / 駅 を空のままにする（従来の 02 と同じ）
+    "sumaity_used": {
+        "station": r"^(?P<沿線>[^「 ]*線) (?P<駅>[^」 ]+?)駅",
+        "walk": r"^(?:(?!バス)[^/])*?徒歩 ?(\d+)分",
+        "bus": r"^[^/]*?バス(?:乗車)? ?約?(\d+)分",
+    },
+    "nifty": {
+        "station": r"^(?P<沿線>[^/]+)/(?P<駅>.+?)駅",
+        "walk": r"駅 徒歩(\d+)分",
+        "bus": r"バス(\d+)分",
+    },
+}
+
+ACCESS_COLUMNS = ["沿線", "駅", "徒歩", "バス"]
+
+_compiled: Dict[str, Dict[str, "re.Pattern[str]"]] = {
+    name: {key: re.compile(pattern) for key, pattern in spec.items()} for name, spec in ACCESS_FORMATS.items()
+}
+
+
+def _take(frame: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+    """ユニーク値ごとの結果を元の行に展開する（欠損値の行 code=-1 は全列欠損）。"""
+    padded = pd.concat([frame, frame.iloc[:0].reindex([len(frame)])], ignore_index=True)
+    return padded.iloc[np.where(codes < 0, len(frame), codes)].reset_index(drop=True)
+
+
+def parse_access(series: pd.Series, fmt: str) -> pd.DataFrame:
+    """沿線・駅 を 沿線 / 駅 / 徒歩 / バス の4列にする（行の並びと index は元のまま）。"""
+    patterns = _compiled[fmt]
+    codes, uniques = pd.factorize(series)
+    text = pd.Series(uniques, dtype="string")
+
+    station = text.str.extract(patterns["station"])
+    parsed = pd.DataFrame(
+        {
+            "沿線": station["沿線"],
+            "駅": station["駅"],
+            "徒歩": pd.to_numeric(text.str.extract(patterns["walk"], expand=False), errors="coerce"),
+            "バス": pd.to_numeric(text.str.extract(patterns["bus"], expand=False), errors="coerce"),
+        }
+    )
+    parsed[["徒歩", "バス"]] = parsed[["徒歩", "バス"]].astype("float64")
+
+    result = _take(parsed, codes)
+    result.index = series.index
+    return result
+
+
+# =====================
+# 表記ゆれのキー化
+# =====================
+# NFKC のあとで個別に読み替える路線名（同じ路線の別名）
+LINE_ALIASES = {
+    "名鉄本線": "名鉄名古屋本線",
+    "名鉄竹鼻・羽島線": "名鉄竹鼻線",
+    "樽見線": "樽見鉄道",
+}
+LINE_PREFIXES = ("JR", "名鉄")
+LINE_SUFFIXES = ("本線", "線")
+STATION_SUFFIXES = ("バス停", "停留所", "停", "駅")
+_STATION_BRACKETS = str.maketrans("", "", "「」『』")
+
+
+def _nfkc(value) -> str:
+    return unicodedata.normalize("NFKC", str(value)).strip()
+
+
+def line_key(name) -> str:
+    """
+    路線名を照合用のキーにする（例: ＪＲ東海道本線 / 東海道線 → 東海道）。
+
+    会社名と「本線」「線」を外すのは鉄道の路線名だけで、バス路線名は NFKC のみ。
+    """
+    text = _nfkc(name)
+    text = LINE_ALIASES.get(text, text)
+    if not text.endswith("線") or "バス" in text:
+        return text
+    for prefix in LINE_PREFIXES:
+        if text.startswith(prefix) and len(text) > len(prefix):
+            text = text[len(prefix):]
+            break
+    for suffix in LINE_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix):
+            text = text[: -len(suffix)]
+            break
+    return text
+
+
+def station_key(name) -> str:
+    """駅名・停留所名を照合用のキーにする（例: 「「粟野」停」 → 粟野）。"""
+    text = _nfkc(name).translate(_STATION_BRACKETS).strip()
+    for suffix in STATION_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix):
+            text = text[: -len(suffix)].strip()
+            break
+    return text
+
+
+def _pair_keys(lines: pd.Series, stations: pd.Series) -> Tuple[np.ndarray, pd.Index, List[Optional[Tuple[str, str]]]]:
+    """(沿線, 駅) の組をユニーク値ごとにキー化し、(codes, ユニークな組, キーの一覧) を返す。"""
+    pairs = pd.MultiIndex.from_arrays([lines.to_numpy(dtype=object), stations.to_numpy(dtype=object)])
+    codes, uniques = pd.factorize(pairs)
+    keys = [
+        None if pd.isna(line) or pd.isna(station) else (line_key(line), station_key(station))
+        for line, station in uniques
+    ]
+    return codes, uniques, keys
+
+
+# =====================
+# 路線・駅の辞書
+# =====================
+class StationIndex:
+    """路線キー・駅キーから整数の 駅ID を引く辞書（IDは 0 から連番）。"""
+
+    def __init__(self, lines: Dict[str, str], stations: List[Tuple[str, str, str]]):
+        # lines: 路線キー -> 代表表記 / stations: [(路線キー, 駅キー, 駅の代表表記), ...]（添字が駅ID）
+        self.lines = lines
+        self.stations = stations
+        self._ids = {(line, station): i for i, (line, station, _) in enumerate(stations)}
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    @classmethod
+    def build(cls, lines: pd.Series, stations: pd.Series) -> "StationIndex":
+        """沿線 / 駅 の列から辞書を作る。代表表記は各キーで最も多い表記（NFKC 後）。"""
+        codes, uniques, keys = _pair_keys(lines, stations)
+        counts = np.bincount(codes[codes >= 0], minlength=len(keys))
+
+        line_names: Dict[str, Counter] = {}
+        station_names: Dict[Tuple[str, str], Counter] = {}
+        for key, (line, station), count in zip(keys, uniques, counts):
+            if key is None:
+                continue
+            line_names.setdefault(key[0], Counter())[_nfkc(line)] += int(count)
+            station_names.setdefault(key, Counter())[station_key(station)] += int(count)
+
+        def representative(counter: Counter) -> str:
+            return sorted(counter.items(), key=lambda item: (-item[1], item[0]))[0][0]
+
+        return cls(
+            {key: representative(names) for key, names in sorted(line_names.items())},
+            [(line, station, representative(names)) for (line, station), names in sorted(station_names.items())],
+        )
+
+    @classmethod
+    def from_master(cls, csv_path: Path = MASTER_CSV) -> "StationIndex":
+        df = pd.read_csv(csv_path, encoding=ENCODING, usecols=["沿線", "駅"])
+        return cls.build(df["沿線"], df["駅"])
+
+    def ids(self, lines: pd.Series, stations: pd.Series) -> np.ndarray:
+        """行ごとの 駅ID（int64）を返す。辞書にない組・欠損は UNKNOWN_ID。"""
+        codes, _, keys = _pair_keys(lines, stations)
+        unique_ids = np.array([self._ids.get(key, UNKNOWN_ID) for key in keys] + [UNKNOWN_ID], dtype=np.int64)
+        return unique_ids[np.where(codes < 0, len(keys), codes)]
+
+    def line_name(self, station_id: int) -> str:
+        return self.lines[self.stations[station_id][0]]
+
+    def station_name(self, station_id: int) -> str:
+        return self.stations[station_id][2]
+
+    def to_json(self, path: Path) -> None:
+        payload = {"lines": self.lines, "stations": [list(row) for row in self.stations]}
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp_path.replace(path)
+
+    @classmethod
+    def from_json(cls, path: Path) -> "StationIndex":
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        return cls(payload["lines"], [tuple(row) for row in payload["stations"]])
+
+
+def load_index(path: Path = STATION_INDEX_PATH, master_csv: Path = MASTER_CSV) -> StationIndex:
+    """保存済みの辞書を読み込む。マスターの方が新しい（または未作成の）場合は作り直して保存する。"""
+    if path.exists() and (not master_csv.exists() or path.stat().st_mtime >= master_csv.stat().st_mtime):
+        return StationIndex.from_json(path)
+    index = StationIndex.from_master(master_csv)
+    index.to_json(path)
+    return index
+
+
+def _stats(index: StationIndex) -> None:
+    df = pd.read_csv(MASTER_CSV, encoding=ENCODING, usecols=["沿線", "駅", "販売価格", "削除年月日"])
+    df = df[df["削除年月日"].isna()]
+    ids = index.ids(df["沿線"], df["駅"])
+
+    known = ids >= 0
+    counts = np.bincount(ids[known], minlength=len(index))
+    prices = df["販売価格"].to_numpy(dtype="float64")[known]
+    has_price = ~np.isnan(prices)
+    totals = np.bincount(ids[known][has_price], weights=prices[has_price], minlength=len(index))
+    priced = np.bincount(ids[known][has_price], minlength=len(index))
+
+    print(f"掲載中 {len(df)} 件（駅ID なし {int((~known).sum())} 件） / 路線 {len(index.lines)} / 駅 {len(index)}")
+    print(f"{'駅ID':>5}  {'沿線':<14}{'駅':<12}{'件数':>6}{'平均価格':>10}")
+    for station_id in np.argsort(-counts, kind="stable")[:20]:
+        if counts[station_id] == 0:
+            break
+        mean = totals[station_id] / priced[station_id] if priced[station_id] else float("nan")
+        print(
+            f"{station_id:>5}  {index.line_name(station_id):<14}{index.station_name(station_id):<12}"
+            f"{counts[station_id]:>6}{mean:>10.0f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="路線・駅の辞書")
+    parser.add_argument("command", choices=["build", "stats"])
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = StationIndex.from_master()
+        index.to_json(STATION_INDEX_PATH)
+        print(f"作成: {STATION_INDEX_PATH.name}（路線 {len(index.lines)} / 駅 {len(index)}）")
+    elif args.command == "stats":
+        _stats(load_index())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""文字列正規化の共有キャッシュ。
+
+02_merge_all_dataframe.py の沿線・駅 / 沿線 の NFKC 正規化と、21_master_compare.py の
+物件ID 用の正規化（normalize_text / normalize_minmax / trim_address_before_number）を
+ここにまとめる。所在地・沿線・種別は行数に比べて種類が少ないので、列を factorize して
+ユニーク値だけを正規化し、結果を上限付きの LRU キャッシュ（関数名 + 値 がキー）に残す。
+同じプロセス内なら次のスナップショット（21 の --backfill など）でもキャッシュが効く。
+
+  CACHE.map_column(df["所在地"], "address")   # 列単位（行順・index はそのまま）
+  CACHE.stats()                               # 件数・ヒット率
+
+使い方:
+  python 13_text_normalizer.py [スナップショットのディレクトリ]   # past/ で列ごとのヒット率を表示
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+ENCODING = "utf-8-sig"
+
+# キャッシュに残すユニーク値の上限（超えたら古く使われていないものから捨てる）
+DEFAULT_MAXSIZE = 100_000
+
+_SPACE_RE = re.compile(r"\s+")
+_DIGIT_RE = re.compile(r"[0-9０-９]")
+
+
+# =====================
+# 正規化関数（1値ずつ）
+# =====================
+def normalize_ascii(text):
+    """全角英数字などを NFKC で半角にする（欠損値はそのまま返す）。"""
+    if pd.isna(text):
+        return text
+    return unicodedata.normalize("NFKC", str(text))
+
+
+def normalize_text(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    text = unicodedata.normalize("NFKC", str(value)).strip()
+    return _SPACE_RE.sub("", text)
+
+
+def normalize_minmax(value):
+    text = normalize_text(value)
+    return text.replace("〜", "-").replace("～", "-")
+
+
+def trim_address_before_number(text):
+    """所在地：半角/全角数字が出た位置以降を削除"""
+    if text is None:
+        return ""
+    return _DIGIT_RE.split(str(text))[0]
+
+
+def normalize_address(value):
+    """物件ID 用の所在地（番地の数字より前だけを正規化したもの）。"""
+    return normalize_text(trim_address_before_number(value))
+
+
+NORMALIZERS: Dict[str, Callable] = {
+    "ascii": normalize_ascii,
+    "text": normalize_text,
+    "minmax": normalize_minmax,
+    "address": normalize_address,
+}
+
+
+# =====================
+# キャッシュ
+# =====================
+class NormalizeCache:
+    """(関数名, 値) → 正規化結果 の LRU キャッシュ。文字列の値だけを保持する。"""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, name: str, value):
+        """1値を正規化する。文字列以外（欠損値・数値）はキャッシュせずに毎回計算する。"""
+        func = NORMALIZERS[name]
+        if not isinstance(value, str):
+            return func(value)
+
+        key = (name, value)
+        try:
+            result = self._data[key]
+        except KeyError:
+            self.misses += 1
+            result = func(value)
+            self._data[key] = result
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return result
+
+    def map_column(self, series: pd.Series, name: str) -> pd.Series:
+        """列のユニーク値だけを正規化し、元の行へ展開する（dtype は object）。"""
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        mapped = np.array([self.get(name, value) for value in uniques], dtype=object)
+        return pd.Series(mapped[codes], index=series.index, dtype=object)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (
+            f"正規化キャッシュ: {s['size']} 件 / ヒット {s['hits']} / ミス {s['misses']} "
+            f"(ヒット率 {s['hit_rate']:.1%})"
+        )
+
+
+# プロセス内で共有するキャッシュ（02・21 はこのインスタンスを使う）
+CACHE = NormalizeCache()
+
+
+def map_column(series: pd.Series, name: str) -> pd.Series:
+    return CACHE.map_column(series, name)
+
+
+# =====================
+# 確認用（past/ のスナップショットで列ごとのヒット率を表示）
+# =====================
+SAMPLE_COLUMNS = [
+    ("所在地", "address"),
+    ("種別", "text"),
+    ("最小最大", "minmax"),
+    ("沿線・駅", "ascii"),
+    ("沿線", "ascii"),
+]
+
+
+def main() -> None:
+    snapshot_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / "past"
+    paths = sorted(snapshot_dir.glob("3data_*.csv"))
+    if not paths:
+        raise SystemExit(f"スナップショットがありません: {snapshot_dir}")
+
+    print("file\trows\tseconds\thit_rate")
+    for path in paths:
+        df = pd.read_csv(path, encoding=ENCODING)
+        before = CACHE.stats()
+        start = time.perf_counter()
+        for col, name in SAMPLE_COLUMNS:
+            if col in df.columns:
+                CACHE.map_column(df[col], name)
+        seconds = time.perf_counter() - start
+        after = CACHE.stats()
+        hits = after["hits"] - before["hits"]
+        lookups = hits + after["misses"] - before["misses"]
+        print(f"{path.name}\t{len(df)}\t{seconds:.3f}s\t{hits / lookups if lookups else 0.0:.1%}")
+    print(CACHE.summary())
+
+
+if __name__ == "__main__":
+    main()
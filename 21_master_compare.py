@@ -1,16 +1,26 @@
+import argparse
 import hashlib
 import math
 import re
-import unicodedata
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from module_loader import load_module as _load_module
+
 # =====================
 # 設定
 # =====================
 MASTER_CSV = "90_3data_master.csv"
-CURR_CSV = "past/3data_260117.csv"  # 今回スナップショット
-PRICE_DIFF_CSV = "91_diff_price_change.csv"
+MASTER_PARQUET = "90_3data_master.parquet"  # pyarrow がある場合に CSV と並べて保存する
+MASTER_DB = "90_3data_master.sqlite3"  # MASTER_BACKEND=sqlite の場合のマスター
+CURR_CSV = "past/3data_260117.csv"  # 今回スナップショット（引数で指定可能）
+PRICE_HISTORY_DIR = "price_history"  # 価格変動履歴（24_price_history.py、月別に追記）
+CLUSTER_CSV = "92_duplicate_clusters.csv"  # サイト間の重複物件（25_duplicate_matcher.py、あれば使う）
 ENCODING = "utf-8-sig"
 
 PROTECTED_UPDATE_COLUMNS = {
@@ -24,28 +34,20 @@ PROTECTED_UPDATE_COLUMNS = {
 }
 
 
+_store = _load_module("22_master_store.py")
+_db = _load_module("23_master_db.py")
+_history = _load_module("24_price_history.py")
+_text = _load_module("13_text_normalizer.py")
+_dup = _load_module("25_duplicate_matcher.py")
+
+
 # =====================
 # ユーティリティ
 # =====================
-def normalize_text(value):
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return ""
-    text = unicodedata.normalize("NFKC", str(value)).strip()
-    text = re.sub(r"\s+", "", text)
-    return text
-
-
-def normalize_minmax(value):
-    text = normalize_text(value)
-    return text.replace("〜", "-").replace("～", "-")
-
-
-def trim_address_before_number(text):
-    """所在地：半角/全角数字が出た位置以降を削除"""
-    if text is None:
-        return ""
-    text = str(text)
-    return re.split(r"[0-9０-９]", text)[0]
+# 正規化は 13_text_normalizer.py に共通化（02 と同じキャッシュを使う）
+normalize_text = _text.normalize_text
+normalize_minmax = _text.normalize_minmax
+trim_address_before_number = _text.trim_address_before_number
 
 
 def floor_number(value):
@@ -70,6 +72,40 @@ def generate_property_id(row):
     return hashlib.sha1(base.encode("utf-8")).hexdigest()[:12]
 
 
+def _map_unique(series, func):
+    """列のユニーク値だけに func を適用し、元の行へ展開する（NaN も1つの値として扱う）。"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = np.array([func(value) for value in uniques], dtype=object)
+    return pd.Series(mapped[codes], index=series.index, dtype=object)
+
+
+def _column_or_none(df, col):
+    if col in df.columns:
+        return df[col]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def generate_property_ids(df):
+    """
+    generate_property_id と同じIDを列単位で生成する。
+
+    所在地・種別・面積などは行数に比べて種類が少ないため、
+    正規化・切り捨て・SHA-1 はユニーク値ごとに1回だけ計算する。
+    所在地・種別・最小最大の正規化結果は 13 の共有キャッシュに残り、次のスナップショットでも使われる。
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+
+    address = _text.map_column(_column_or_none(df, "所在地"), "address")
+    kind = _text.map_column(_column_or_none(df, "種別"), "text")
+    minmax = _text.map_column(_column_or_none(df, "最小最大"), "minmax")
+    land = _map_unique(_column_or_none(df, "土地面積（m2）"), lambda v: str(floor_number(v)))
+    building = _map_unique(_column_or_none(df, "建物面積（m2）"), lambda v: str(floor_number(v)))
+
+    base = address.str.cat([kind, minmax, land, building], sep="_")
+    return _map_unique(base, lambda key: hashlib.sha1(key.encode("utf-8")).hexdigest()[:12])
+
+
 def extract_yymmdd(filename):
     m = re.search(r"3data_(\d{6})\.csv", filename)
     if not m:
@@ -105,126 +141,277 @@ def fallback_date_from_filename(csv_path):
     return f"20{yymmdd[:2]}/{yymmdd[2:4]}/{yymmdd[4:6]}"
 
 
-# =====================
-# 読み込み
-# =====================
-df_master = pd.read_csv(MASTER_CSV, encoding=ENCODING)
-df_curr_raw = pd.read_csv(CURR_CSV, encoding=ENCODING)
-
-# =====================
-# ① スナップショットに物件IDを付与し、重複IDを優先度で解消
-# =====================
-df_curr_raw["物件ID"] = df_curr_raw.apply(generate_property_id, axis=1)
-df_curr_raw["_url_rank"] = df_curr_raw["URL"].apply(url_priority)
-df_curr_norm = (
-    df_curr_raw.sort_values(["物件ID", "_url_rank", "情報取得日"], ascending=[True, True, False])
-    .drop_duplicates(subset=["物件ID"], keep="first")
-    .drop(columns=["_url_rank"])
-)
-
-# =====================
-# ② マスター側の列補正
-# =====================
-for col in ["追加年月日", "削除年月日"]:
-    if col not in df_master.columns:
-        df_master[col] = ""
-
-# =====================
-# ③ マスター正規化（1ID=1行）
-# =====================
-df_master_norm = (
-    df_master.sort_values("情報取得日").groupby("物件ID", as_index=False).last()
-)
-
-# index を物件IDに
-df_master_norm = df_master_norm.set_index("物件ID", drop=False)
-df_curr_norm = df_curr_norm.set_index("物件ID", drop=False)
-
-master_ids = set(df_master_norm.index)
-curr_ids = set(df_curr_norm.index)
-
-snapshot_date_series = df_curr_norm["情報取得日"].dropna()
-snapshot_date = (
-    str(snapshot_date_series.iloc[0]).strip()
-    if not snapshot_date_series.empty and str(snapshot_date_series.iloc[0]).strip()
-    else fallback_date_from_filename(CURR_CSV)
-)
-
-# =====================
-# 1️⃣ 新規物件: マスターへ追加
-# =====================
-new_ids = curr_ids - master_ids
-df_new = df_curr_norm.loc[list(new_ids)].copy() if new_ids else pd.DataFrame(columns=df_master_norm.columns)
-if not df_new.empty:
-    df_new["追加年月日"] = df_new["情報取得日"]
-    df_new["削除年月日"] = ""
-
-# =====================
-# 2️⃣ 削除物件: マスターの削除年月日を更新
-# =====================
-lost_ids = master_ids - curr_ids
-for pid in lost_ids:
-    val = df_master_norm.at[pid, "削除年月日"]
-    if pd.isna(val) or str(val).strip() == "":
-        df_master_norm.at[pid, "削除年月日"] = snapshot_date
-
-# =====================
-# 3️⃣ 継続物件: 指定列以外を上書き
-# =====================
-common_ids = master_ids & curr_ids
-
-old_price_map = {}
-if "販売価格" in df_master_norm.columns:
-    old_price_map = {pid: df_master_norm.at[pid, "販売価格"] for pid in common_ids}
-
-update_cols = [
-    c
-    for c in df_curr_norm.columns
-    if c in df_master_norm.columns and c not in PROTECTED_UPDATE_COLUMNS
-]
-
-for pid in common_ids:
-    for col in update_cols:
-        df_master_norm.at[pid, col] = df_curr_norm.at[pid, col]
-    df_master_norm.at[pid, "削除年月日"] = ""
+def load_master():
+    """マスターを読み込み、(DataFrame, SQLite 接続 or None) を返す。"""
+    # SQLite マスター → Parquet（CSV より新しい場合）→ CSV の順に読む
+    if _db.ENABLED:
+        db_conn = _db.connect(Path(MASTER_DB))
+        if not _db.has_master(db_conn):
+            _db.import_csv(db_conn, Path(MASTER_CSV))
+        return _db.read_master(db_conn), db_conn
+    if _store.is_up_to_date(Path(MASTER_CSV), Path(MASTER_PARQUET)):
+        return _store.read_master(Path(MASTER_PARQUET)), None
+    return pd.read_csv(MASTER_CSV, encoding=ENCODING), None
+
+
+def append_rows(df_master, df_new):
+    """
+    マスターの後ろに新規物件の行を足す（列は両方の和集合、マスターの列順）。
+
+    空の表や全て欠損の列を pd.concat に渡すと FutureWarning が出て、将来は結果の dtype も変わるため、
+    新規がなければ concat せず、全て欠損の列は相手側にその列があれば concat の前に外す。
+    """
+    columns = df_master.columns.union(df_new.columns, sort=False)
+    if df_new.empty:
+        return df_master.reindex(columns=columns).reset_index(drop=True)
+    if df_master.empty:
+        # 新規にない列はマスターの dtype のまま（空のマスターは列構成だけを持つ）
+        missing = {c: df_master[c].dtype for c in df_master.columns if c not in df_new.columns}
+        return df_new.reindex(columns=columns).astype(missing).reset_index(drop=True)
+
+    master_na = [c for c in df_master.columns if c in df_new.columns and df_master[c].isna().all()]
+    new_na = [c for c in df_new.columns if c in df_master.columns and c not in master_na and df_new[c].isna().all()]
+    frames = [df_master.drop(columns=master_na), df_new.drop(columns=new_na)]
+    return pd.concat(frames, axis=0).reindex(columns=columns).reset_index(drop=True)
+
+
+@dataclass
+class SnapshotResult:
+    master: pd.DataFrame  # 更新後のマスター
+    new: pd.DataFrame  # 新規物件
+    common: pd.DataFrame  # 継続物件（更新後）
+    newly_deleted: dict  # 物件ID -> 削除年月日（今回削除扱いになったもの）
+    price_logs: pd.DataFrame  # 価格変動履歴（今回分）
+    lost_count: int
+
+
+def apply_snapshot(df_master, df_curr_raw, curr_csv, aliases=None):
+    """
+    1つのスナップショットをマスターに反映する（ファイルの読み書きはしない）。
+
+    df_master が None の場合は空のマスターから始める。
+    aliases（物件ID → クラスタID）を渡すと、サイト間の重複物件を同じ物件IDとして扱う。
+    """
+    # =====================
+    # ① スナップショットに物件IDを付与し、重複IDを優先度で解消
+    # =====================
+    df_curr_raw = df_curr_raw.copy()
+    property_ids = generate_property_ids(df_curr_raw)
+    if aliases:
+        property_ids = property_ids.map(aliases).fillna(property_ids)
+    df_curr_raw["物件ID"] = property_ids
+    df_curr_raw["_url_rank"] = df_curr_raw["URL"].apply(url_priority)
+    df_curr_norm = (
+        df_curr_raw.sort_values(["物件ID", "_url_rank", "情報取得日"], ascending=[True, True, False])
+        .drop_duplicates(subset=["物件ID"], keep="first")
+        .drop(columns=["_url_rank"])
+    )
 
-# =====================
-# 4️⃣ マスター統合・保存
-# =====================
-df_master_updated = pd.concat([df_master_norm, df_new], axis=0).reset_index(drop=True)
-df_master_updated.to_csv(MASTER_CSV, index=False, encoding=ENCODING)
+    # =====================
+    # ② マスター側の列補正
+    # =====================
+    if df_master is None:
+        df_master = df_curr_norm.iloc[0:0].reset_index(drop=True)
+    for col in ["追加年月日", "削除年月日"]:
+        if col not in df_master.columns:
+            df_master[col] = ""
+
+    # =====================
+    # ③ マスター正規化（1ID=1行）
+    # =====================
+    df_master_norm = (
+        df_master.sort_values("情報取得日").groupby("物件ID", as_index=False).last()
+    )
 
-# =====================
-# 5️⃣ 価格変動履歴を追記
-# =====================
-price_logs = []
+    # index を物件IDに
+    df_master_norm = df_master_norm.set_index("物件ID", drop=False)
+    df_curr_norm = df_curr_norm.set_index("物件ID", drop=False)
 
-for pid in common_ids:
-    old_price = to_float(old_price_map.get(pid))
-    new_price = to_float(df_curr_norm.at[pid, "販売価格"]) if "販売価格" in df_curr_norm.columns else None
+    master_ids = set(df_master_norm.index)
+    curr_ids = set(df_curr_norm.index)
 
-    if old_price is None or new_price is None:
-        continue
+    snapshot_date_series = df_curr_norm["情報取得日"].dropna()
+    snapshot_date = (
+        str(snapshot_date_series.iloc[0]).strip()
+        if not snapshot_date_series.empty and str(snapshot_date_series.iloc[0]).strip()
+        else fallback_date_from_filename(curr_csv)
+    )
 
-    if old_price != new_price:
-        row = df_curr_norm.loc[pid].to_dict()
-        row["価格差"] = new_price - old_price
-        row["変化年月日"] = snapshot_date
-        price_logs.append(row)
+    # =====================
+    # 1️⃣ 新規物件: マスターへ追加
+    # =====================
+    new_ids = curr_ids - master_ids
+    df_new = df_curr_norm.loc[list(new_ids)].copy() if new_ids else pd.DataFrame(columns=df_master_norm.columns)
+    if not df_new.empty:
+        df_new["追加年月日"] = df_new["情報取得日"]
+        df_new["削除年月日"] = ""
+
+    # =====================
+    # 2️⃣ 削除物件: マスターの削除年月日を更新（未設定の行だけ）
+    # =====================
+    lost_ids = master_ids - curr_ids
+    lost_mask = df_master_norm.index.isin(list(lost_ids))
+    deleted_at = df_master_norm["削除年月日"]
+    deleted_blank = deleted_at.isna() | (deleted_at.astype(str).str.strip() == "")
+    newly_deleted_ids = df_master_norm.index[lost_mask & deleted_blank]
+    df_master_norm.loc[lost_mask & deleted_blank, "削除年月日"] = snapshot_date
+
+    # =====================
+    # 3️⃣ 継続物件: 指定列以外を上書き（物件IDで揃えて一括代入）
+    # =====================
+    common_index = df_master_norm.index.intersection(df_curr_norm.index)
+
+    old_prices = None
+    if "販売価格" in df_master_norm.columns:
+        old_prices = df_master_norm.loc[common_index, "販売価格"].copy()
+
+    update_cols = [
+        c
+        for c in df_curr_norm.columns
+        if c in df_master_norm.columns and c not in PROTECTED_UPDATE_COLUMNS
+    ]
+
+    if len(common_index):
+        df_master_norm.loc[common_index, update_cols] = df_curr_norm.loc[common_index, update_cols]
+        df_master_norm.loc[common_index, "削除年月日"] = ""
+
+    # =====================
+    # 4️⃣ マスター統合
+    # =====================
+    df_master_updated = append_rows(df_master_norm, df_new)
+
+    # =====================
+    # 5️⃣ 価格変動履歴（継続物件の新旧価格を列単位で比較）
+    # =====================
+    price_logs = pd.DataFrame()
+
+    if old_prices is not None and "販売価格" in df_curr_norm.columns and len(common_index):
+        old_num = pd.to_numeric(_map_unique(old_prices, to_float), errors="coerce")
+        new_num = pd.to_numeric(
+            _map_unique(df_curr_norm.loc[common_index, "販売価格"], to_float), errors="coerce"
+        )
+        changed = old_num.notna() & new_num.notna() & (old_num != new_num)
+
+        if changed.any():
+            changed_index = common_index[changed.to_numpy()]
+            price_logs = pd.DataFrame(
+                {
+                    "物件ID": changed_index,
+                    "変化年月日": snapshot_date,
+                    "旧価格": old_num[changed].to_numpy(),
+                    "新価格": new_num[changed].to_numpy(),
+                    "価格差": (new_num - old_num)[changed].to_numpy(),
+                    "URL": df_curr_norm.loc[changed_index, "URL"].to_numpy(),
+                },
+                columns=_history.COLUMNS,
+            )
+
+    return SnapshotResult(
+        master=df_master_updated,
+        new=df_new,
+        common=df_master_norm.loc[common_index],
+        newly_deleted={pid: snapshot_date for pid in newly_deleted_ids},
+        price_logs=price_logs,
+        lost_count=len(lost_ids),
+    )
 
-if price_logs:
-    df_price_diff_new = pd.DataFrame(price_logs)
 
-    try:
-        df_price_diff_old = pd.read_csv(PRICE_DIFF_CSV, encoding=ENCODING)
-        df_price_diff = pd.concat([df_price_diff_old, df_price_diff_new], ignore_index=True)
-    except FileNotFoundError:
-        df_price_diff = df_price_diff_new
-
-    df_price_diff.to_csv(PRICE_DIFF_CSV, index=False, encoding=ENCODING)
-
-print("✅ スナップショットID生成・重複解消・マスター更新 完了")
-print(f"  新規追加: {len(new_ids)} 件")
-print(f"  削除処理: {len(lost_ids)} 件")
-print(f"  継続更新: {len(common_ids)} 件")
-print(f"  価格変動履歴: {len(price_logs)} 件")
+def save_master(df_master_updated):
+    df_master_updated.to_csv(MASTER_CSV, index=False, encoding=ENCODING)
+    if _store.pa is not None:
+        _store.write_master(df_master_updated, Path(MASTER_PARQUET))
+
+
+def append_price_logs(price_logs):
+    """価格変動履歴を月別パーティションに追記する（既存の履歴は読み直さない）。"""
+    _history.append(price_logs, Path(PRICE_HISTORY_DIR))
+
+
+def load_aliases():
+    """25_duplicate_matcher.py のクラスタ表（物件ID → クラスタID）。表がなければ空。"""
+    return _dup.load_aliases(Path(CLUSTER_CSV))
+
+
+def main(curr_csv=CURR_CSV):
+    df_master, db_conn = load_master()
+    df_curr_raw = pd.read_csv(curr_csv, encoding=ENCODING)
+
+    result = apply_snapshot(df_master, df_curr_raw, curr_csv, load_aliases())
+
+    if db_conn is not None:
+        # 変化のあった行だけを1トランザクションで反映する
+        _db.apply_master_changes(db_conn, result.new, result.common, result.newly_deleted)
+        db_conn.close()
+    save_master(result.master)
+    append_price_logs(result.price_logs)
+
+    print("✅ スナップショットID生成・重複解消・マスター更新 完了")
+    print(f"  新規追加: {len(result.new)} 件")
+    print(f"  削除処理: {result.lost_count} 件")
+    print(f"  継続更新: {len(result.common)} 件")
+    print(f"  価格変動履歴: {len(result.price_logs)} 件")
+
+
+def backfill(snapshot_dir, fresh=False):
+    """
+    スナップショットのディレクトリを日付順にまとめて反映する。
+
+    マスターはメモリ上で持ち回り、マスターと価格変動履歴の書き込みは最後の1回だけ。
+    1ファイルずつ main を実行した場合と同じ結果になる。
+    fresh=True の場合は既存のマスター・価格変動履歴を使わず、空の状態から作り直す。
+    """
+    snapshots = sorted(Path(snapshot_dir).glob("3data_*.csv"), key=lambda p: extract_yymmdd(p.name))
+    if not snapshots:
+        raise FileNotFoundError(f"スナップショットがありません: {snapshot_dir}")
+
+    db_conn = None
+    if fresh:
+        # 列構成（check・詳細項目の列など）だけは既存のマスターに揃える
+        df_master = pd.read_csv(MASTER_CSV, encoding=ENCODING, nrows=0) if Path(MASTER_CSV).exists() else None
+    else:
+        df_master, db_conn = load_master()
+
+    start = time.perf_counter()
+    aliases = load_aliases()
+    price_logs = []
+    for path in snapshots:
+        df_curr_raw = pd.read_csv(path, encoding=ENCODING)
+        result = apply_snapshot(df_master, df_curr_raw, str(path), aliases)
+        df_master = result.master
+        if not result.price_logs.empty:
+            price_logs.append(result.price_logs)
+        print(
+            f"  {path.name}: 新規 {len(result.new)} / 削除 {result.lost_count} / "
+            f"継続 {len(result.common)} / 価格変動 {len(result.price_logs)}"
+        )
+
+    if fresh:
+        shutil.rmtree(PRICE_HISTORY_DIR, ignore_errors=True)
+        if _db.ENABLED:
+            Path(MASTER_DB).unlink(missing_ok=True)
+            db_conn = _db.connect(Path(MASTER_DB))
+    elif _db.ENABLED and db_conn is None:
+        db_conn = _db.connect(Path(MASTER_DB))
+
+    if db_conn is not None:
+        _db.write_master(db_conn, df_master)
+        db_conn.close()
+    save_master(df_master)
+    if price_logs:
+        append_price_logs(pd.concat(price_logs, ignore_index=True))
+
+    print(f"✅ バックフィル完了: {len(snapshots)} ファイル / {len(df_master)} 件 ({time.perf_counter() - start:.1f}s)")
+    print(f"  {_text.CACHE.summary()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="スナップショットをマスターに反映する")
+    parser.add_argument("snapshot", nargs="?", default=CURR_CSV, help="今回のスナップショット CSV")
+    parser.add_argument("--backfill", metavar="DIR", help="ディレクトリ内のスナップショットを日付順にまとめて反映する")
+    parser.add_argument("--fresh", action="store_true", help="--backfill で既存のマスターを使わず作り直す")
+    args = parser.parse_args()
+
+    if args.backfill:
+        backfill(args.backfill, fresh=args.fresh)
+    else:
+        main(args.snapshot)
@@ -0,0 +1,247 @@
+"""90_3data_master.csv と並べて置く列指向（Parquet）版マスター。
+
+CSV は全列を文字列として毎回パースし直す必要があるため、
+型付きのスキーマで Parquet に保存し、必要な列・行だけを読めるようにする。
+
+- 種別 / 沿線 / 駅 / 最小最大 / check … カテゴリ（辞書エンコード）
+- 販売価格・面積・坪単価・築年数・徒歩 … 数値（float64）
+- 情報取得日 / 追加年月日 / 削除年月日 … 日付（書式が揃っていない場合は文字列のまま）
+
+列の絞り込み（columns）と行の絞り込み（filters）は pyarrow に渡され、
+不要な列・行グループは読み込まれない。
+CSV への書き戻しは元の CSV と同じ表記（整数は小数点なし、日付は元の書式）になる。
+
+pyarrow が必要（未インストールの場合、各関数は ImportError を送出する）。
+
+使い方:
+  python 22_master_store.py build    # CSV → Parquet
+  python 22_master_store.py export   # Parquet → CSV
+  python 22_master_store.py stats    # 読み込み時間・メモリの比較
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - 未インストール環境
+    pa = None
+
+BASE_DIR = Path(__file__).resolve().parent
+MASTER_CSV = BASE_DIR / "90_3data_master.csv"
+MASTER_PARQUET = BASE_DIR / "90_3data_master.parquet"
+ENCODING = "utf-8-sig"
+
+CATEGORY_COLUMNS = ["種別", "沿線", "駅", "最小最大", "check"]
+NUMERIC_COLUMNS = [
+    "販売価格",
+    "土地面積（m2）",
+    "建物面積（m2）",
+    "坪単価（万円／坪）",
+    "築年月（年数換算）",
+    "徒歩",
+]
+DATE_COLUMNS = ["情報取得日", "追加年月日", "削除年月日"]
+
+# 日付列で受け付ける書式（先頭から順に試す）
+DATE_FORMATS = {
+    "%Y/%m/%d": lambda d: f"{d.year}/{d.month}/{d.day}",
+    "%Y-%m-%d": lambda d: d.strftime("%Y-%m-%d"),
+}
+
+_METADATA_KEY = b"master_store"
+
+# pd.read_csv が文字列列に使う dtype（pandas 2 は object、pandas 3 は str）
+_TEXT_DTYPE = pd.Series(["a"]).dtype
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("列指向マスターには pyarrow が必要です（pip install pyarrow）")
+
+
+def _detect_date_format(values: pd.Series) -> Optional[str]:
+    """全ての値が同じ書式で解釈でき、書き戻しても同じ文字列になる場合だけ書式を返す。"""
+    texts = values.dropna().astype(str)
+    texts = texts[texts.str.strip() != ""]
+    for fmt, render in DATE_FORMATS.items():
+        try:
+            parsed = [datetime.strptime(text, fmt).date() for text in texts.unique()]
+        except ValueError:
+            continue
+        if all(render(d) == text for d, text in zip(parsed, texts.unique())):
+            return fmt
+    return None
+
+
+def _to_arrow(df: pd.DataFrame) -> "pa.Table":
+    arrays = []
+    fields = []
+    date_formats: Dict[str, str] = {}
+
+    for col in df.columns:
+        series = df[col]
+        if col in NUMERIC_COLUMNS:
+            array = pa.array(pd.to_numeric(series, errors="coerce"), type=pa.float64(), from_pandas=True)
+        elif col in DATE_COLUMNS and (fmt := _detect_date_format(series)) is not None:
+            date_formats[col] = fmt
+            texts = series.astype(object).where(series.notna(), None)
+            dates = [
+                datetime.strptime(text, fmt).date() if isinstance(text, str) and text.strip() else None
+                for text in texts
+            ]
+            array = pa.array(dates, type=pa.date32())
+        else:
+            texts = series.astype(object).where(series.notna(), None)
+            array = pa.array([None if v is None else str(v) for v in texts], type=pa.string())
+            if col in CATEGORY_COLUMNS:
+                array = array.dictionary_encode()
+        arrays.append(array)
+        fields.append(pa.field(col, array.type))
+
+    metadata = {_METADATA_KEY: json.dumps({"date_formats": date_formats}, ensure_ascii=False).encode("utf-8")}
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+
+def _date_formats(schema: "pa.Schema") -> Dict[str, str]:
+    raw = (schema.metadata or {}).get(_METADATA_KEY)
+    return json.loads(raw)["date_formats"] if raw else {}
+
+
+def write_master(df: pd.DataFrame, path: Path = MASTER_PARQUET) -> None:
+    """マスターを型付きスキーマの Parquet として保存する。"""
+    _require_pyarrow()
+    tmp_path = path.with_name(path.name + ".tmp")
+    pq.write_table(_to_arrow(df), tmp_path, compression="zstd", row_group_size=4096)
+    tmp_path.replace(path)
+
+
+def read_master(
+    path: Path = MASTER_PARQUET,
+    columns: Optional[Sequence[str]] = None,
+    filter_expression=None,
+    as_text: bool = True,
+) -> pd.DataFrame:
+    """
+    Parquet のマスターを読み込む。
+
+    columns で読む列を、filter_expression（pyarrow.dataset の式）で読む行を絞り込む。
+    as_text=True の場合は pd.read_csv で CSV を読んだときと同じ型
+    （文字列・float・元の書式の日付文字列）に戻して返す。
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(str(path), format="parquet")
+    table = dataset.to_table(columns=list(columns) if columns else None, filter=filter_expression)
+
+    if not as_text:
+        return table.to_pandas()
+
+    date_formats = _date_formats(pq.read_schema(str(path)))
+    df = table.to_pandas()
+    for col in df.columns:
+        if col in date_formats:
+            render = DATE_FORMATS[date_formats[col]]
+            texts = df[col].map(lambda d: render(d) if pd.notna(d) else np.nan)
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            texts = df[col].astype(object).where(df[col].notna(), np.nan)
+        else:
+            continue
+        df[col] = texts.astype(_TEXT_DTYPE)
+    return df
+
+
+def check_targets_filter():
+    """07 が処理する行（check が not か空）を選ぶ式。"""
+    _require_pyarrow()
+    check = ds.field("check")
+    return check.isin(["not", ""]) | check.is_null()
+
+
+def is_up_to_date(csv_path: Path = MASTER_CSV, parquet_path: Path = MASTER_PARQUET) -> bool:
+    """Parquet が CSV 以降に書かれていれば True（Excel 等で CSV を直した場合は False）。"""
+    if pa is None or not parquet_path.exists() or not csv_path.exists():
+        return False
+    return parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+
+
+def _format_value(value, render=None) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if render is not None:
+        return render(value)
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+def export_csv(parquet_path: Path = MASTER_PARQUET, csv_path: Path = MASTER_CSV) -> int:
+    """Parquet を元の CSV と同じ表記で書き出し、行数を返す。"""
+    _require_pyarrow()
+    table = pq.read_table(str(parquet_path))
+    date_formats = _date_formats(table.schema)
+    renders = [DATE_FORMATS[date_formats[name]] if name in date_formats else None for name in table.column_names]
+    columns: List[list] = [column.to_pylist() for column in table.columns]
+
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    with tmp_path.open("w", encoding=ENCODING, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(table.column_names)
+        for row in zip(*columns):
+            writer.writerow([_format_value(value, render) for value, render in zip(row, renders)])
+    tmp_path.replace(csv_path)
+    return table.num_rows
+
+
+def build_from_csv(csv_path: Path = MASTER_CSV, parquet_path: Path = MASTER_PARQUET) -> int:
+    df = pd.read_csv(csv_path, encoding=ENCODING)
+    write_master(df, parquet_path)
+    return len(df)
+
+
+def _stats() -> None:
+    start = time.perf_counter()
+    df_csv = pd.read_csv(MASTER_CSV, encoding=ENCODING)
+    csv_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df_typed = read_master(as_text=False)
+    parquet_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df_targets = read_master(columns=["物件ID", "URL", "check"], filter_expression=check_targets_filter())
+    target_sec = time.perf_counter() - start
+
+    mb = 1024 * 1024
+    print(f"CSV 全列           : {csv_sec:.3f}s  {df_csv.memory_usage(deep=True).sum() / mb:.1f} MB")
+    print(f"Parquet 全列(型付) : {parquet_sec:.3f}s  {df_typed.memory_usage(deep=True).sum() / mb:.1f} MB")
+    print(f"Parquet check対象  : {target_sec:.3f}s  {len(df_targets)} 行")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="列指向マスター（Parquet）の管理")
+    parser.add_argument("command", choices=["build", "export", "stats"])
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"作成: {MASTER_PARQUET.name} ({build_from_csv()} 行)")
+    elif args.command == "export":
+        print(f"出力: {MASTER_CSV.name} ({export_csv()} 行)")
+    elif args.command == "stats":
+        _stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""SQLite を使ったマスター（任意）。
+
+環境変数 MASTER_BACKEND=sqlite を指定すると、21_master_compare.py と
+07_master_check_updater.py は 90_3data_master.sqlite3 をマスターとして読み書きする。
+CSV（90_3data_master.csv）は Excel で見る人のために毎回書き出す。
+
+- 物件ID を主キーとし、URL / check / 削除年月日 に索引を張る
+- 21 の新規・削除・継続の反映は1トランザクションでまとめて upsert する
+- 07 は check が not / 空 / ok の行と、削除済みなのに cannot になっていない行だけを索引で引き、
+  1行ずつ UPDATE する（CSV全体の書き直しは終了時の1回だけ）
+- WAL モードなので、書き込み中も他のプロセスから読み込める
+
+使い方:
+  python 23_master_db.py import   # 90_3data_master.csv → SQLite
+  python 23_master_db.py export   # SQLite → 90_3data_master.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+MASTER_DB = BASE_DIR / "90_3data_master.sqlite3"
+MASTER_CSV = BASE_DIR / "90_3data_master.csv"
+ENCODING = "utf-8-sig"
+
+ENABLED = os.environ.get("MASTER_BACKEND", "") == "sqlite"
+
+TABLE = "master"
+KEY_COLUMN = "物件ID"
+INDEXED_COLUMNS = ["URL", "check", "削除年月日"]
+REAL_COLUMNS = {
+    "販売価格",
+    "土地面積（m2）",
+    "建物面積（m2）",
+    "坪単価（万円／坪）",
+    "築年月（年数換算）",
+    "徒歩",
+}
+
+# pd.read_csv が文字列列に使う dtype（pandas 2 は object、pandas 3 は str）
+_TEXT_DTYPE = pd.Series(["a"]).dtype
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(path: Path = MASTER_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _existing_columns(conn: sqlite3.Connection) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(TABLE)})")]
+
+
+def has_master(conn: sqlite3.Connection) -> bool:
+    return bool(_existing_columns(conn))
+
+
+def ensure_schema(conn: sqlite3.Connection, columns: Iterable[str]) -> None:
+    """テーブル・索引を作成し、足りない列を追加する。"""
+    columns = list(columns)
+    existing = _existing_columns(conn)
+
+    if not existing:
+        defs = []
+        for col in columns:
+            col_type = "REAL" if col in REAL_COLUMNS else "TEXT"
+            suffix = " PRIMARY KEY" if col == KEY_COLUMN else ""
+            defs.append(f"{_quote(col)} {col_type}{suffix}")
+        conn.execute(f"CREATE TABLE {_quote(TABLE)} ({', '.join(defs)})")
+    else:
+        for col in columns:
+            if col not in existing:
+                col_type = "REAL" if col in REAL_COLUMNS else "TEXT"
+                conn.execute(f"ALTER TABLE {_quote(TABLE)} ADD COLUMN {_quote(col)} {col_type}")
+
+    for col in INDEXED_COLUMNS:
+        if col in columns or col in existing:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote('idx_master_' + col)} ON {_quote(TABLE)} ({_quote(col)})"
+            )
+    conn.commit()
+
+
+def _to_db_value(col: str, value):
+    """CSV と同じく、欠損値と空文字は NULL として保存する。"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if col in REAL_COLUMNS:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    text = str(value)
+    return text if text != "" else None
+
+
+def upsert_frame(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    """物件IDをキーに行を挿入または上書きする（トランザクションは呼び出し側で管理）。"""
+    if df.empty:
+        return 0
+    columns = list(df.columns)
+    placeholders = ", ".join("?" for _ in columns)
+    updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in columns if c != KEY_COLUMN)
+    sql = (
+        f"INSERT INTO {_quote(TABLE)} ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders}) "
+        f"ON CONFLICT({_quote(KEY_COLUMN)}) DO UPDATE SET {updates}"
+    )
+    rows = (
+        [_to_db_value(col, value) for col, value in zip(columns, record)]
+        for record in df.itertuples(index=False, name=None)
+    )
+    conn.executemany(sql, rows)
+    return len(df)
+
+
+def apply_master_changes(
+    conn: sqlite3.Connection,
+    df_new: pd.DataFrame,
+    df_common: pd.DataFrame,
+    lost_deleted_at: Dict[str, str],
+) -> None:
+    """21 の新規・継続・削除の結果を1トランザクションで反映する。"""
+    columns = list(dict.fromkeys([*df_common.columns, *df_new.columns]))
+    ensure_schema(conn, columns)
+    with conn:
+        upsert_frame(conn, df_new)
+        upsert_frame(conn, df_common)
+        conn.executemany(
+            f"UPDATE {_quote(TABLE)} SET {_quote('削除年月日')} = ? WHERE {_quote(KEY_COLUMN)} = ?",
+            [(deleted_at, pid) for pid, deleted_at in lost_deleted_at.items()],
+        )
+
+
+def write_master(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    """マスター全体を置き換える（21 のバックフィル用）。"""
+    ensure_schema(conn, df.columns)
+    with conn:
+        conn.execute(f"DELETE FROM {_quote(TABLE)}")
+        return upsert_frame(conn, df)
+
+
+def read_master(conn: sqlite3.Connection, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """pd.read_csv で CSV を読んだときと同じ型の DataFrame を返す（行順は登録順）。"""
+    select = ", ".join(_quote(c) for c in columns) if columns else "*"
+    df = pd.read_sql_query(f"SELECT {select} FROM {_quote(TABLE)} ORDER BY rowid", conn)
+    for col in df.columns:
+        if col in REAL_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        else:
+            df[col] = df[col].astype(object).where(df[col].notna(), np.nan).astype(_TEXT_DTYPE)
+    return df
+
+
+def check_targets(conn: sqlite3.Connection, include_ok: bool = False) -> List[Dict[str, str]]:
+    """
+    07 の処理対象行（check が not/空、または削除済みで cannot 未設定）を索引で取得する。
+
+    include_ok=True の場合は再確認の候補として check=ok の行も含める。
+    """
+    checks = "('not', '', 'ok')" if include_ok else "('not', '')"
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT * FROM {_quote(TABLE)}
+            WHERE {_quote('check')} IS NULL
+               OR {_quote('check')} IN {checks}
+               OR ({_quote('削除年月日')} IS NOT NULL AND {_quote('check')} != 'cannot')
+            ORDER BY rowid
+            """
+        ).fetchall()
+    finally:
+        conn.row_factory = None
+    return [{key: ("" if row[key] is None else str(row[key])) for key in row.keys()} for row in rows]
+
+
+def update_check(conn: sqlite3.Connection, row: Dict[str, str], fields: Iterable[str]) -> None:
+    """1行分の check と取得項目だけを主キーで更新する。"""
+    columns = ["check", *fields]
+    assignments = ", ".join(f"{_quote(c)} = ?" for c in columns)
+    with conn:
+        conn.execute(
+            f"UPDATE {_quote(TABLE)} SET {assignments} WHERE {_quote(KEY_COLUMN)} = ?",
+            [_to_db_value(c, row.get(c, "")) for c in columns] + [row.get(KEY_COLUMN, "")],
+        )
+
+
+def import_csv(conn: sqlite3.Connection, csv_path: Path = MASTER_CSV) -> int:
+    df = pd.read_csv(csv_path, encoding=ENCODING)
+    ensure_schema(conn, df.columns)
+    with conn:
+        return upsert_frame(conn, df)
+
+
+def export_csv(conn: sqlite3.Connection, csv_path: Path = MASTER_CSV) -> int:
+    df = read_master(conn)
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    df.to_csv(tmp_path, index=False, encoding=ENCODING)
+    tmp_path.replace(csv_path)
+    return len(df)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite マスターの管理")
+    parser.add_argument("command", choices=["import", "export"])
+    args = parser.parse_args()
+
+    conn = connect()
+    if args.command == "import":
+        print(f"登録: {import_csv(conn)} 行 -> {MASTER_DB.name}")
+    elif args.command == "export":
+        print(f"出力: {export_csv(conn)} 行 -> {MASTER_CSV.name}")
+
+
+if __name__ == "__main__":
+    main()
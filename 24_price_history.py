@@ -0,0 +1,149 @@
+"""価格変動履歴（追記専用・月別パーティション）。
+
+21_master_compare.py が検出した価格変動を price_history/YYYY-MM.csv
+（変化年月日の年月ごと）に追記する。既存の履歴は読み直さないため、
+1回の書き込みコストは履歴全体の大きさに依存しない。
+
+列: 物件ID, 変化年月日, 旧価格, 新価格, 価格差, URL
+
+使い方:
+  python 24_price_history.py import          # 旧形式の 91_diff_price_change.csv を取り込む
+  python 24_price_history.py show 物件ID     # 1物件の価格履歴を表示
+  python 24_price_history.py stats           # パーティションごとの件数
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+from io import StringIO
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+HISTORY_DIR = BASE_DIR / "price_history"
+LEGACY_CSV = BASE_DIR / "91_diff_price_change.csv"
+ENCODING = "utf-8-sig"
+
+COLUMNS = ["物件ID", "変化年月日", "旧価格", "新価格", "価格差", "URL"]
+UNKNOWN_PARTITION = "unknown"
+
+_MONTH_RE = re.compile(r"(\d{4})[/\-年](\d{1,2})")
+
+
+def partition_of(date_text) -> str:
+    """変化年月日（2026/1/9・2026-01-09 など）からパーティション名 YYYY-MM を返す。"""
+    m = _MONTH_RE.search(str(date_text))
+    if not m:
+        return UNKNOWN_PARTITION
+    return f"{m.group(1)}-{int(m.group(2)):02d}"
+
+
+def _partition_path(name: str, history_dir: Path) -> Path:
+    return history_dir / f"{name}.csv"
+
+
+def _partitions(history_dir: Path) -> list[Path]:
+    return sorted(history_dir.glob("*.csv")) if history_dir.exists() else []
+
+
+def append(records: pd.DataFrame, history_dir: Path = HISTORY_DIR) -> int:
+    """履歴を該当月のパーティションに追記し、追記した行数を返す。"""
+    if records.empty:
+        return 0
+
+    records = records.reindex(columns=COLUMNS)
+    history_dir.mkdir(parents=True, exist_ok=True)
+    months = records["変化年月日"].map(partition_of)
+
+    for name, part in records.groupby(months, sort=True):
+        path = _partition_path(name, history_dir)
+        write_header = not path.exists() or path.stat().st_size == 0
+        # 追記モードでもファイル先頭でなければ BOM は書かれない
+        with path.open("a", encoding=ENCODING, newline="") as f:
+            part.to_csv(f, header=write_header, index=False)
+    return len(records)
+
+
+def read_history(history_dir: Path = HISTORY_DIR, months: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """全パーティション（months 指定時はその年月だけ）を読み込む。"""
+    wanted = set(months) if months is not None else None
+    frames = [
+        pd.read_csv(path, encoding=ENCODING, dtype={"物件ID": str})
+        for path in _partitions(history_dir)
+        if wanted is None or path.stem in wanted
+    ]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def history_of(property_id: str, history_dir: Path = HISTORY_DIR) -> pd.DataFrame:
+    """
+    1物件の価格履歴を古い順に返す。
+
+    各パーティションを行頭の物件IDだけで絞り込み、該当行だけを DataFrame にする。
+    """
+    prefix = f"{property_id},"
+    rows = []
+    for path in _partitions(history_dir):
+        with path.open(encoding=ENCODING, newline="") as f:
+            next(f, None)
+            rows.extend(line for line in f if line.startswith(prefix))
+
+    if not rows:
+        return pd.DataFrame(columns=COLUMNS)
+
+    text = ",".join(COLUMNS) + "\n" + "".join(rows)
+    return pd.read_csv(StringIO(text), dtype={"物件ID": str})
+
+
+def from_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    """旧形式（スナップショットの全列 + 物件ID 重複 + 価格差 + 変化年月日）を新しい列構成に変換する。"""
+    # 旧形式は物件ID列が2つあり、後ろ（pandas では 物件ID.1）に実際のIDが入っている
+    ids = df["物件ID.1"] if "物件ID.1" in df.columns else df["物件ID"]
+    if "物件ID.1" in df.columns:
+        ids = ids.fillna(df["物件ID"])
+
+    new_price = pd.to_numeric(df.get("販売価格"), errors="coerce")
+    diff = pd.to_numeric(df.get("価格差"), errors="coerce")
+    return pd.DataFrame(
+        {
+            "物件ID": ids,
+            "変化年月日": df["変化年月日"],
+            "旧価格": new_price - diff,
+            "新価格": new_price,
+            "価格差": diff,
+            "URL": df.get("URL"),
+        }
+    )
+
+
+def import_legacy(csv_path: Path = LEGACY_CSV, history_dir: Path = HISTORY_DIR) -> int:
+    return append(from_legacy(pd.read_csv(csv_path, encoding=ENCODING)), history_dir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="価格変動履歴の管理")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="91_diff_price_change.csv を取り込む")
+    show = sub.add_parser("show", help="1物件の価格履歴を表示")
+    show.add_argument("property_id")
+    sub.add_parser("stats", help="パーティションごとの件数")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"取り込み: {import_legacy()} 件 -> {HISTORY_DIR.name}/")
+    elif args.command == "show":
+        print(history_of(args.property_id).to_string(index=False))
+    elif args.command == "stats":
+        for path in _partitions(HISTORY_DIR):
+            with path.open(encoding=ENCODING) as f:
+                count = sum(1 for _ in f) - 1
+            print(f"{path.stem}\t{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""サイト間の重複物件の検出（ブロッキング + 近似一致）。
+
+generate_property_id は町名までの所在地・種別・最小最大・面積の切り捨て値が完全に一致する
+物件しかまとめないため、suumo と nifty で面積が 0.01m2 違う・町名の表記が少し違う
+同じ物件は別々の物件IDになる。ここでは
+
+  市区町村 + 種別 + 最小最大 + 土地面積・建物面積・販売価格のバケット
+
+をブロックキーにして、同じブロックに入った物件同士だけを比較する。全組み合わせを比べないので、
+比較回数はマスターの件数にほぼ比例する。一致したものは union-find でクラスタにまとめ、
+
+  92_duplicate_clusters.csv（物件ID, クラスタID, URL）
+
+に保存する。クラスタID は url_priority と同じサイト順（suumo → sumaity → nifty）で
+先頭に来る物件の物件ID。21_master_compare.py はこの表があればスナップショットの物件IDを
+クラスタIDに読み替え、同じクラスタの掲載を url_priority で1件に絞る。
+
+・同じサイトの掲載同士はまとめない（分譲地の隣り合う区画を別物件として残すため）
+・1つのクラスタには1サイトにつき1件まで
+・削除年月日が入っている物件は新しい組の検出には使わない
+
+build は既存のクラスタ表を引き継ぎ、マスターで見つかった新しい組だけを追加する（クラスタIDも変えない）。
+21 がクラスタIDに読み替えた物件の元の行には削除年月日が入るので、表を作り直すとその物件が
+クラスタから外れ、次の 21 で別物件に戻ってしまうため。作り直す場合は build --fresh を使う。
+01_0run_all_scraping.py では 07 の後の 25_duplicate_clusters ステージが毎回 build し、次回の 21 がそれを使う。
+21 を手で実行する場合は、先に build しておくこと（古い表でも誤った統合にはならないが、新しい重複は拾えない）。
+
+使い方:
+  python 25_duplicate_matcher.py build           # マスターの新しい重複をクラスタ表に追加する
+  python 25_duplicate_matcher.py build --fresh   # 既存の表を使わずに作り直す
+  python 25_duplicate_matcher.py stats   # クラスタ表の件数
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import re
+import time
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+MASTER_CSV = BASE_DIR / "90_3data_master.csv"
+CLUSTER_CSV = BASE_DIR / "92_duplicate_clusters.csv"
+ENCODING = "utf-8-sig"
+
+COLUMNS = ["物件ID", "クラスタID", "URL"]
+SITES = ("suumo", "sumaity", "nifty")
+
+# 一致とみなす差の上限
+AREA_TOLERANCE = 0.5  # m2
+PRICE_TOLERANCE = 50  # 万円
+TOWN_SIMILARITY = 0.8  # 町名までの所在地の類似度（difflib の ratio）
+
+# バケットの幅（許容差の2倍以上にすると、1つの値が入るバケットは多くても2つ）
+AREA_BUCKET = 5.0
+PRICE_BUCKET = 200.0
+
+_MUNICIPALITY_RE = re.compile(r"^(.{2,3}?[都道府県])?(.+?郡)?(.+?[市区町村])")
+
+
+_text = _load_module("13_text_normalizer.py")
+
+
+# =====================
+# 比較用の列
+# =====================
+def site_of(url) -> int:
+    """URL のサイト順（21 の url_priority と同じ。不明なサイトは len(SITES)）。"""
+    text = str(url).lower()
+    for rank, site in enumerate(SITES):
+        if site in text:
+            return rank
+    return len(SITES)
+
+
+def municipality_of(town: str) -> str:
+    """正規化済みの所在地から都道府県 + 市区町村を取り出す（取れなければ全体を返す）。"""
+    m = _MUNICIPALITY_RE.match(town)
+    return m.group(0) if m else town
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        number = float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _float_column(series: pd.Series) -> pd.Series:
+    """数値列（欠損は None）。float64 列のまま map すると None が NaN に戻るため object 列にする。"""
+    values = series.astype(object).map(_to_float).astype(object)
+    return values.where(values.notna(), None)
+
+
+def _buckets(value: Optional[float], width: float, tolerance: float) -> Tuple:
+    """
+    value ± tolerance が掛かるバケット番号（1つか2つ）。
+
+    差が tolerance 以内の2つの値は、少なくとも1つのバケットを共有する。
+    値がない場合は None だけのバケットに入れる（値がない物件同士だけが同じブロックになる）。
+    """
+    if value is None:
+        return (None,)
+    low = math.floor((value - tolerance) / width)
+    high = math.floor((value + tolerance) / width)
+    return tuple(range(low, high + 1))
+
+
+@dataclass
+class Listing:
+    property_id: str
+    url: str
+    site: int
+    town: str
+    land: Optional[float]
+    building: Optional[float]
+    price: Optional[float]
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """比較に使う列だけを持つ表にする（1物件ID=1行、削除済みは除く）。"""
+    if "削除年月日" in df.columns:
+        deleted = df["削除年月日"]
+        df = df[deleted.isna() | (deleted.astype(str).str.strip() == "")]
+    df = df.drop_duplicates(subset=["物件ID"], keep="last")
+
+    def column(col):
+        if col in df.columns:
+            return df[col]
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+    town = _text.map_column(column("所在地"), "address")
+    return pd.DataFrame(
+        {
+            "物件ID": df["物件ID"].astype(str),
+            "URL": column("URL").astype(str),
+            "town": town,
+            "municipality": town.map(municipality_of),
+            "kind": _text.map_column(column("種別"), "text"),
+            "minmax": _text.map_column(column("最小最大"), "minmax"),
+            "land": _float_column(column("土地面積（m2）")),
+            "building": _float_column(column("建物面積（m2）")),
+            "price": _float_column(column("販売価格")),
+        },
+        index=df.index,
+    )
+
+
+# =====================
+# ブロッキング & 比較
+# =====================
+def build_blocks(prepared: pd.DataFrame) -> Dict[Tuple, List[Listing]]:
+    """ブロックキー → 物件 の表。1物件は面積・価格のバケットの組み合わせごと（最大8ブロック）に入る。"""
+    blocks: Dict[Tuple, List[Listing]] = {}
+    for row in prepared.itertuples(index=False):
+        listing = Listing(row.物件ID, row.URL, site_of(row.URL), row.town, row.land, row.building, row.price)
+        for key in product(
+            _buckets(row.land, AREA_BUCKET, AREA_TOLERANCE),
+            _buckets(row.building, AREA_BUCKET, AREA_TOLERANCE),
+            _buckets(row.price, PRICE_BUCKET, PRICE_TOLERANCE),
+        ):
+            blocks.setdefault((row.municipality, row.kind, row.minmax, *key), []).append(listing)
+    return blocks
+
+
+def _close(a: Optional[float], b: Optional[float], tolerance: float) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) <= tolerance
+
+
+def is_match(a: Listing, b: Listing) -> bool:
+    """別サイトの掲載で、面積・価格が許容差以内、町名までの所在地が十分に似ていれば同じ物件とみなす。"""
+    if a.site == b.site or a.site == len(SITES) or b.site == len(SITES):
+        return False
+    if not (
+        _close(a.land, b.land, AREA_TOLERANCE)
+        and _close(a.building, b.building, AREA_TOLERANCE)
+        and _close(a.price, b.price, PRICE_TOLERANCE)
+    ):
+        return False
+    return a.town == b.town or SequenceMatcher(None, a.town, b.town).ratio() >= TOWN_SIMILARITY
+
+
+def candidate_pairs(blocks: Dict[Tuple, List[Listing]]):
+    """
+    ブロック内で一致した物件の組と、比較した組の数を返す（複数のブロックに入る組も比較は1回だけ）。
+
+    ブロック内は土地面積でソートし、差が許容差を超えたところで打ち切る。
+    """
+    pairs = []
+    seen = set()
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        members = sorted(members, key=lambda m: (m.land is None, m.land or 0.0))
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if a.land is not None and b.land is not None and b.land - a.land > AREA_TOLERANCE:
+                    break
+                key = (a.property_id, b.property_id) if a.property_id < b.property_id else (b.property_id, a.property_id)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if is_match(a, b):
+                    pairs.append((a, b))
+    return pairs, len(seen)
+
+
+# =====================
+# クラスタ
+# =====================
+def _previous_listings(previous: pd.DataFrame) -> List[Tuple[Listing, str]]:
+    """既存のクラスタ表の行を (物件, クラスタID) にする（比較はしないので URL とサイトだけ持つ）。"""
+    return [
+        (Listing(pid, url, site_of(url), "", None, None, None), cluster_id)
+        for pid, cluster_id, url in previous.reindex(columns=COLUMNS).astype(str).itertuples(index=False)
+    ]
+
+
+def cluster(pairs, previous: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    一致した組を union-find でまとめ、2件以上のクラスタを COLUMNS の表で返す。
+
+    previous（既存のクラスタ表）を渡すと、そのクラスタを先にまとめてから新しい組を足す。
+    既存のクラスタを含むクラスタはそのクラスタIDを引き継ぐ。
+    """
+    parent: Dict[str, str] = {}
+    listings: Dict[str, Listing] = {}
+    sites: Dict[str, set] = {}
+    previous_ids: Dict[str, str] = {}
+
+    def find(pid):
+        while parent[pid] != pid:
+            parent[pid] = parent[parent[pid]]
+            pid = parent[pid]
+        return pid
+
+    def add(listing):
+        if listing.property_id not in parent:
+            parent[listing.property_id] = listing.property_id
+            listings[listing.property_id] = listing
+            sites[listing.property_id] = {listing.site}
+
+    def union(a, b):
+        root_a, root_b = find(a.property_id), find(b.property_id)
+        if root_a == root_b or sites[root_a] & sites[root_b]:
+            return
+        parent[root_b] = root_a
+        sites[root_a] |= sites.pop(root_b)
+
+    if previous is not None:
+        first: Dict[str, Listing] = {}
+        for listing, cluster_id in _previous_listings(previous):
+            add(listing)
+            previous_ids[listing.property_id] = cluster_id
+            union(first.setdefault(cluster_id, listing), listing)
+
+    # 一致度の高い（価格差の小さい）組から順にまとめる
+    def price_gap(pair):
+        a, b = pair
+        if a.price is None or b.price is None:
+            return 0.0
+        return abs(a.price - b.price)
+
+    for a, b in sorted(pairs, key=price_gap):
+        add(a)
+        add(b)
+        union(a, b)
+
+    groups: Dict[str, List[Listing]] = {}
+    for pid in parent:
+        groups.setdefault(find(pid), []).append(listings[pid])
+
+    rows = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        kept = sorted({previous_ids[m.property_id] for m in members if m.property_id in previous_ids})
+        cluster_id = kept[0] if kept else min(members, key=lambda m: (m.site, m.property_id)).property_id
+        rows.extend((m.property_id, cluster_id, m.url) for m in members)
+    return pd.DataFrame(rows, columns=COLUMNS).sort_values(["クラスタID", "物件ID"], ignore_index=True)
+
+
+def find_clusters(df: pd.DataFrame, previous: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """マスター（またはスナップショット）からクラスタ表を作る。previous があれば引き継ぐ。"""
+    pairs, _ = candidate_pairs(build_blocks(_prepare(df)))
+    return cluster(pairs, previous)
+
+
+# =====================
+# 保存・読み込み
+# =====================
+def write_clusters(clusters: pd.DataFrame, path: Path = CLUSTER_CSV) -> None:
+    clusters.reindex(columns=COLUMNS).to_csv(path, index=False, encoding=ENCODING)
+
+
+def read_clusters(path: Path = CLUSTER_CSV) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(path, encoding=ENCODING, dtype={"物件ID": str, "クラスタID": str})
+
+
+def aliases_of(clusters: pd.DataFrame) -> Dict[str, str]:
+    """物件ID → クラスタID（代表でない物件だけ）。"""
+    aliases = clusters[clusters["物件ID"] != clusters["クラスタID"]]
+    return dict(zip(aliases["物件ID"], aliases["クラスタID"]))
+
+
+def load_aliases(path: Path = CLUSTER_CSV) -> Dict[str, str]:
+    """クラスタ表の aliases_of。表がなければ空。"""
+    return aliases_of(read_clusters(path))
+
+
+def build(master_csv: Path = MASTER_CSV, path: Path = CLUSTER_CSV, fresh: bool = False) -> pd.DataFrame:
+    start = time.perf_counter()
+    previous = None if fresh else read_clusters(path)
+    prepared = _prepare(pd.read_csv(master_csv, encoding=ENCODING, dtype={"物件ID": str}))
+    blocks = build_blocks(prepared)
+    pairs, compared = candidate_pairs(blocks)
+    clusters = cluster(pairs, previous)
+    write_clusters(clusters, path)
+
+    largest = max((len(m) for m in blocks.values()), default=0)
+    print(f"物件: {len(prepared)} 件 / ブロック: {len(blocks)} (最大 {largest} 件) / 比較: {compared} 組")
+    print(
+        f"クラスタ: {clusters['クラスタID'].nunique()} 件 ({len(clusters)} 物件) -> {path.name} "
+        f"({time.perf_counter() - start:.1f}s)"
+    )
+    return clusters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="サイト間の重複物件の検出")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="マスターの新しい重複をクラスタ表に追加する")
+    build_parser.add_argument("--fresh", action="store_true", help="既存のクラスタ表を使わずに作り直す")
+    sub.add_parser("stats", help="クラスタ表の件数")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(fresh=args.fresh)
+    elif args.command == "stats":
+        clusters = read_clusters()
+        print(f"クラスタ: {clusters['クラスタID'].nunique()} 件 / 物件: {len(clusters)} 件")
+        for size, count in clusters.groupby("クラスタID").size().value_counts().sort_index().items():
+            print(f"  {size} 物件のクラスタ: {count} 件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""appendix/ のHTMLで 10_table_parser.py の各バックエンドを計測する。
+
+各フィクスチャについて、BeautifulSoup(html.parser) の結果と一致するかを確認してから
+1回あたりの解析時間（ミリ秒）を表示する。
+ストリーミング解析は、そのサイトのスクレイパーが引く全ラベルで値が一致するかを確認する。
+また、打ち切り後に同じ項目名が再び現れても値が上書きされないことを小さなHTMLで確認する。
+
+使い方:
+  python 80_bench_table_parser.py [繰り返し回数]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+FIXTURE_DIR = BASE_DIR / "appendix"
+FIXTURE_PATTERNS = ["suumo_*.html", "sumaity_*.html", "nifty_*.html"]
+
+# 03/04/05 の各スクレイパーが table_lookup に渡すラベル（フィクスチャ名の先頭で選ぶ）
+SITE_LABELS = {
+    "suumo": ["私道負担・道路", "建ぺい率・容積率", "構造・工法", "用途地域"],
+    "sumaity_new": ["接道", "建物階", "用途地域", "建ぺい率 / 容積率"],
+    "sumaity_used": ["接道状況", "構造/階建", "用途地域", "建ぺい率", "容積率"],
+    "nifty": [
+        "接道状況",
+        "道路付け",
+        "私道負担・道路",
+        "建ぺい率",
+        "容積率",
+        "建ぺい率・容積率",
+        "建物構造",
+        "構造および階数",
+        "用途地域",
+    ],
+}
+
+# 用途地域が「全ラベルが揃う前に2回」「揃った後に1回」現れるページ
+REPEAT_HTML = (
+    "<table>"
+    "<tr><th>用途地域</th><td>第一種低層住居専用地域</td></tr>"
+    "<tr><th>用途地域</th><td>第一種住居地域</td></tr>"
+    "<tr><th>建ぺい率</th><td>60%</td></tr>"
+    "<tr><th>用途地域</th><td>商業地域</td></tr>"
+    "</table>"
+)
+
+
+def _time_ms(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _labels_for(path: Path):
+    stem = path.stem
+    return SITE_LABELS.get(stem) or SITE_LABELS[stem.split("_")[0]]
+
+
+def check_repeated_label(tables) -> None:
+    """ストリーミングは揃った行までの値（後の値が優先）を返し、打ち切り後の行では上書きしない。"""
+    labels = ["用途地域", "建ぺい率"]
+    full = tables.extract_table_data(REPEAT_HTML, backend="bs4")
+    stream = tables.extract_table_data(REPEAT_HTML, labels=labels, backend="lxml", streaming=True)
+    if full.get("用途地域") != "商業地域":
+        raise AssertionError(f"全体解析の用途地域が想定と違います: {full.get('用途地域')}")
+    if stream.get("用途地域") != "第一種住居地域":
+        raise AssertionError(f"ストリーミングの用途地域が想定と違います: {stream.get('用途地域')}")
+    print("repeated label\tOK")
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tables = _load_module("10_table_parser.py")
+
+    fixtures = sorted(path for pattern in FIXTURE_PATTERNS for path in FIXTURE_DIR.glob(pattern))
+    modes = [(name, False) for name in tables.available_backends()]
+    if "lxml" in tables.available_backends():
+        modes.append(("lxml", True))
+        check_repeated_label(tables)
+
+    header = ["fixture"] + [f"{name}{'(stream)' if streaming else ''}" for name, streaming in modes]
+    print("\t".join(header))
+
+    for path in fixtures:
+        html = path.read_text(encoding="utf-8")
+        labels = _labels_for(path)
+        expected = tables.extract_table_data(html, backend="bs4")
+        expected_lookup = tables.TableLookup(expected, labels)
+        cells = [path.name]
+
+        for name, streaming in modes:
+            result = tables.extract_table_data(html, labels=labels, backend=name, streaming=streaming)
+            if streaming:
+                lookup = tables.TableLookup(result, labels)
+                mismatch = any(lookup.get(label) != expected_lookup.get(label) for label in labels)
+            else:
+                mismatch = result != expected
+            if mismatch:
+                raise AssertionError(f"{path.name}: {name} の結果が html.parser と一致しません")
+
+            elapsed = _time_ms(
+                lambda: tables.extract_table_data(html, labels=labels, backend=name, streaming=streaming),
+                repeat,
+            )
+            cells.append(f"{elapsed:.2f}ms")
+
+        print("\t".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""past/ のスナップショットで物件ID生成の旧方式（行ごとの apply）と列単位方式を比較する。
+
+各ファイルで両方式のIDが完全に一致することを確認してから、所要時間を表示する。
+
+使い方:
+  python 81_bench_property_id.py [スナップショットのディレクトリ]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+ENCODING = "utf-8-sig"
+
+
+def main() -> None:
+    snapshot_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / "past"
+    compare = _load_module("21_master_compare.py")
+
+    total_old = total_new = 0.0
+    print("file\trows\tapply\tcolumnar\tspeedup")
+
+    for path in sorted(snapshot_dir.glob("3data_*.csv")):
+        df = pd.read_csv(path, encoding=ENCODING)
+
+        start = time.perf_counter()
+        old_ids = df.apply(compare.generate_property_id, axis=1)
+        old_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new_ids = compare.generate_property_ids(df)
+        new_sec = time.perf_counter() - start
+
+        if not old_ids.astype(str).equals(new_ids.astype(str)):
+            raise AssertionError(f"{path.name}: 物件IDが一致しません")
+
+        total_old += old_sec
+        total_new += new_sec
+        print(f"{path.name}\t{len(df)}\t{old_sec:.3f}s\t{new_sec:.3f}s\t{old_sec / new_sec:.1f}x")
+
+    if total_new:
+        print(f"合計\t-\t{total_old:.3f}s\t{total_new:.3f}s\t{total_old / total_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""past/ のスナップショットで「最小最大」フラグの旧方式（URLごとのループ）と groupby transform 方式を比較する。
+
+各ファイルで 02_merge_all_dataframe.py の flag_min_max（インメモリ）と
+flag_min_max_from_stats（--stream）の結果が旧方式と完全に一致することを確認してから、所要時間を表示する。
+
+使い方:
+  python 82_check_min_max.py [スナップショットのディレクトリ]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+ENCODING = "utf-8-sig"
+
+
+def flag_min_max_loop(df, price_col="_price_num"):
+    """変更前の 02_merge_all_dataframe.py と同じ判定（URLごとに全行をマスクする）。"""
+    df["最小最大"] = ""
+
+    for url, g in df.groupby("URL"):
+        if len(g) <= 1:
+            continue
+
+        min_price = g[price_col].min()
+        max_price = g[price_col].max()
+
+        # 同額の場合は「最小」を優先
+        df.loc[(df["URL"] == url) & (df[price_col] == min_price), "最小最大"] = "最小"
+
+        if max_price != min_price:
+            df.loc[(df["URL"] == url) & (df[price_col] == max_price), "最小最大"] = "最大"
+    return df
+
+
+def main() -> None:
+    snapshot_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / "past"
+    merge = _load_module("02_merge_all_dataframe.py")
+
+    total_old = total_new = 0.0
+    print("file\trows\tloop\ttransform\tspeedup")
+
+    for path in sorted(snapshot_dir.glob("3data_*.csv")):
+        df = pd.read_csv(path, encoding=ENCODING).drop(columns=["最小最大"], errors="ignore")
+        df["_price_num"] = merge.parse_price(df[merge.PRICE_COL])
+
+        start = time.perf_counter()
+        old_flags = flag_min_max_loop(df.copy())["最小最大"]
+        old_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new_flags = merge.flag_min_max(df.copy())["最小最大"]
+        new_sec = time.perf_counter() - start
+
+        if not old_flags.equals(new_flags):
+            raise AssertionError(f"{path.name}: 最小最大が一致しません（{(old_flags != new_flags).sum()} 行）")
+
+        stats = df.groupby("URL")["_price_num"].agg(["size", "min", "max"])
+        stream_flags = merge.flag_min_max_from_stats(df.copy(), stats)["最小最大"]
+        if not old_flags.equals(stream_flags):
+            raise AssertionError(f"{path.name}: --stream の最小最大が一致しません（{(old_flags != stream_flags).sum()} 行）")
+
+        total_old += old_sec
+        total_new += new_sec
+        print(f"{path.name}\t{len(df)}\t{old_sec:.3f}s\t{new_sec:.3f}s\t{old_sec / new_sec:.1f}x")
+
+    if total_new:
+        print(f"合計\t-\t{total_old:.3f}s\t{total_new:.3f}s\t{total_old / total_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""25_duplicate_matcher.py の確認。
+
+1. 小さな表（土地の行は建物面積が NaN）で find_clusters が期待どおりのクラスタを返すこと
+2. マスターでクラスタ表を作り、各クラスタが別サイトの掲載だけで構成されていること
+
+を確認してから、マスターでの所要時間を表示する。
+
+使い方:
+  python 83_check_duplicate_matcher.py [マスターCSV]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+ENCODING = "utf-8-sig"
+
+
+SAMPLE = pd.DataFrame(
+    {
+        "物件ID": ["s-land", "n-land", "s-house", "n-house", "n-other", "s-lot2"],
+        "種別": ["土地", "土地", "建物", "建物", "建物", "土地"],
+        "所在地": [
+            "岐阜県岐阜市東鶉3-67",
+            "岐阜県岐阜市東鶉３丁目",
+            "愛知県一宮市篭屋1-2",
+            "愛知県一宮市篭屋",
+            "愛知県一宮市開明",
+            "岐阜県岐阜市東鶉3-68",
+        ],
+        "販売価格": [1200.0, 1200.0, 2190.0, 2200.0, 2190.0, 1200.0],
+        "土地面積（m2）": [150.00, 149.99, 103.72, 103.72, 103.72, 150.01],
+        "建物面積（m2）": [np.nan, np.nan, 97.2, 97.21, 97.2, np.nan],
+        "最小最大": [np.nan] * 6,
+        "URL": [
+            "https://suumo.jp/tochi/1/",
+            "https://myhome.nifty.com/tochi/1/",
+            "https://suumo.jp/ikkodate/2/",
+            "https://myhome.nifty.com/shinchiku-ikkodate/2/",
+            "https://myhome.nifty.com/shinchiku-ikkodate/3/",
+            "https://suumo.jp/tochi/4/",
+        ],
+        "削除年月日": [np.nan] * 6,
+    }
+)
+
+# 土地は面積 0.01m2 違い・町名の表記違いでもまとまり、同じサイトの隣の区画（s-lot2）は別物件のまま。
+# 町名が違う n-other はまとまらない
+EXPECTED = {"s-land": "s-land", "n-land": "s-land", "s-house": "s-house", "n-house": "s-house"}
+
+
+def main() -> None:
+    master_csv = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / "90_3data_master.csv"
+    matcher = _load_module("25_duplicate_matcher.py")
+
+    clusters = matcher.find_clusters(SAMPLE)
+    got = dict(zip(clusters["物件ID"], clusters["クラスタID"]))
+    if got != EXPECTED:
+        raise AssertionError(f"サンプルのクラスタが一致しません: {got}")
+    print(f"sample\t{len(SAMPLE)} 件\tOK")
+
+    df = pd.read_csv(master_csv, encoding=ENCODING, dtype={"物件ID": str})
+    start = time.perf_counter()
+    clusters = matcher.find_clusters(df)
+    seconds = time.perf_counter() - start
+
+    sites = clusters["URL"].map(matcher.site_of)
+    if sites.groupby(clusters["クラスタID"]).apply(lambda s: s.duplicated().any()).any():
+        raise AssertionError("同じサイトの掲載を含むクラスタがあります")
+    print(f"{master_csv.name}\t{len(df)} 件\t{clusters['クラスタID'].nunique()} クラスタ\t{seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
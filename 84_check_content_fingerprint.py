@@ -0,0 +1,109 @@
+"""08_http_client.py の content_fingerprint の確認（appendix/suumo_new.html を書き換えて比較する）。
+
+- 情報提供日などの日付・時刻だけが違うページは同じ指紋になること
+- 建ぺい率・容積率（60/200 と 60/150）や持分（1/2 と 1/3）が違うページは別の指紋になること
+
+を確認してから、1回あたりの計算時間を表示する。
+また、抽出結果キャッシュ（ResultStore）が期限・件数の上限で古い行を消すことを一時ディレクトリで確認する。
+
+使い方:
+  python 84_check_content_fingerprint.py
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+FIXTURE = BASE_DIR / "appendix" / "suumo_new.html"
+
+KENPEI_CELL = '<td class="w299 bdCell">-\n\t\t\t</td>'
+
+
+def _with_cell(html: str, text: str) -> str:
+    if KENPEI_CELL not in html:
+        raise AssertionError(f"{FIXTURE.name}: 建ぺい率・容積率 のセルが見つかりません")
+    return html.replace(KENPEI_CELL, f'<td class="w299 bdCell">{text}</td>', 1)
+
+
+def check_result_store(http) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "results.sqlite3"
+
+        # 以前のバージョンで作ったDB（last_access 列なし）もそのまま開けること
+        conn = sqlite3.connect(str(path))
+        conn.execute(
+            "CREATE TABLE parsed_results (namespace TEXT NOT NULL, parser_version INTEGER NOT NULL, "
+            "fingerprint TEXT NOT NULL, result TEXT NOT NULL, PRIMARY KEY (namespace, parser_version, fingerprint))"
+        )
+        conn.execute("INSERT INTO parsed_results VALUES ('suumo', 1, 'old', '{}')")
+        conn.commit()
+        conn.close()
+
+        store = http.ResultStore(path, max_results=3)
+        if store.get("suumo", 1, "old") != {}:
+            raise AssertionError("以前のDBの結果が読めません")
+
+        store.put("suumo", 2, "v2", {"用途地域": "商業地域"})
+        if store.get("suumo", 1, "old") is not None:
+            raise AssertionError("古いパーサーバージョンの結果が残っています")
+
+        for i in range(5):
+            store.put("nifty", 1, f"page{i}", {})
+        store.get("suumo", 2, "v2")  # 参照したものは LRU で残る
+        store.purge()
+        kept = {row[0] for row in store._connect().execute("SELECT fingerprint FROM parsed_results")}
+        if kept != {"v2", "page3", "page4"}:
+            raise AssertionError(f"件数の上限で残った行が想定と違います: {sorted(kept)}")
+
+        store.ttl_seconds = 0
+        if not store.purge() or store.get("suumo", 2, "v2") is not None:
+            raise AssertionError("期限切れの行が残っています")
+    print("result store\tOK")
+
+
+def main() -> None:
+    http = _load_module("08_http_client.py")
+    html = FIXTURE.read_text(encoding="utf-8")
+    fingerprint = http.content_fingerprint
+
+    same = [
+        ("情報提供日", html.replace("26/2/1", "26/2/8")),
+        ("年月日", _with_cell(html, "2026年2月1日"), _with_cell(html, "2026年2月8日")),
+        ("時刻", _with_cell(html, "更新 09:00"), _with_cell(html, "更新 10:30")),
+    ]
+    different = [
+        ("建ぺい率・容積率", _with_cell(html, "60/200"), _with_cell(html, "60/150")),
+        ("持分", _with_cell(html, "持分1/2"), _with_cell(html, "持分1/3")),
+        ("全角の比率", _with_cell(html, "６０％／２００％"), _with_cell(html, "６０％／１５０％")),
+    ]
+
+    for name, *pages in same:
+        left, right = pages if len(pages) == 2 else (html, pages[0])
+        if left == right:
+            raise AssertionError(f"{name}: 書き換えがフィクスチャに当たっていません")
+        if fingerprint(left) != fingerprint(right):
+            raise AssertionError(f"{name}: 日付・時刻だけの違いで指紋が変わりました")
+        print(f"same\t{name}\tOK")
+
+    for name, left, right in different:
+        if fingerprint(left) == fingerprint(right):
+            raise AssertionError(f"{name}: 内容が違うのに指紋が同じです")
+        print(f"different\t{name}\tOK")
+
+    check_result_store(http)
+
+    repeat = 50
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fingerprint(html)
+    print(f"content_fingerprint\t{(time.perf_counter() - start) / repeat * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""21_master_compare.py と 25_duplicate_matcher.py を繰り返しても結果が変わらないことの確認。
+
+past/ のスナップショットで空のマスターから作り直し（21 --backfill past --fresh 相当）、
+クラスタ表を作ってから、最後のスナップショットで「21 → 25 build」を3回繰り返す。
+2回目以降にマスター（掲載中・削除済みの件数、削除年月日）とクラスタ表が変わらないことを確認する。
+ファイルは書き換えない（全てメモリ上で行う）。
+
+使い方:
+  python 85_check_cluster_stability.py [スナップショットのディレクトリ]
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+ENCODING = "utf-8-sig"
+ROUNDS = 3
+
+
+def _summary(master: pd.DataFrame, clusters: pd.DataFrame) -> dict:
+    deleted = master["削除年月日"]
+    is_deleted = deleted.notna() & (deleted.astype(str).str.strip() != "")
+    return {
+        "掲載中": int((~is_deleted).sum()),
+        "削除済み": int(is_deleted.sum()),
+        "クラスタ": int(clusters["クラスタID"].nunique()),
+    }
+
+
+def main() -> None:
+    snapshot_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / "past"
+    compare = _load_module("21_master_compare.py")
+    matcher = _load_module("25_duplicate_matcher.py")
+
+    snapshots = sorted(snapshot_dir.glob("3data_*.csv"), key=lambda p: compare.extract_yymmdd(p.name))
+    master_csv = BASE_DIR / compare.MASTER_CSV
+    master = pd.read_csv(master_csv, encoding=ENCODING, nrows=0) if master_csv.exists() else None
+    for path in snapshots:
+        master = compare.apply_snapshot(master, pd.read_csv(path, encoding=ENCODING), str(path)).master
+    clusters = matcher.find_clusters(master)
+    print(f"backfill\t{_summary(master, clusters)}")
+
+    latest = pd.read_csv(snapshots[-1], encoding=ENCODING)
+    previous = None
+    for round_no in range(1, ROUNDS + 1):
+        master = compare.apply_snapshot(master, latest, str(snapshots[-1]), matcher.aliases_of(clusters)).master
+        clusters = matcher.find_clusters(master, clusters)
+        state = (
+            master.sort_values("物件ID")[["物件ID", "削除年月日"]].astype(str).reset_index(drop=True),
+            clusters.reset_index(drop=True),
+        )
+        print(f"round {round_no}\t{_summary(master, clusters)}")
+        if previous is not None and not (previous[0].equals(state[0]) and previous[1].equals(state[1])):
+            raise AssertionError(f"{round_no} 回目でマスターかクラスタ表が変わりました")
+        previous = state
+    print("stable\tOK")
+
+
+if __name__ == "__main__":
+    main()
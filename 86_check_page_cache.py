@@ -0,0 +1,86 @@
+"""09_page_cache.py の確認（一時ディレクトリのキャッシュで行い、page_cache/ には触れない）。
+
+1. 同じURLの本文を何度書き換えても、合計サイズは最新の本文1つ分であること
+2. 本文を共有する別URLがあるときは、書き換えても共有の本文は消えないこと
+3. 以前のバージョンで残った参照されない本文は、ページより先に LRU 削除で消えること
+4. 本文のファイルが消えた・壊れたページは read_body が None を返し、索引から外れること
+
+使い方:
+  python 86_check_page_cache.py
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+from module_loader import load_module as _load_module
+
+URL = "https://suumo.jp/ikkodate/gifu/nc_00000001/"
+OTHER_URL = "https://suumo.jp/ikkodate/gifu/nc_00000002/"
+
+
+def _page(day: int) -> str:
+    return f"<html><body><p>情報提供日：26/2/{day}</p><p>閲覧数 {day * 37}</p></body></html>"
+
+
+def check_overwrite(cache_module, cache_dir: Path) -> None:
+    cache = cache_module.PageCache(cache_dir)
+    for day in range(1, 8):
+        entry = cache.put(URL, _page(day))
+    stats = cache.stats()
+    latest = cache._object_path(entry.content_hash).stat().st_size
+    if (stats["objects"], stats["bytes"]) != (1, latest) or len(list(cache_dir.rglob("*.gz"))) != 1:
+        raise AssertionError(f"書き換えた本文が残っています: {stats}（最新の本文 {latest} bytes）")
+    print(f"overwrite\t{stats}\tOK")
+
+    cache.put(OTHER_URL, _page(7))
+    cache.put(URL, _page(8))
+    entry = cache.lookup(OTHER_URL)
+    if cache.read_body(entry) != _page(7):
+        raise AssertionError("別のURLが使っている本文が消えました")
+    print(f"shared\t{cache.stats()}\tOK")
+
+
+def check_orphans_first(cache_module, cache_dir: Path) -> None:
+    cache = cache_module.PageCache(cache_dir)
+    cache.put(URL, _page(1))
+    cache.put(OTHER_URL, _page(2))
+    # 以前のバージョンの put が残した本文（pages から参照されない objects の行）を作る
+    orphan = cache.put("https://suumo.jp/ikkodate/gifu/nc_00000003/", _page(3))
+    conn = cache._connect()
+    conn.execute("DELETE FROM pages WHERE url_key = ?", (orphan.url,))
+    conn.commit()
+    orphan_size = conn.execute("SELECT size FROM objects WHERE content_hash = ?", (orphan.content_hash,)).fetchone()[0]
+
+    cache.max_bytes = cache.stats()["bytes"] - orphan_size
+    evicted = cache.evict()
+    stats = cache.stats()
+    if evicted or stats["pages"] != 2 or stats["objects"] != 2 or cache._object_path(orphan.content_hash).exists():
+        raise AssertionError(f"参照されない本文より先にページが削除されました: evicted={evicted} {stats}")
+    print(f"orphans\t{stats}\tOK")
+
+
+def check_unreadable(cache_module, cache_dir: Path) -> None:
+    cache = cache_module.PageCache(cache_dir)
+    for url, broken in ((URL, b""), (OTHER_URL, b"not gzip")):
+        entry = cache.put(url, _page(1 if url == URL else 2))
+        path = cache._object_path(entry.content_hash)
+        if broken:
+            path.write_bytes(broken)
+        else:
+            path.unlink()
+        if cache.read_body(entry) is not None or cache.lookup(url) is not None:
+            raise AssertionError(f"{url}: 読めない本文のページが残っています")
+    print(f"unreadable\t{cache.stats()}\tOK")
+
+
+def main() -> None:
+    cache_module = _load_module("09_page_cache.py")
+    for check in (check_overwrite, check_orphans_first, check_unreadable):
+        with tempfile.TemporaryDirectory() as tmp:
+            check(cache_module, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
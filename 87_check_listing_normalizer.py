@@ -0,0 +1,128 @@
+"""11_listing_normalizer.py の確認。
+
+1. 沿線・駅 の見本（バス停だけの中古の行は 沿線 / 駅 が空のまま）を変換して期待どおりかを確認する
+2. suumo01.csv / sumaity01.csv / nifty01.csv を変換し、並んでいる *02.csv（従来の 02 スクリプトの出力）と
+   全列・全行が一致することを確認する（*02.csv は書き換えない）
+
+パイプラインの実行で *02.csv が作り直されている場合は、git で元に戻したものと比べること。
+
+使い方:
+  python 87_check_listing_normalizer.py [01/02 の CSV があるディレクトリ]
+"""
+
+from __future__ import annotations
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+ENCODING = "utf-8-sig"
+
+# (URL, 沿線・駅, 沿線, 駅, 徒歩)
+ACCESS_SAMPLES = [
+    (
+        "https://sumaity.com/house/used/gifu_prop/prop_18319369/",
+        "岐阜市営バス「「城美台西」停」下車 徒歩2分",
+        None,
+        None,
+        None,
+    ),
+    (
+        "https://sumaity.com/house/used/aichi_prop/prop_19049413/",
+        "名鉄バス「「島村口」停」下車 徒歩5分",
+        None,
+        None,
+        None,
+    ),
+    (
+        "https://sumaity.com/house/used/gifu_prop/prop_0000001/",
+        "ＪＲ東海道本線 岐阜駅まで 徒歩22分 / 名鉄名古屋本線 名鉄岐阜駅まで 徒歩25分",
+        "ＪＲ東海道本線",
+        "岐阜",
+        22.0,
+    ),
+    (
+        "https://sumaity.com/house/new/gifu_prop/prop_0000002/",
+        "岐阜バス「鶉ターミナル」下車 徒歩4分",
+        "岐阜バス",
+        "鶉ターミナル",
+        None,
+    ),
+    (
+        "https://sumaity.com/house/new/gifu_prop/prop_0000003/",
+        "名鉄名古屋本線「柳津」駅 徒歩10分",
+        "名鉄名古屋本線",
+        "柳津",
+        10.0,
+    ),
+]
+
+
+def _same(value, expected) -> bool:
+    if expected is None:
+        return pd.isna(value)
+    return not pd.isna(value) and value == expected
+
+
+def check_access(normalizer) -> None:
+    raw = pd.DataFrame(
+        {
+            "URL": [url for url, *_ in ACCESS_SAMPLES],
+            "沿線・駅": [text for _, text, *_ in ACCESS_SAMPLES],
+            "販売価格": "1,000万円",
+            "土地面積": "150.00m2",
+            "建物面積": "100.00m2",
+            "築年月": "2000年1月",
+            "情報取得日": "2026/02/07",
+        }
+    )
+    out = normalizer.normalize_frame(raw, "sumaity")
+    for row, (_, text, line, station, walk) in zip(out.itertuples(index=False), ACCESS_SAMPLES):
+        if not (_same(row.沿線, line) and _same(row.駅, station) and _same(row.徒歩, walk)):
+            raise AssertionError(f"{text}: 沿線={row.沿線!r} 駅={row.駅!r} 徒歩={row.徒歩!r}")
+    print(f"access\t{len(ACCESS_SAMPLES)} 件\tOK")
+
+
+def _differing_rows(got: pd.Series, expected: pd.Series) -> np.ndarray:
+    if got.dtype.kind in "fi" and expected.dtype.kind in "fi":
+        same = np.isclose(got, expected) | (got.isna() & expected.isna())
+    else:
+        same = (got.astype(str) == expected.astype(str)).to_numpy()
+    return np.flatnonzero(~same)
+
+
+def check_baseline(normalizer, base_dir: Path) -> None:
+    for site, rule in normalizer.SITE_RULES.items():
+        raw = pd.read_csv(base_dir / rule["source"], encoding=ENCODING)
+        expected = pd.read_csv(base_dir / rule["output"], encoding=ENCODING)
+        # 数値の表記（7.0 と 7 など）を揃えるため、CSV に書き出したものを読み直して比べる
+        got = pd.read_csv(io.StringIO(normalizer.normalize_frame(raw, site).to_csv(index=False)))
+        if len(got) != len(expected):
+            raise AssertionError(f"{rule['output']}: 行数が違います（{len(got)} / {len(expected)}）")
+
+        for col in normalizer.SCHEMA:
+            rows = _differing_rows(got[col], expected[col])
+            if len(rows):
+                i = rows[0]
+                raise AssertionError(
+                    f"{rule['output']}: {col} が {len(rows)} 行違います"
+                    f"（{i} 行目 {got[col][i]!r} / {expected[col][i]!r}、{got['URL'][i]}）"
+                )
+        print(f"{rule['output']}\t{len(expected)} 行\tOK")
+
+
+def main() -> None:
+    base_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR
+    normalizer = _load_module("11_listing_normalizer.py")
+    check_access(normalizer)
+    check_baseline(normalizer, base_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""ネットワークを使わないベンチマーク一式。
+
+- scrape        : appendix/*.html を各 scrape_*_property で解析する1ページあたりの時間
+- normalize     : 01 のサイト別CSV（suumo01.csv 等）を 02 のスキーマに変換する時間
+- property_id   : past/3data_*.csv 全体での物件ID生成（generate_property_ids）
+- min_max       : 02 の結合後処理（正規化・最小最大判定）を past/ のスナップショットで実行
+- merge_stream  : 同じ処理を 02 の --stream（stream_merge）で CSV から CSV へ実行
+- master_compare: 90_3data_master.csv に最新スナップショットを反映する 21 の一連の処理
+                  （一時ディレクトリで実行し、リポジトリのファイルは書き換えない）
+
+表形式の処理は --scales で行数を10倍・100倍にした合成データでも計測し、
+倍率に対する時間の伸び（次数。1.0 なら線形、2.0 なら二乗）を表示する。
+結果は logs/benchmark_history.jsonl に1回1行で追記し、前回の結果と比較して表示する。
+
+使い方:
+  python 89_benchmark_suite.py                      # 全部（倍率 1, 10）
+  python 89_benchmark_suite.py --only scrape,min_max
+  python 89_benchmark_suite.py --scales 1 10 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from module_loader import load_module as _load_module
+
+BASE_DIR = Path(__file__).resolve().parent
+FIXTURE_DIR = BASE_DIR / "appendix"
+SNAPSHOT_DIR = BASE_DIR / "past"
+MASTER_CSV = BASE_DIR / "90_3data_master.csv"
+HISTORY_PATH = BASE_DIR / "logs" / "benchmark_history.jsonl"
+ENCODING = "utf-8-sig"
+
+SCRAPERS = [
+    ("03_suumo_scraper.py", "scrape_suumo_property", "suumo_*.html"),
+    ("04_sumaity_scraper.py", "scrape_sumaity_property", "sumaity_*.html"),
+    ("05_nifty_scraper.py", "scrape_nifty_property", "nifty_*.html"),
+]
+BENCHMARKS = ["scrape", "normalize", "property_id", "min_max", "merge_stream", "master_compare"]
+DEFAULT_SCALES = [1, 10]
+
+Result = Dict[str, float]
+
+
+def _median_seconds(func: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def _copy_tag(index: int) -> str:
+    """合成データの複製番号を数字を含まない文字列にする（所在地は数字以降が切り捨てられるため）。"""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return f"合成{letters}"
+
+
+def scale_frame(df: pd.DataFrame, factor: int) -> pd.DataFrame:
+    """
+    行を factor 倍に複製した合成データを作る。
+
+    複製ごとに所在地と URL を変え、物件ID・URL の種類数も factor 倍になるようにする。
+    同じ factor なら何度作っても同じデータになる。
+    """
+    if factor <= 1:
+        return df.copy()
+
+    copies = [df]
+    for index in range(1, factor):
+        copy = df.copy()
+        tag = _copy_tag(index)
+        if "所在地" in copy.columns:
+            copy["所在地"] = tag + copy["所在地"].fillna("").astype(str)
+        if "URL" in copy.columns:
+            copy["URL"] = copy["URL"].fillna("").astype(str) + f"#{tag}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+# =====================
+# 各ベンチマーク
+# =====================
+def bench_scrape(repeat: int, scales: List[int]) -> Dict[str, Result]:
+    results: Dict[str, Result] = {}
+    for file_name, function_name, pattern in SCRAPERS:
+        scrape = getattr(_load_module(file_name), function_name)
+        for path in sorted(FIXTURE_DIR.glob(pattern)):
+            scrape(str(path))  # 遅延読み込みのパーサー等を先に読み込んでおく
+            seconds = _median_seconds(lambda: scrape(str(path)), repeat)
+            results[f"scrape/{path.stem}"] = {"seconds": seconds, "rows": 1}
+    return results
+
+
+def bench_normalize(repeat: int, scales: List[int]) -> Dict[str, Result]:
+    normalizer = _load_module("11_listing_normalizer.py")
+
+    results: Dict[str, Result] = {}
+    for site, rule in normalizer.SITE_RULES.items():
+        path = BASE_DIR / rule["source"]
+        if not path.exists():
+            continue
+        raw = pd.read_csv(path, encoding=ENCODING)
+        for factor in scales:
+            scaled = scale_frame(raw, factor)
+            seconds = _median_seconds(lambda: normalizer.normalize_frame(scaled, site), repeat)
+            results[f"normalize/{site}/x{factor}"] = {"seconds": seconds, "rows": len(scaled)}
+    return results
+
+
+def _read_snapshots() -> List[pd.DataFrame]:
+    return [pd.read_csv(path, encoding=ENCODING) for path in sorted(SNAPSHOT_DIR.glob("3data_*.csv"))]
+
+
+def bench_property_id(repeat: int, scales: List[int]) -> Dict[str, Result]:
+    compare = _load_module("21_master_compare.py")
+    df = pd.concat(_read_snapshots(), ignore_index=True)
+
+    results: Dict[str, Result] = {}
+    for factor in scales:
+        scaled = scale_frame(df, factor)
+        seconds = _median_seconds(lambda: compare.generate_property_ids(scaled), repeat)
+        results[f"property_id/x{factor}"] = {"seconds": seconds, "rows": len(scaled)}
+    return results
+
+
+def bench_min_max(repeat: int, scales: List[int]) -> Dict[str, Result]:
+    merge = _load_module("02_merge_all_dataframe.py")
+    snapshots = _read_snapshots()
+
+    results: Dict[str, Result] = {}
+    for factor in scales:
+        scaled = [scale_frame(df, factor) for df in snapshots]
+        seconds = _median_seconds(lambda: merge.merge_frames(scaled), repeat)
+        results[f"min_max/x{factor}"] = {"seconds": seconds, "rows": sum(len(df) for df in scaled)}
+    return results
+
+
+def bench_merge_stream(repeat: int, scales: List[int]) -> Dict[str, Result]:
+    merge = _load_module("02_merge_all_dataframe.py")
+    snapshots = _read_snapshots()
+
+    results: Dict[str, Result] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        output = work / "3data_stream.csv"
+        for factor in scales:
+            # 入力CSVの書き出しは計測に含めない
+            inputs = []
+            for i, df in enumerate(snapshots):
+                path = work / f"input_{i}.csv"
+                scale_frame(df, factor).to_csv(path, index=False, encoding=ENCODING)
+                inputs.append(str(path))
+            seconds = _median_seconds(lambda: merge.stream_merge(inputs, str(output)), repeat)
+            results[f"merge_stream/x{factor}"] = {"seconds": seconds, "rows": sum(len(df) for df in snapshots) * factor}
+    return results
+
+
+def bench_master_compare(repeat: int, scales: List[int]) -> Dict[str, Result]:
+    compare = _load_module("21_master_compare.py")
+    snapshot_path = sorted(SNAPSHOT_DIR.glob("3data_*.csv"), key=lambda p: compare.extract_yymmdd(p.name))[-1]
+    df_master = pd.read_csv(MASTER_CSV, encoding=ENCODING)
+    df_snapshot = pd.read_csv(snapshot_path, encoding=ENCODING)
+
+    saved = {name: getattr(compare, name) for name in ("MASTER_CSV", "MASTER_PARQUET", "MASTER_DB", "PRICE_HISTORY_DIR")}
+    results: Dict[str, Result] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        compare.MASTER_CSV = str(work / "90_3data_master.csv")
+        compare.MASTER_PARQUET = str(work / "90_3data_master.parquet")
+        compare.MASTER_DB = str(work / "90_3data_master.sqlite3")
+        compare.PRICE_HISTORY_DIR = str(work / "price_history")
+        try:
+            for factor in scales:
+                master_src = work / f"master_x{factor}.csv"
+                snapshot = work / snapshot_path.name
+                # 複製した行の物件IDは現在の生成方法で振り直し、スナップショット側と対応させる
+                scaled_master = scale_frame(df_master, factor)
+                scaled_master["物件ID"] = compare.generate_property_ids(scaled_master)
+                scaled_master.to_csv(master_src, index=False, encoding=ENCODING)
+                scale_frame(df_snapshot, factor).to_csv(snapshot, index=False, encoding=ENCODING)
+
+                times = []
+                for _ in range(max(1, repeat)):
+                    # 毎回同じマスターから始める（コピーと前回の出力の削除は計測に含めない）
+                    shutil.copyfile(master_src, compare.MASTER_CSV)
+                    Path(compare.MASTER_PARQUET).unlink(missing_ok=True)
+                    Path(compare.MASTER_DB).unlink(missing_ok=True)
+                    shutil.rmtree(compare.PRICE_HISTORY_DIR, ignore_errors=True)
+
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        compare.main(str(snapshot))
+                    times.append(time.perf_counter() - start)
+                times.sort()
+                results[f"master_compare/x{factor}"] = {
+                    "seconds": times[len(times) // 2],
+                    "rows": len(df_master) * factor,
+                }
+        finally:
+            for name, value in saved.items():
+                setattr(compare, name, value)
+    return results
+
+
+BENCH_FUNCTIONS: Dict[str, Callable[[int, List[int]], Dict[str, Result]]] = {
+    "scrape": bench_scrape,
+    "normalize": bench_normalize,
+    "property_id": bench_property_id,
+    "min_max": bench_min_max,
+    "merge_stream": bench_merge_stream,
+    "master_compare": bench_master_compare,
+}
+
+
+# =====================
+# 履歴
+# =====================
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return out.stdout.strip() if out.returncode == 0 else ""
+
+
+def load_history(path: Path = HISTORY_PATH) -> List[dict]:
+    if not path.exists():
+        return []
+    runs = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                runs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return runs
+
+
+def append_history(run: dict, path: Path = HISTORY_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+
+
+def _previous_seconds(history: List[dict], name: str) -> Optional[float]:
+    for run in reversed(history):
+        result = run.get("results", {}).get(name)
+        if result is not None:
+            return result.get("seconds")
+    return None
+
+
+def _scaling_exponents(results: Dict[str, Result]) -> Dict[str, float]:
+    """同じベンチマークの x1 と最大倍率の時間から、行数に対する次数を求める。"""
+    exponents = {}
+    groups: Dict[str, Dict[int, Result]] = {}
+    for name, result in results.items():
+        prefix, _, suffix = name.rpartition("/x")
+        if prefix and suffix.isdigit():
+            groups.setdefault(prefix, {})[int(suffix)] = result
+    for prefix, by_factor in groups.items():
+        if 1 not in by_factor or len(by_factor) < 2:
+            continue
+        largest = max(by_factor)
+        base, top = by_factor[1]["seconds"], by_factor[largest]["seconds"]
+        if base > 0 and top > 0:
+            exponents[f"{prefix} x1→x{largest}"] = math.log(top / base) / math.log(largest)
+    return exponents
+
+
+def print_report(results: Dict[str, Result], history: List[dict]) -> None:
+    print(f"{'benchmark':<32}{'rows':>10}{'time':>12}{'前回':>12}{'変化':>9}")
+    for name, result in results.items():
+        seconds = result["seconds"]
+        previous = _previous_seconds(history, name)
+        if previous:
+            change = f"{(seconds / previous - 1) * 100:+.0f}%"
+            prev_text = f"{previous * 1000:.2f}ms"
+        else:
+            change, prev_text = "-", "-"
+        print(f"{name:<32}{int(result['rows']):>10}{seconds * 1000:>10.2f}ms{prev_text:>12}{change:>9}")
+
+    exponents = _scaling_exponents(results)
+    if exponents:
+        print("\n行数に対する次数（1.0=線形, 2.0=二乗）")
+        for name, exponent in exponents.items():
+            print(f"  {name:<38}{exponent:.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="オフラインのベンチマーク")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="実行するベンチマーク（カンマ区切り）")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="合成データの倍率")
+    parser.add_argument("--repeat", type=int, default=3, help="繰り返し回数（中央値を記録）")
+    parser.add_argument("--no-save", action="store_true", help="履歴に記録しない")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in BENCH_FUNCTIONS]
+    if unknown:
+        parser.error(f"不明なベンチマーク: {', '.join(unknown)}（指定可能: {', '.join(BENCHMARKS)}）")
+    scales = sorted(set(args.scales) | {1})
+
+    results: Dict[str, Result] = {}
+    for name in selected:
+        results.update(BENCH_FUNCTIONS[name](args.repeat, scales))
+
+    history = load_history()
+    print_report(results, history)
+
+    if not args.no_save:
+        append_history(
+            {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "scales": scales,
+                "results": results,
+            }
+        )
+        print(f"\n記録: {HISTORY_PATH.relative_to(BASE_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""番号付きファイル名のモジュール（02_merge_all_dataframe.py など）を読み込む共通処理。
+
+番号始まりのファイルは import 文で読めないため、各スクリプトは
+`from module_loader import load_module as _load_module` で取り込んで使う。
+スクリプトと同じディレクトリに置くこと（python がスクリプトのディレクトリを sys.path に入れる）。
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+from types import ModuleType
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def load_module(file_name: str) -> ModuleType:
+    """
+    共有モジュールを読み込む。読み込み済みなら同じインスタンスを返す。
+
+    sys.modules にはファイル名の拡張子なし（例: 13_text_normalizer）で登録する。
+    dataclass などが型注釈の解決に sys.modules を参照するため、実行前に登録しておく。
+    """
+    module_path = BASE_DIR / file_name
+    cached = sys.modules.get(module_path.stem)
+    if cached is not None:
+        return cached
+
+    spec = importlib.util.spec_from_file_location(module_path.stem, module_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Failed to load module: {module_path}")
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_path.stem] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        sys.modules.pop(module_path.stem, None)
+        raise
+    return module